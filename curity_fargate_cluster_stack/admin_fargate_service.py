@@ -13,7 +13,7 @@ class CurityAdminService(BaseFargateService):
         #
         # Prepare the Container and associated ECS Task
         # ====================================================================
-        curity_image = CurityAdminService.choose_docker_admin_image(construct)
+        curity_image = CurityAdminService.choose_docker_admin_image(construct, config)
 
         admin_task_definition = self.create_curity_task_definition(
             construct, curity_image, config, admin_service
@@ -32,9 +32,15 @@ class CurityAdminService(BaseFargateService):
             cluster=curity_cluster,
             enable_execute_command=True,   # If set, then CDK will also update the Task Role for us.
             service_name="curity-admin-service",
-            cloud_map_options=ecs.CloudMapOptions(name="admin"),
+            # Service Connect registers 'admin' in the namespace itself
+            cloud_map_options=ecs.CloudMapOptions(name="admin")
+            if config.get("service_connect") is None
+            else None,
             desired_count=1,
+            **self.deployment_options(config.get("admin_deployment", {})),
         )
+        if config.get("service_connect") is not None:
+            self.enable_service_connect(self.curity_service, config, True)
 
         # TODO from here
         # load_balancer = lb.ApplicationLoadBalancer(
@@ -1,10 +1,93 @@
 """This module provides the BaseFargateService class."""
+import os.path
+
 from aws_cdk import (
+    Duration,
+    Stack,
     aws_ecs as ecs,
+    aws_ecr as ecr,
     aws_ecr_assets as ecr_assets,
     aws_iam as iam,
+    aws_logs as logs,
     aws_s3_assets as s3_assets,
 )
+from curity_fargate_cluster_stack.curity_aws_env_config import (
+    DEFAULT_TASK_CPU,
+    DEFAULT_TASK_MEMORY_MIB,
+)
+
+# Memory left outside the heap for metaspace, thread stacks, code cache
+# and direct buffers, so the container is not OOM killed by Fargate
+JVM_NON_HEAP_RESERVE_MIB = 768
+DEFAULT_HEAP_PERCENT = 75
+
+# The cpu_architecture values allowed in cdk.json mapped to the ECS runtime
+# platform and the platform the Docker image must be built for
+CPU_ARCHITECTURES = {
+    "X86_64": (ecs.CpuArchitecture.X86_64, ecr_assets.Platform.LINUX_AMD64),
+    "ARM64": (ecs.CpuArchitecture.ARM64, ecr_assets.Platform.LINUX_ARM64),
+}
+
+# The ADOT collector used as the metrics sidecar and the port Curity serves
+# its Prometheus metrics on
+DEFAULT_COLLECTOR_IMAGE = "public.ecr.aws/aws-observability/aws-otel-collector:v0.29.0"
+CURITY_METRICS_PORT = 4466
+
+# The Fluent Bit image used as the FireLens log router.  The 'init' variant
+# can load its configuration from S3, which Fargate cannot otherwise do.
+# Pinned so every task runs the same router; bump it deliberately, or set
+# 'firelens.router_image' per environment to try a newer one first.
+DEFAULT_LOG_ROUTER_IMAGE = "public.ecr.aws/aws-observability/aws-for-fluent-bit:init-2.31.12"
+FIRELENS_CONFIG_DIRECTORY = os.path.join(os.path.dirname(__file__), "firelens")
+
+LOG_RETENTION = {
+    1: logs.RetentionDays.ONE_DAY,
+    3: logs.RetentionDays.THREE_DAYS,
+    5: logs.RetentionDays.FIVE_DAYS,
+    7: logs.RetentionDays.ONE_WEEK,
+    14: logs.RetentionDays.TWO_WEEKS,
+    30: logs.RetentionDays.ONE_MONTH,
+    60: logs.RetentionDays.TWO_MONTHS,
+    90: logs.RetentionDays.THREE_MONTHS,
+    120: logs.RetentionDays.FOUR_MONTHS,
+    150: logs.RetentionDays.FIVE_MONTHS,
+    180: logs.RetentionDays.SIX_MONTHS,
+    365: logs.RetentionDays.ONE_YEAR,
+    400: logs.RetentionDays.THIRTEEN_MONTHS,
+    545: logs.RetentionDays.EIGHTEEN_MONTHS,
+    731: logs.RetentionDays.TWO_YEARS,
+    1827: logs.RetentionDays.FIVE_YEARS,
+    3653: logs.RetentionDays.TEN_YEARS,
+}
+
+# Curity serves its health status on this port.  The defaults give the
+# JVM two minutes to start before failed checks count against the task.
+CURITY_HEALTH_PORT = 4465
+DEFAULT_CONTAINER_HEALTH_CHECK = {
+    "interval_seconds": 15,
+    "timeout_seconds": 5,
+    "retries": 3,
+    "start_period_seconds": 120,
+}
+
+# Where the Curity Dockerfiles live and the files in there that never end
+# up in an image, so editing them does not change the asset hash.  The env
+# file is uploaded separately (see sync_envfile) so is excluded as well.
+DEFAULT_IMAGE_BUILD_DIRECTORY = "../curity-docker-provisioning"
+DEFAULT_IMAGE_BUILD_EXCLUDE = ["*.env", ".git", ".gitignore", "*.md", "cdk.out"]
+
+# With 'service_connect' the admin node publishes its cluster port as
+# 'admin' and the runtimes reach it on the same name and port they use
+# with Cloud Map DNS
+CURITY_CLUSTER_PORT = 6789
+SERVICE_CONNECT_PORT_NAME = "cluster"
+SERVICE_CONNECT_ADMIN_DNS_NAME = "admin.curity"
+
+GC_OPTIONS = {
+    "G1": "-XX:+UseG1GC -XX:MaxGCPauseMillis=100 -XX:+ParallelRefProcEnabled",
+    "Parallel": "-XX:+UseParallelGC",
+    "Z": "-XX:+UseZGC",
+}
 
 
 class BaseFargateService:
@@ -13,33 +96,196 @@ class BaseFargateService:
 
     #
     #  Choose the Docker Admin Image
+    #
+    #  If 'admin_image' is set in cdk.json the task runs a prebuilt image
+    #  from ECR, otherwise the image is built locally at synth time.
+    #  The local build targets the 'cpu_architecture' of the admin task
+    #  rather than the architecture of the machine running cdk
     # =========================================================================
     @staticmethod
-    def choose_docker_admin_image(construct):
+    def choose_docker_admin_image(construct, config):
         """Build an image for the Curity Admin task and upload to ecr if required"""
-        curity_admin_image = ecr_assets.DockerImageAsset(
-            construct,
-            "CurityAdminImage",
-            directory="../curity-docker-provisioning",
-            file="Dockerfile.admin",
+        if config.get("admin_image"):
+            return BaseFargateService.prebuilt_image(
+                construct, "CurityAdminRepository", config["admin_image"]
+            )
+
+        curity_admin_image = BaseFargateService.build_image_asset(
+            construct, "CurityAdminImage", config, "admin"
         )
 
-        return curity_admin_image
+        return ecs.ContainerImage.from_docker_image_asset(curity_admin_image)
 
     #
     #  Choose the Docker Runtime Image
     # =========================================================================
     @staticmethod
-    def choose_docker_runtime_image(construct):
+    def choose_docker_runtime_image(construct, config):
         """Build an image for the Curity Runtime task and upload to ecr if required"""
-        curity_runtime_image = ecr_assets.DockerImageAsset(
+        if config.get("runtime_image"):
+            return BaseFargateService.prebuilt_image(
+                construct, "CurityRuntimeRepository", config["runtime_image"]
+            )
+
+        curity_runtime_image = BaseFargateService.build_image_asset(
+            construct, "CurityRuntimeImage", config, "runtime"
+        )
+
+        return ecs.ContainerImage.from_docker_image_asset(curity_runtime_image)
+
+    #
+    #  Build the admin or runtime image from the 'image_build' settings
+    #
+    #  By default each image has its own Dockerfile (Dockerfile.admin and
+    #  Dockerfile.runtime).  If 'file' is set both images are built from
+    #  that one multi-stage Dockerfile using the admin_target and
+    #  runtime_target stages, so the stages they share are built once.
+    #
+    #  With a 'cache_repository' BuildKit pulls layers from, and pushes
+    #  them to, a registry cache so CI runs don't start from scratch.
+    #  There is one cache per image and architecture so they never evict
+    #  each other, but each build also reads the other image's cache so
+    #  the layers they share are reused.
+    # =========================================================================
+    @staticmethod
+    def build_image_asset(construct, asset_id, config, role):
+        """Create the DockerImageAsset for the 'admin' or 'runtime' image"""
+        image_build = config.get("image_build", {})
+        task_sizing = config.get(f"{role}_task", {})
+        architecture = task_sizing.get("cpu_architecture", "X86_64").lower()
+
+        cache_from = None
+        cache_to = None
+        if image_build.get("cache_repository"):
+            cache_refs = [
+                f"{image_build['cache_repository']}:{cache_role}-{architecture}"
+                for cache_role in sorted(("admin", "runtime"), key=lambda r: r != role)
+            ]
+            cache_from = [
+                ecr_assets.DockerCacheOption(type="registry", params={"ref": cache_ref})
+                for cache_ref in cache_refs
+            ]
+            cache_to = ecr_assets.DockerCacheOption(
+                type="registry", params={"ref": cache_refs[0], "mode": "max"}
+            )
+
+        return ecr_assets.DockerImageAsset(
             construct,
-            "CurityRuntimeImage",
-            directory="../curity-docker-provisioning",
-            file="Dockerfile.runtime",
+            asset_id,
+            directory=image_build.get("directory", DEFAULT_IMAGE_BUILD_DIRECTORY),
+            file=image_build.get("file", f"Dockerfile.{role}"),
+            target=image_build.get(f"{role}_target", role) if "file" in image_build else None,
+            build_args=image_build.get("build_args"),
+            cache_from=cache_from,
+            cache_to=cache_to,
+            exclude=image_build.get("exclude", DEFAULT_IMAGE_BUILD_EXCLUDE),
+            platform=BaseFargateService.image_platform(task_sizing),
+        )
+
+    #
+    #  Use an image that CI has already pushed to ECR
+    #
+    #  A digest pins the exact image bytes so every environment runs the
+    #  same image; a tag is accepted for convenience.  The task execution
+    #  role is granted pull access on the repository.
+    # =========================================================================
+    @staticmethod
+    def prebuilt_image(construct, repository_id, image):
+        """Reference an existing image in an ECR repository"""
+        repository = ecr.Repository.from_repository_name(
+            construct, repository_id, image["repository_name"]
+        )
+        return ecs.ContainerImage.from_ecr_repository(
+            repository, image.get("digest") or image["tag"]
+        )
+
+    #
+    #  Map the task's cpu_architecture onto Docker and ECS platforms
+    #  X86_64 is the default to match what Fargate uses when none is set
+    # =========================================================================
+    @staticmethod
+    def image_platform(task_sizing):
+        """Return the platform the Docker image for this task must be built for"""
+        return CPU_ARCHITECTURES[task_sizing.get("cpu_architecture", "X86_64")][1]
+
+    @staticmethod
+    def runtime_platform(task_sizing):
+        """Return the ECS runtime platform for this task"""
+        return ecs.RuntimePlatform(
+            cpu_architecture=CPU_ARCHITECTURES[
+                task_sizing.get("cpu_architecture", "X86_64")
+            ][0],
+            operating_system_family=ecs.OperatingSystemFamily.LINUX,
+        )
+
+    #
+    #  Derive the JVM settings from the memory we are paying for
+    #
+    #  The heap is a percentage of the task memory but always leaves
+    #  JVM_NON_HEAP_RESERVE_MIB for the JVM's own off-heap usage.  Xms == Xmx
+    #  so the heap is committed up front rather than grown under load.
+    #  Curity's startup script passes JAVA_OPTS to the JVM.
+    # =========================================================================
+    @staticmethod
+    def jvm_environment(task_sizing):
+        """Return the container environment variables that size the Curity JVM"""
+        memory_mib = task_sizing.get("memory_mib", DEFAULT_TASK_MEMORY_MIB)
+        heap_percent = task_sizing.get("heap_percent", DEFAULT_HEAP_PERCENT)
+        heap_mib = min(
+            memory_mib * heap_percent // 100, memory_mib - JVM_NON_HEAP_RESERVE_MIB
+        )
+
+        java_opts = [
+            f"-Xms{heap_mib}m",
+            f"-Xmx{heap_mib}m",
+            GC_OPTIONS[task_sizing.get("gc", "G1")],
+            "-XX:+ExitOnOutOfMemoryError",
+        ]
+        if task_sizing.get("java_opts"):
+            java_opts.append(task_sizing["java_opts"])
+
+        return {"JAVA_OPTS": " ".join(java_opts)}
+
+    #
+    #  Container level health check on the Curity health port
+    #
+    #  This is what lets ECS (and the deployment circuit breaker) see a
+    #  Curity node that is up but unhealthy, independently of the ALB.
+    # =========================================================================
+    @staticmethod
+    def container_health_check(task_sizing):
+        """Return the ECS container health check for the Curity container"""
+        health_check = {
+            **DEFAULT_CONTAINER_HEALTH_CHECK,
+            **task_sizing.get("health_check", {}),
+        }
+        return ecs.HealthCheck(
+            command=[
+                "CMD-SHELL",
+                f"curl -sf http://localhost:{CURITY_HEALTH_PORT}/ || exit 1",
+            ],
+            interval=Duration.seconds(health_check["interval_seconds"]),
+            timeout=Duration.seconds(health_check["timeout_seconds"]),
+            retries=health_check["retries"],
+            start_period=Duration.seconds(health_check["start_period_seconds"]),
         )
 
-        return curity_runtime_image
+    #
+    #  Rolling deployment settings common to both services
+    #
+    #  The circuit breaker is opt-in, so deployed services keep their
+    #  deployment behaviour until an environment turns it on
+    # =========================================================================
+    @staticmethod
+    def deployment_options(deployment):
+        """Return the service keyword arguments for a rolling deployment"""
+        return {
+            "min_healthy_percent": deployment.get("min_healthy_percent"),
+            "max_healthy_percent": deployment.get("max_healthy_percent"),
+            "circuit_breaker": ecs.DeploymentCircuitBreaker(rollback=True)
+            if deployment.get("circuit_breaker", False)
+            else None,
+        }
 
     #
     #   create a Fargate Task Definition for the Curity Admin Docker image
@@ -55,15 +301,23 @@ class BaseFargateService:
     # https://towardsthecloud.com/amazon-ecs-execute-command-access-container
     # =========================================================================
     @staticmethod
-    def create_curity_task_definition(construct, curity_image, config, admin_task):
+    def create_curity_task_definition(construct, curity_image, config, admin_task, pool=None):
         """Create the Curity Task Definition"""
         # See https://curity.io/docs/idsvr/latest/system-admin-guide/system-requirements.html
         # for actual System Requirments.  e.g.  In production 8GB is recommended
+        # The sizes are set per environment by 'admin_task' and 'runtime_task' in cdk.json
+        # and a 'runtime_pools' entry has its own 'task', defaulting to 'runtime_task'
+        task_sizing = config.get("admin_task" if admin_task else "runtime_task", {})
+        task_id = "curity-admin-task" if admin_task else "curity-runtime-task"
+        if pool is not None:
+            task_sizing = pool.get("task", task_sizing)
+            task_id = f"curity-runtime-{pool['name']}-task"
         curity_task_definition = ecs.FargateTaskDefinition(
             construct,
-            "curity-admin-task" if admin_task else "curity-runtime-task",
-            cpu=1024,
-            memory_limit_mib=4096,
+            task_id,
+            cpu=task_sizing.get("cpu", DEFAULT_TASK_CPU),
+            memory_limit_mib=task_sizing.get("memory_mib", DEFAULT_TASK_MEMORY_MIB),
+            runtime_platform=BaseFargateService.runtime_platform(task_sizing),
         )
 
         container_port_mappings = [
@@ -75,22 +329,28 @@ class BaseFargateService:
 
         if admin_task:
             container_port_mappings.append(
-                ecs.PortMapping(container_port=6789, host_port=6789)
+                ecs.PortMapping(
+                    container_port=CURITY_CLUSTER_PORT,
+                    host_port=CURITY_CLUSTER_PORT,
+                    name=SERVICE_CONNECT_PORT_NAME
+                    if config.get("service_connect") is not None
+                    else None,
+                )
             )
 
         container_name = (
             "curity-admin-container" if admin_task else "curity-runtime-container"
         )
         envfile_asset: s3_assets.Asset = config.get("envfile_asset")
+        data_tier = config.get("data_tier")
 
         curity_task_definition.add_container(
             container_name,
-            image=ecs.ContainerImage.from_docker_image_asset(curity_image),
+            image=curity_image,
             port_mappings=container_port_mappings,
-            logging=ecs.AwsLogDriver(
-                stream_prefix="curityadmin" if admin_task else "curityruntime",
-                mode=ecs.AwsLogDriverMode.NON_BLOCKING,
-            ),
+            environment=BaseFargateService.jvm_environment(task_sizing),
+            health_check=BaseFargateService.container_health_check(task_sizing),
+            logging=BaseFargateService.curity_log_driver(config, admin_task),
             environment_files=[
                 ecs.EnvironmentFile.from_bucket(
                     envfile_asset.bucket, envfile_asset.s3_object_key
@@ -98,8 +358,29 @@ class BaseFargateService:
             ]
             if envfile_asset
             else None,
+            # The data source comes from Secrets Manager, never the env file
+            secrets=data_tier.container_secrets() if data_tier else None,
         )
 
+        #  The awslogs driver in this CDK version has no max-buffer-size property
+        #  so it is set directly.  The Curity container is always the first one,
+        #  which is also what makes it the load balancer target.
+        logging_config = config.get("logging", {})
+        if logging_config.get("driver", "awslogs") == "firelens":
+            BaseFargateService.add_firelens_log_router(
+                curity_task_definition, config, admin_task
+            )
+        elif "max_buffer_size_mib" in logging_config:
+            curity_task_definition.node.default_child.add_property_override(
+                "ContainerDefinitions.0.LogConfiguration.Options.max-buffer-size",
+                f"{logging_config['max_buffer_size_mib']}m",
+            )
+
+        if config.get("metrics") is not None:
+            BaseFargateService.add_metrics_sidecar(
+                construct, curity_task_definition, config, admin_task
+            )
+
         #
         #  Setting up the 'Task Role' -  The things we care about
         #  -  It will need Cloudwatch log access so that Curity can get its logs to Cloudwatch
@@ -139,3 +420,226 @@ class BaseFargateService:
         )
 
         return curity_task_definition
+
+    #
+    #  Register the service with ECS Service Connect from 'service_connect'
+    #
+    #  Each task gets a Service Connect proxy that learns the admin task's
+    #  address from ECS rather than from DNS, so a replacement admin task
+    #  is used as soon as it is healthy instead of after a DNS TTL, and new
+    #  runtime tasks connect without waiting for a Cloud Map record.  The
+    #  proxies publish connection metrics to CloudWatch under AWS/ECS.
+    #
+    #  The admin service is the server and the runtimes are clients only.
+    #  Timeouts are not in this CDK version's ServiceConnectService so are
+    #  set on the CloudFormation service.
+    # =========================================================================
+    @staticmethod
+    def enable_service_connect(service, config, admin_task):
+        """Enable Service Connect on the admin or runtime service"""
+        service_connect = config["service_connect"]
+        service.enable_service_connect(
+            # The ARN rather than the default name makes the service wait for the namespace
+            namespace=service.cluster.default_cloud_map_namespace.namespace_arn,
+            log_driver=BaseFargateService.aws_log_driver(
+                "curityadmin-service-connect"
+                if admin_task
+                else "curityruntime-service-connect",
+                config,
+            ),
+            services=[
+                ecs.ServiceConnectService(
+                    port_mapping_name=SERVICE_CONNECT_PORT_NAME,
+                    discovery_name="admin",
+                    dns_name=SERVICE_CONNECT_ADMIN_DNS_NAME,
+                    port=CURITY_CLUSTER_PORT,
+                )
+            ]
+            if admin_task
+            else None,
+        )
+
+        if admin_task and "idle_timeout_seconds" in service_connect:
+            service.node.default_child.add_property_override(
+                "ServiceConnectConfiguration.Services.0.Timeout.IdleTimeoutSeconds",
+                service_connect["idle_timeout_seconds"],
+            )
+
+    #
+    #  Add an ADOT collector sidecar to the task
+    #
+    #  The collector scrapes Curity's Prometheus endpoint over localhost
+    #  and remote-writes to the workspace using the task role, which is
+    #  why the task role has aps:RemoteWrite.  The configuration is passed
+    #  in AOT_CONFIG_CONTENT so no config file needs baking into an image.
+    #  JSON is valid YAML, so the collector reads it as is.
+    #
+    #  The sidecar is not essential; losing metrics must not stop Curity.
+    # =========================================================================
+    @staticmethod
+    def add_metrics_sidecar(construct, curity_task_definition, config, admin_task):
+        """Add a Prometheus scraping collector container to the task definition"""
+        metrics = config["metrics"]
+        service_label = "curity-admin" if admin_task else "curity-runtime"
+
+        scrape_config = {
+            "job_name": service_label,
+            "metrics_path": "/metrics",
+            "static_configs": [
+                {
+                    "targets": [f"localhost:{CURITY_METRICS_PORT}"],
+                    "labels": {"service": service_label},
+                }
+            ],
+        }
+        if metrics.get("metric_relabel_configs"):
+            scrape_config["metric_relabel_configs"] = metrics["metric_relabel_configs"]
+
+        collector_config = {
+            "extensions": {
+                "health_check": {},
+                "sigv4auth": {"region": Stack.of(construct).region, "service": "aps"},
+            },
+            "receivers": {
+                "prometheus": {
+                    "config": {
+                        "global": {
+                            "scrape_interval": f"{metrics.get('scrape_interval_seconds', 30)}s"
+                        },
+                        "scrape_configs": [scrape_config],
+                    }
+                }
+            },
+            "exporters": {
+                "prometheusremotewrite": {
+                    "endpoint": config["metrics_remote_write_url"],
+                    "auth": {"authenticator": "sigv4auth"},
+                }
+            },
+            "service": {
+                "extensions": ["health_check", "sigv4auth"],
+                "pipelines": {
+                    "metrics": {
+                        "receivers": ["prometheus"],
+                        "exporters": ["prometheusremotewrite"],
+                    }
+                },
+            },
+        }
+
+        curity_task_definition.add_container(
+            "curity-admin-metrics" if admin_task else "curity-runtime-metrics",
+            image=ecs.ContainerImage.from_registry(
+                metrics.get("collector_image", DEFAULT_COLLECTOR_IMAGE)
+            ),
+            essential=False,
+            memory_reservation_mib=128,
+            environment={
+                "AOT_CONFIG_CONTENT": Stack.of(construct).to_json_string(collector_config)
+            },
+            logging=BaseFargateService.aws_log_driver(
+                "curityadmin-metrics" if admin_task else "curityruntime-metrics", config
+            ),
+        )
+
+    #
+    #  Choose how the Curity container logs
+    #
+    #  'awslogs' sends every line to CloudWatch.  NON_BLOCKING mode means a
+    #  slow CloudWatch never stalls Curity, at the cost of dropping lines
+    #  once the buffer (max_buffer_size_mib) is full.
+    #
+    #  'firelens' adds a Fluent Bit log router which batches and gzips
+    #  everything to S3 or Firehose and copies only ERROR/FATAL lines to
+    #  CloudWatch.  See the firelens directory for the routing rules.
+    # =========================================================================
+    @staticmethod
+    def curity_log_driver(config, admin_task):
+        """Return the log driver for the Curity container"""
+        if config.get("logging", {}).get("driver", "awslogs") == "firelens":
+            return ecs.LogDrivers.firelens()
+
+        return BaseFargateService.aws_log_driver(
+            "curityadmin" if admin_task else "curityruntime", config
+        )
+
+    @staticmethod
+    def aws_log_driver(stream_prefix, config):
+        """Return a non-blocking CloudWatch log driver with the configured retention"""
+        retention_days = config.get("logging", {}).get("retention_days")
+        return ecs.AwsLogDriver(
+            stream_prefix=stream_prefix,
+            mode=ecs.AwsLogDriverMode.NON_BLOCKING,
+            log_retention=LOG_RETENTION[retention_days] if retention_days else None,
+        )
+
+    #
+    #  Add the Fluent Bit FireLens log router to the task
+    #
+    #  The routing config file and the error log group are created once
+    #  for the stack by CurityFargateCluster and shared by both services.
+    #  The router uses the task role to fetch its config and deliver logs.
+    # =========================================================================
+    @staticmethod
+    def add_firelens_log_router(curity_task_definition, config, admin_task):
+        """Add a Fluent Bit log router container to the task definition"""
+        firelens = config["logging"]["firelens"]
+        firelens_config_asset: s3_assets.Asset = config["firelens_config_asset"]
+        error_log_group: logs.LogGroup = config["error_log_group"]
+
+        environment = {
+            "aws_fluent_bit_init_s3_1": firelens_config_asset.bucket.arn_for_objects(
+                firelens_config_asset.s3_object_key
+            ),
+            "CURITY_LOG_SERVICE": "curity-admin" if admin_task else "curity-runtime",
+            "CURITY_ERROR_LOG_GROUP": error_log_group.log_group_name,
+        }
+
+        if firelens["destination"] == "s3":
+            environment.update(
+                {
+                    "CURITY_LOG_BUCKET": firelens["bucket_name"],
+                    "CURITY_LOG_BATCH_SIZE": f"{firelens.get('batch_size_mib', 50)}M",
+                    "CURITY_LOG_BATCH_TIMEOUT": f"{firelens.get('batch_timeout_seconds', 300)}s",
+                }
+            )
+            delivery_statement = iam.PolicyStatement(
+                actions=["s3:PutObject"],
+                resources=[
+                    f"arn:{Stack.of(curity_task_definition).partition}:s3:::"
+                    + f"{firelens['bucket_name']}/curity/*"
+                ],
+            )
+        else:
+            environment["CURITY_LOG_DELIVERY_STREAM"] = firelens["delivery_stream"]
+            delivery_statement = iam.PolicyStatement(
+                actions=["firehose:PutRecordBatch"],
+                resources=[
+                    Stack.of(curity_task_definition).format_arn(
+                        service="firehose",
+                        resource="deliverystream",
+                        resource_name=firelens["delivery_stream"],
+                    )
+                ],
+            )
+
+        curity_task_definition.add_firelens_log_router(
+            "curity-admin-log-router" if admin_task else "curity-runtime-log-router",
+            image=ecs.ContainerImage.from_registry(
+                firelens.get("router_image", DEFAULT_LOG_ROUTER_IMAGE)
+            ),
+            firelens_config=ecs.FirelensConfig(
+                type=ecs.FirelensLogRouterType.FLUENTBIT,
+                options=ecs.FirelensOptions(enable_ecs_log_metadata=True),
+            ),
+            environment=environment,
+            memory_reservation_mib=64,
+            logging=BaseFargateService.aws_log_driver(
+                "curityadmin-log-router" if admin_task else "curityruntime-log-router",
+                config,
+            ),
+        )
+
+        firelens_config_asset.grant_read(curity_task_definition.task_role)
+        error_log_group.grant_write(curity_task_definition.task_role)
+        curity_task_definition.add_to_task_role_policy(delivery_statement)
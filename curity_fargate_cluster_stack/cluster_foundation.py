@@ -0,0 +1,218 @@
+"""This module provides the CurityClusterFoundation class."""
+import os.path
+
+from aws_cdk import (
+    CfnOutput,
+    RemovalPolicy,
+    aws_aps as aps,
+    aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_logs as logs,
+    aws_s3_assets as s3_assets,
+)
+from curity_fargate_cluster_stack.base_fargate_service import (
+    FIRELENS_CONFIG_DIRECTORY,
+    LOG_RETENTION,
+)
+from curity_fargate_cluster_stack.data_tier import CurityDataTier
+
+
+#
+#  The VPC, ECS Cluster and shared resources that the Curity services are
+#  built on.  This is mixed into a Stack, either the single
+#  CurityFargateCluster stack or the network stack of the split layout,
+#  so the resources keep the same logical ids in both.
+class CurityClusterFoundation:
+    """This class creates the ECS Cluster and the resources shared by the Curity services."""
+
+    def create_cluster_foundation(self, config):
+        """lookup the vpc and create the cluster, returning both"""
+        #
+        #  1/ Lookup the VPC as this is assumed to have been pre-created for us
+        # =====================================================================
+        vpc = self.lookup_vpc(config)
+
+        #
+        #  1a/ Add any VPC endpoints requested so that task start up
+        #      traffic stays inside the VPC rather than going via NAT
+        # =====================================================================
+        if config.get("vpc_endpoints"):
+            self.create_vpc_endpoints(vpc, config["vpc_endpoints"])
+
+        #
+        #  2/ Sync the envfile if it is present
+        # =====================================================================
+        env_file = config.get("envfile")
+        if env_file:
+            config["envfile_asset"] = self.sync_envfile( env_file)
+
+        #
+        #  2a/ Sync the FireLens routing config if that log mode is chosen
+        # =====================================================================
+        logging_config = config.get("logging", {})
+        if logging_config.get("driver", "awslogs") == "firelens":
+            self.prepare_firelens(config, logging_config)
+
+        #
+        #  2b/ Create or lookup the Prometheus workspace if metrics are enabled
+        # =====================================================================
+        if config.get("metrics") is not None:
+            config["metrics_remote_write_url"] = self.prometheus_remote_write_url(
+                config["metrics"]
+            )
+
+        #
+        #  2c/ Create the Aurora cluster and RDS Proxy for the Curity data
+        #      source if configured.  The services are opened to the proxy
+        #      once they exist.
+        # =====================================================================
+        if config.get("database") is not None:
+            config["data_tier"] = CurityDataTier(self, vpc, config)
+
+        #
+        # 3/  Create an ECS Cluster inside the VPC
+        # This will also create a private Cloud Map namespace
+        # to allow the services to discover each other
+        # =====================================================================
+        curity_cluster = self.create_cluster_from_vpc(vpc, config)
+
+        return vpc, curity_cluster
+
+    #
+    #  lookup the VPC -  Otherwise raise an exception
+    # ==================================================================
+    def lookup_vpc(self, config):
+        """lookup an existing vpc based on its name"""
+        vpc = ec2.Vpc.from_lookup(self, "VPC", vpc_name=config.get("vpcname"))
+        if not vpc:
+            raise Exception(f"Failed to find VPC: '${config.get('vpcname')}'")
+        return vpc
+
+    #
+    #  create the requested VPC endpoints for the private subnets
+    #
+    #  S3 is a free gateway endpoint on the private route tables and carries
+    #  both the env file and the ECR image layers.  The rest are interface
+    #  endpoints with private DNS, open to the VPC CIDR on 443.
+    # ==================================================================
+    def create_vpc_endpoints(self, vpc, vpc_endpoints):
+        """create gateway and interface endpoints so tasks can skip the NAT"""
+        private_subnets = ec2.SubnetSelection(
+            subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+        )
+        interface_endpoints = {
+            "ecr_api": ("EcrApiEndpoint", ec2.InterfaceVpcEndpointAwsService.ECR),
+            "ecr_dkr": ("EcrDockerEndpoint", ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER),
+            "logs": ("LogsEndpoint", ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS),
+            "ssm": ("SsmEndpoint", ec2.InterfaceVpcEndpointAwsService.SSM),
+            "ssm_messages": (
+                "SsmMessagesEndpoint",
+                ec2.InterfaceVpcEndpointAwsService.SSM_MESSAGES,
+            ),
+        }
+
+        for endpoint in vpc_endpoints:
+            if endpoint == "s3":
+                vpc.add_gateway_endpoint(
+                    "S3Endpoint",
+                    service=ec2.GatewayVpcEndpointAwsService.S3,
+                    subnets=[private_subnets],
+                )
+            else:
+                endpoint_id, service = interface_endpoints[endpoint]
+                vpc.add_interface_endpoint(
+                    endpoint_id,
+                    service=service,
+                    subnets=private_subnets,
+                    private_dns_enabled=True,
+                )
+
+    #
+    #   create an ECS Cluster inside the supplied VPC
+    # =========================================================================
+    def create_cluster_from_vpc(self, vpc, config):
+        """create an ec2 cluster and associate a cloudmap namespace
+        ready for any services to use"""
+        # The FARGATE and FARGATE_SPOT capacity providers are made available
+        # but there is no default strategy, so services that don't ask for
+        # one (e.g. the Admin Service) keep using the on-demand FARGATE launch type
+        # Container Insights provides the task counts used by the dashboard
+        curity_cluster = ecs.Cluster(
+            self,
+            "curityvpcid",
+            vpc=vpc,
+            cluster_name="curity-cluster",
+            enable_fargate_capacity_providers=True,
+            container_insights=True if config.get("dashboard") is not None else None,
+        )
+
+        # Adding service discovery namespace to cluster
+        self.namespace = curity_cluster.add_default_cloud_map_namespace(name="curity")
+
+        return curity_cluster
+
+    #
+    #  Find the remote write URL of the Prometheus workspace for the metrics
+    #  sidecars, creating a workspace if one has not been supplied
+    # ==================================================================
+    def prometheus_remote_write_url(self, metrics):
+        """create or lookup an Amazon Managed Prometheus workspace"""
+        workspace_id = metrics.get("workspace_id")
+        if workspace_id:
+            prometheus_endpoint = (
+                f"https://aps-workspaces.{self.region}.amazonaws.com"
+                + f"/workspaces/{workspace_id}/"
+            )
+        else:
+            workspace = aps.CfnWorkspace(self, "CurityMetrics", alias="curity-metrics")
+            prometheus_endpoint = workspace.attr_prometheus_endpoint
+            CfnOutput(self, "PrometheusWorkspaceId", value=workspace.attr_workspace_id)
+
+        CfnOutput(self, "PrometheusEndpoint", value=prometheus_endpoint)
+
+        return prometheus_endpoint + "api/v1/remote_write"
+
+    #
+    #  Upload the Fluent Bit routing config and create the log group that
+    #  receives the error lines, for the log routers in both services
+    # ==================================================================
+    def prepare_firelens(self, config, logging_config):
+        """create the shared resources for the FireLens log mode"""
+        config["firelens_config_asset"] = s3_assets.Asset(
+            self,
+            "CurityFireLensConfig",
+            path=os.path.join(
+                FIRELENS_CONFIG_DIRECTORY,
+                f"{logging_config['firelens']['destination']}-output.conf",
+            ),
+        )
+
+        retention_days = logging_config.get("retention_days")
+        config["error_log_group"] = logs.LogGroup(
+            self,
+            "CurityErrorLogs",
+            retention=LOG_RETENTION[retention_days]
+            if retention_days
+            else logs.RetentionDays.ONE_MONTH,
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+        CfnOutput(
+            self, "CurityErrorLogGroup", value=config["error_log_group"].log_group_name
+        )
+
+    #
+    #  sync the env file to an S3 bucket  -  Otherwise raise an exception
+    # ==================================================================
+    def sync_envfile(self, env_file):
+        """This class contains the CDK code to synchronize our Curity
+        environment file to an S3 bucket so that it can be referenced by the
+        Fargate service classes."""
+
+        # Create an Asset from the local file and upload it to the S3 bucket if it has changed
+        asset = s3_assets.Asset(self, "CurityEnvFile", path=env_file)
+
+        CfnOutput(self, "S3BucketName", value=asset.s3_bucket_name)
+        CfnOutput(self, "S3ObjectKey", value=asset.s3_object_key)
+        CfnOutput(self, "S3HttpURL", value=asset.http_url)
+
+        return asset
@@ -0,0 +1,39 @@
+"""This module builds the Curity stacks for a cdk App, see app.py and synth_all.py."""
+import os
+
+import aws_cdk as cdk
+
+from curity_fargate_cluster_stack.curity_fargate_cluster import CurityFargateCluster
+from curity_fargate_cluster_stack.curity_split_stacks import build_split_stacks
+from curity_fargate_cluster_stack.curity_aws_env_config import get_config
+
+
+def create_curity_stacks(app: cdk.App):
+    """create the stacks for the Curity AWS environment selected on the app's context"""
+    config = get_config(app)
+
+    #
+    #  'stack_layout': 'split' in cdk.json deploys the cluster as separate
+    #  Network, Admin, Runtime and Support stacks, otherwise it is one stack
+    curity_stack_factory = (
+        build_split_stacks if config.get("stack_layout") == "split" else CurityFargateCluster
+    )
+
+    curity_stack_factory(
+        app,
+        "CurityFargateCluster",
+        # If you don't specify 'env', this stack will be environment-agnostic.
+        # Account/Region-dependent features and context lookups will not work,
+        # but a single synthesized template can be deployed anywhere.
+        # The 'account' and 'region' in cdk.json pin an environment, otherwise
+        # the AWS Account and Region implied by the current CLI configuration are used.
+        env=cdk.Environment(
+            account=config.get("account", os.getenv("CDK_DEFAULT_ACCOUNT")),
+            region=config.get("region", os.getenv("CDK_DEFAULT_REGION")),
+        ),
+        # For more information, see
+        #  https://docs.aws.amazon.com/cdk/latest/guide/environments.html
+        config=config,
+    )
+
+    return config
@@ -4,11 +4,448 @@ import os.path
 from jsonschema import validate
 from aws_cdk import App
 
+#
+#  Autoscaling settings for the Curity Runtime Service.
+#  Schedules are passed straight through to Application Auto Scaling so
+#  use its own syntax, e.g. "cron(0 7 ? * MON-FRI *)"
+# =========================================================================
+scaling_schema = {
+    "type": "object",
+    "properties": {
+        "min_capacity": {"type": "integer", "minimum": 1},
+        "max_capacity": {"type": "integer", "minimum": 1},
+        "cpu_target_percent": {"type": "number", "exclusiveMinimum": 0, "maximum": 100},
+        "memory_target_percent": {"type": "number", "exclusiveMinimum": 0, "maximum": 100},
+        "requests_per_target": {"type": "integer", "minimum": 1},
+        "scale_in_cooldown_seconds": {"type": "integer", "minimum": 0},
+        "scale_out_cooldown_seconds": {"type": "integer", "minimum": 0},
+        "scheduled": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "pattern": "^[A-Za-z0-9-]+$"},
+                    "schedule": {"type": "string", "pattern": r"^(cron|rate|at)\(.+\)$"},
+                    "min_capacity": {"type": "integer", "minimum": 0},
+                    "max_capacity": {"type": "integer", "minimum": 1},
+                },
+                "required": ["name", "schedule"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["min_capacity", "max_capacity"],
+    "additionalProperties": False,
+}
+
+#
+#  Task sizing for the Curity Admin and Runtime tasks.
+#  The JVM heap is derived from memory_mib, see BaseFargateService.jvm_environment
+# =========================================================================
+DEFAULT_TASK_CPU = 1024
+DEFAULT_TASK_MEMORY_MIB = 4096
+# Below this there is no room for a useful heap once the JVM's off-heap memory is reserved
+MIN_TASK_MEMORY_MIB = 2048
+
+# The cpu units Fargate supports and the memory sizes (MiB) allowed for each
+# See https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-cpu-memory-error.html
+FARGATE_TASK_SIZES = {
+    256: [512, 1024, 2048],
+    512: list(range(1024, 4096 + 1, 1024)),
+    1024: list(range(2048, 8192 + 1, 1024)),
+    2048: list(range(4096, 16384 + 1, 1024)),
+    4096: list(range(8192, 30720 + 1, 1024)),
+    8192: list(range(16384, 61440 + 1, 4096)),
+    16384: list(range(32768, 122880 + 1, 8192)),
+}
+
+task_schema = {
+    "type": "object",
+    "properties": {
+        "cpu": {"type": "integer", "enum": list(FARGATE_TASK_SIZES)},
+        "memory_mib": {"type": "integer"},
+        "heap_percent": {"type": "integer", "minimum": 25, "maximum": 90},
+        "gc": {"type": "string", "enum": ["G1", "Parallel", "Z"]},
+        "java_opts": {"type": "string"},
+        "cpu_architecture": {"type": "string", "enum": ["X86_64", "ARM64"]},
+        "health_check": {
+            "type": "object",
+            "properties": {
+                "interval_seconds": {"type": "integer", "minimum": 5, "maximum": 300},
+                "timeout_seconds": {"type": "integer", "minimum": 2, "maximum": 60},
+                "retries": {"type": "integer", "minimum": 1, "maximum": 10},
+                "start_period_seconds": {"type": "integer", "minimum": 0, "maximum": 300},
+            },
+            "additionalProperties": False,
+        },
+    },
+    "additionalProperties": False,
+}
+
+#
+#  Capacity provider strategy for the Curity Runtime Service.
+#  The first 'on_demand_base' tasks always run on FARGATE, the rest are
+#  split between FARGATE and FARGATE_SPOT in the ratio of the weights.
+# =========================================================================
+runtime_capacity_schema = {
+    "type": "object",
+    "properties": {
+        "on_demand_base": {"type": "integer", "minimum": 0},
+        "on_demand_weight": {"type": "integer", "minimum": 0},
+        "spot_weight": {"type": "integer", "minimum": 0},
+    },
+    "additionalProperties": False,
+}
+
+#
+#  Runtime load balancer and target group tuning.
+#  Anything not set keeps the Elastic Load Balancing default.
+# =========================================================================
+ALB_ONLY_LOAD_BALANCER_SETTINGS = [
+    "algorithm",
+    "slow_start_seconds",
+    "idle_timeout_seconds",
+    "http2",
+    "stickiness_seconds",
+]
+
+load_balancer_schema = {
+    "type": "object",
+    "properties": {
+        "frontend": {"type": "string", "enum": ["alb", "nlb"]},
+        "tls": {"type": "string", "enum": ["passthrough", "terminate"]},
+        "algorithm": {
+            "type": "string",
+            "enum": ["round_robin", "least_outstanding_requests"],
+        },
+        "slow_start_seconds": {"type": "integer", "minimum": 30, "maximum": 900},
+        "deregistration_delay_seconds": {"type": "integer", "minimum": 0, "maximum": 3600},
+        "idle_timeout_seconds": {"type": "integer", "minimum": 1, "maximum": 4000},
+        "http2": {"type": "boolean"},
+        "stickiness_seconds": {"type": "integer", "minimum": 1, "maximum": 604800},
+        "health_check": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "pattern": "^/"},
+                "interval_seconds": {"type": "integer", "minimum": 5, "maximum": 300},
+                "timeout_seconds": {"type": "integer", "minimum": 2, "maximum": 120},
+                "healthy_threshold": {"type": "integer", "minimum": 2, "maximum": 10},
+                "unhealthy_threshold": {"type": "integer", "minimum": 2, "maximum": 10},
+            },
+            "additionalProperties": False,
+        },
+    },
+    "additionalProperties": False,
+}
+
+#
+#  Optional ADOT collector sidecar that scrapes the Curity metrics port
+#  and remote-writes to Amazon Managed Service for Prometheus.
+#  If no workspace_id is given the stack creates a workspace.
+# =========================================================================
+metrics_schema = {
+    "type": "object",
+    "properties": {
+        "workspace_id": {"type": "string", "pattern": "^ws-"},
+        "scrape_interval_seconds": {"type": "integer", "minimum": 5, "maximum": 300},
+        "collector_image": {"type": "string"},
+        "metric_relabel_configs": {"type": "array", "items": {"type": "object"}},
+    },
+    "additionalProperties": False,
+}
+
+#
+#  Optional CloudWatch dashboard and alarms.  Only the alarms whose
+#  thresholds are set are created.
+# =========================================================================
+dashboard_schema = {
+    "type": "object",
+    "properties": {
+        "period_minutes": {"type": "integer", "enum": [1, 5, 15, 60]},
+        "alarms": {
+            "type": "object",
+            "properties": {
+                "evaluation_periods": {"type": "integer", "minimum": 1},
+                "sns_topic_arn": {"type": "string", "pattern": "^arn:"},
+                "p99_response_time_seconds": {"type": "number", "exclusiveMinimum": 0},
+                "target_5xx_count": {"type": "integer", "minimum": 0},
+                "runtime_cpu_percent": {"type": "number", "exclusiveMinimum": 0, "maximum": 100},
+                "runtime_memory_percent": {"type": "number", "exclusiveMinimum": 0, "maximum": 100},
+                "admin_cpu_percent": {"type": "number", "exclusiveMinimum": 0, "maximum": 100},
+                "admin_memory_percent": {"type": "number", "exclusiveMinimum": 0, "maximum": 100},
+                "min_healthy_hosts": {"type": "integer", "minimum": 1},
+            },
+            "additionalProperties": False,
+        },
+    },
+    "additionalProperties": False,
+}
+
+#
+#  Container logging.  'awslogs' (the default) sends the Curity logs
+#  straight to CloudWatch, 'firelens' adds a Fluent Bit log router that
+#  batches them to S3 or Firehose and only sends errors to CloudWatch.
+# =========================================================================
+LOG_RETENTION_DAYS = [1, 3, 5, 7, 14, 30, 60, 90, 120, 150, 180, 365, 400, 545, 731, 1827, 3653]
+
+logging_schema = {
+    "type": "object",
+    "properties": {
+        "driver": {"type": "string", "enum": ["awslogs", "firelens"]},
+        "max_buffer_size_mib": {"type": "integer", "minimum": 1},
+        "retention_days": {"type": "integer", "enum": LOG_RETENTION_DAYS},
+        "firelens": {
+            "type": "object",
+            "properties": {
+                "destination": {"type": "string", "enum": ["s3", "firehose"]},
+                "bucket_name": {"type": "string"},
+                "delivery_stream": {"type": "string"},
+                # s3-output.conf uploads with PutObject, which Fluent Bit caps at 1G
+                "batch_size_mib": {"type": "integer", "minimum": 1, "maximum": 1024},
+                "batch_timeout_seconds": {"type": "integer", "minimum": 10},
+                "router_image": {"type": "string"},
+            },
+            "required": ["destination"],
+            "additionalProperties": False,
+        },
+    },
+    "additionalProperties": False,
+}
+
+#
+#  VPC endpoints to create in the private subnets so image pulls, the env
+#  file, logs and ECS Exec traffic do not go through the NAT gateway.
+#  Leave out any endpoint that already exists in the VPC.
+# =========================================================================
+vpc_endpoints_schema = {
+    "type": "array",
+    "items": {
+        "type": "string",
+        "enum": ["ecr_api", "ecr_dkr", "s3", "logs", "ssm", "ssm_messages"],
+    },
+    "uniqueItems": True,
+}
+
+#
+#  Rolling deployment settings for the Admin and Runtime services.
+#  The circuit breaker (with rollback) is on unless it is turned off here.
+#  The health check grace period only applies behind the load balancer.
+# =========================================================================
+admin_deployment_schema = {
+    "type": "object",
+    "properties": {
+        "min_healthy_percent": {"type": "integer", "minimum": 0, "maximum": 100},
+        "max_healthy_percent": {"type": "integer", "minimum": 100, "maximum": 200},
+        "circuit_breaker": {"type": "boolean"},
+    },
+    "additionalProperties": False,
+}
+
+runtime_deployment_schema = {
+    **admin_deployment_schema,
+    "properties": {
+        **admin_deployment_schema["properties"],
+        "health_check_grace_seconds": {"type": "integer", "minimum": 0, "maximum": 2147483647},
+    },
+}
+
+#
+#  ECS Service Connect for the runtime to admin cluster traffic on 6789.
+#  The services register on the existing 'curity' namespace and talk via
+#  a proxy in each task.  idle_timeout_seconds closes a cluster connection
+#  after it has been idle that long, 0 keeps idle connections open.
+# =========================================================================
+service_connect_schema = {
+    "type": "object",
+    "properties": {
+        "idle_timeout_seconds": {"type": "integer", "minimum": 0},
+    },
+    "additionalProperties": False,
+}
+
+#
+#  Optional CloudFront distribution in front of the runtime ALB.
+#  Only the 'cache_behaviors' paths are cached, for their ttl_seconds, and
+#  everything else (token, authorize, session ...) passes straight through.
+#  The ALB then moves to origin_domain_name and only forwards requests that
+#  carry CloudFront's secret origin header.
+# =========================================================================
+# CloudFront's default quota of cache behaviours per distribution
+MAX_EDGE_CACHE_BEHAVIORS = 25
+
+edge_schema = {
+    "type": "object",
+    "properties": {
+        "origin_domain_name": {"type": "string"},
+        "origin_prefix_list_id": {"type": "string", "pattern": "^pl-[0-9a-f]+$"},
+        "alias_records": {"type": "boolean"},
+        "price_class": {
+            "type": "string",
+            "enum": ["PriceClass_100", "PriceClass_200", "PriceClass_All"],
+        },
+        "cache_behaviors": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "path_pattern": {"type": "string", "pattern": "^/"},
+                    "ttl_seconds": {"type": "integer", "minimum": 0},
+                    "max_ttl_seconds": {"type": "integer", "minimum": 0},
+                },
+                "required": ["path_pattern", "ttl_seconds"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "additionalProperties": False,
+}
+
+#
+#  The one-off Fargate task that runs the load test harness against the
+#  runtime from inside the VPC.  rate and duration_seconds are the
+#  defaults for a run, which run-task can override.
+# =========================================================================
+load_test_schema = {
+    "type": "object",
+    "properties": {
+        "target_url": {"type": "string", "pattern": "^https?://"},
+        "client_id": {"type": "string"},
+        "client_secret_name": {"type": "string"},
+        "verify_tls": {"type": "boolean"},
+        "rate": {"type": "number", "exclusiveMinimum": 0},
+        "duration_seconds": {"type": "number", "exclusiveMinimum": 0},
+        "cpu": {"type": "integer", "enum": [256, 512, 1024, 2048, 4096]},
+        "memory_mib": {"type": "integer"},
+    },
+    "required": ["client_id", "client_secret_name"],
+    "additionalProperties": False,
+}
+
+#
+#  Optional Aurora PostgreSQL cluster for the Curity data source, reached
+#  through an RDS Proxy.  The 'proxy' percentages are of the database's
+#  max_connections; anything not set keeps the RDS Proxy default.
+# =========================================================================
+database_schema = {
+    "type": "object",
+    "properties": {
+        "engine_version": {"type": "string", "pattern": r"^[0-9]+\.[0-9]+$"},
+        "instance_type": {"type": "string", "pattern": r"^[a-z0-9]+\.[a-z0-9]+$"},
+        "instances": {"type": "integer", "minimum": 1, "maximum": 16},
+        "database_name": {"type": "string", "pattern": "^[A-Za-z][A-Za-z0-9_]*$"},
+        "backup_retention_days": {"type": "integer", "minimum": 1, "maximum": 35},
+        "deletion_protection": {"type": "boolean"},
+        "proxy": {
+            "type": "object",
+            "properties": {
+                "max_connections_percent": {"type": "integer", "minimum": 1, "maximum": 100},
+                "max_idle_connections_percent": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "maximum": 100,
+                },
+                "borrow_timeout_seconds": {"type": "integer", "minimum": 1, "maximum": 3600},
+                "idle_client_timeout_seconds": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 28800,
+                },
+            },
+            "additionalProperties": False,
+        },
+    },
+    "additionalProperties": False,
+}
+
+#
+#  Further runtime services behind the runtime ALB, each serving the
+#  requests that match its path_patterns with its own task size, task
+#  count and scaling.  The task defaults to 'runtime_task'.
+# =========================================================================
+# An ALB rule has at most 5 condition values and 'edge' uses one of them
+MAX_POOL_PATH_PATTERNS = 5
+
+runtime_pools_schema = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string", "pattern": "^[a-z][a-z0-9-]{0,19}$"},
+            "path_patterns": {
+                "type": "array",
+                "items": {"type": "string", "pattern": "^/", "maxLength": 128},
+                "minItems": 1,
+                "maxItems": MAX_POOL_PATH_PATTERNS,
+            },
+            "task": task_schema,
+            "desired_count": {"type": "integer", "minimum": 1},
+            "scaling": scaling_schema,
+        },
+        "required": ["name", "path_patterns"],
+        "additionalProperties": False,
+    },
+}
+
+#
+#  Prebuilt images in ECR to run instead of building the Dockerfiles
+#  at synth time.  Use either an immutable digest or a tag.
+# =========================================================================
+image_schema = {
+    "type": "object",
+    "properties": {
+        "repository_name": {"type": "string"},
+        "tag": {"type": "string"},
+        "digest": {"type": "string", "pattern": "^sha256:[0-9a-f]{64}$"},
+    },
+    "required": ["repository_name"],
+    "oneOf": [{"required": ["tag"]}, {"required": ["digest"]}],
+    "additionalProperties": False,
+}
+
+#
+#  How the admin and runtime images are built when no prebuilt image is set
+# =========================================================================
+image_build_schema = {
+    "type": "object",
+    "properties": {
+        "directory": {"type": "string"},
+        "file": {"type": "string"},
+        "admin_target": {"type": "string"},
+        "runtime_target": {"type": "string"},
+        "build_args": {"type": "object", "additionalProperties": {"type": "string"}},
+        "cache_repository": {"type": "string"},
+        "exclude": {"type": "array", "items": {"type": "string"}},
+    },
+    "additionalProperties": False,
+}
+
 schema = {
     "type": "object",
     "properties": {
         "vpcname": {"type": "string"},
+        "account": {"type": "string", "pattern": "^[0-9]{12}$"},
+        "region": {"type": "string"},
         "envfile": {"type": "string"},
+        "scaling": scaling_schema,
+        "admin_task": task_schema,
+        "runtime_task": task_schema,
+        "runtime_capacity": runtime_capacity_schema,
+        "load_balancer": load_balancer_schema,
+        "metrics": metrics_schema,
+        "dashboard": dashboard_schema,
+        "logging": logging_schema,
+        "vpc_endpoints": vpc_endpoints_schema,
+        "admin_deployment": admin_deployment_schema,
+        "runtime_deployment": runtime_deployment_schema,
+        "service_connect": service_connect_schema,
+        "edge": edge_schema,
+        "load_test": load_test_schema,
+        "database": database_schema,
+        "runtime_pools": runtime_pools_schema,
+        "admin_image": image_schema,
+        "runtime_image": image_schema,
+        "image_build": image_build_schema,
+        "stack_layout": {"type": "string", "enum": ["single", "split"]},
     },
     "required": ["vpcname"],
 }
@@ -42,5 +479,275 @@ def get_config(app:App):
             " in cdk.json but this file does not exist."
         )
 
+    validate_scaling(target_config.get("scaling"))
+    validate_task_size("admin_task", target_config.get("admin_task", {}))
+    validate_task_size("runtime_task", target_config.get("runtime_task", {}))
+    validate_runtime_capacity(target_config.get("runtime_capacity"))
+    validate_load_balancer(target_config.get("load_balancer"))
+    validate_nlb_frontend(target_config)
+    validate_edge(target_config)
+    validate_load_test(target_config.get("load_test"))
+    validate_database(target_config.get("database"))
+    validate_runtime_pools(target_config)
+    validate_logging(target_config.get("logging"))
+    for name in ("admin_task", "runtime_task"):
+        validate_health_check(name, target_config.get(name, {}).get("health_check", {}))
 
     return target_config
+
+
+def validate_scaling(scaling):
+    """check the 'scaling' settings that the json schema cannot express"""
+    if not scaling:
+        return
+
+    if scaling["min_capacity"] > scaling["max_capacity"]:
+        raise LookupError(
+            f"The 'scaling' min_capacity ({scaling['min_capacity']}) is greater"
+            + f" than its max_capacity ({scaling['max_capacity']}) in cdk.json."
+        )
+
+    for action in scaling.get("scheduled", []):
+        if action.get("min_capacity") is None and action.get("max_capacity") is None:
+            raise LookupError(
+                f"The '{action['name']}' scheduled scaling action must set"
+                + " min_capacity, max_capacity or both."
+            )
+        if action.get("min_capacity", 0) > action.get("max_capacity", scaling["max_capacity"]):
+            raise LookupError(
+                f"The '{action['name']}' scheduled scaling action has a min_capacity"
+                + " greater than its max_capacity."
+            )
+
+
+def validate_task_size(name, task):
+    """check the task cpu and memory are a combination that Fargate accepts"""
+    cpu = task.get("cpu", DEFAULT_TASK_CPU)
+    memory_mib = task.get("memory_mib", DEFAULT_TASK_MEMORY_MIB)
+    if memory_mib < MIN_TASK_MEMORY_MIB:
+        raise LookupError(
+            f"The '{name}' memory_mib of {memory_mib} is too small for Curity."
+            + f"  At least {MIN_TASK_MEMORY_MIB} is required."
+        )
+    if memory_mib not in FARGATE_TASK_SIZES[cpu]:
+        raise LookupError(
+            f"The '{name}' memory_mib of {memory_mib} is not supported by Fargate"
+            + f" for {cpu} cpu units.  Valid values are {FARGATE_TASK_SIZES[cpu]}."
+        )
+
+
+def validate_runtime_capacity(runtime_capacity):
+    """check the runtime capacity provider strategy can place tasks"""
+    if not runtime_capacity:
+        return
+
+    if (
+        runtime_capacity.get("on_demand_weight", 0) == 0
+        and runtime_capacity.get("spot_weight", 0) == 0
+    ):
+        raise LookupError(
+            "The 'runtime_capacity' block must give on_demand_weight or"
+            + " spot_weight a value greater than 0."
+        )
+
+
+def validate_load_balancer(load_balancer):
+    """check the 'load_balancer' settings that the json schema cannot express"""
+    if not load_balancer:
+        return
+
+    if (
+        load_balancer.get("algorithm") == "least_outstanding_requests"
+        and "slow_start_seconds" in load_balancer
+    ):
+        raise LookupError(
+            "The 'load_balancer' slow_start_seconds cannot be combined with the"
+            + " least_outstanding_requests algorithm."
+        )
+
+    health_check = load_balancer.get("health_check", {})
+    if health_check.get("timeout_seconds", 5) >= health_check.get("interval_seconds", 30):
+        raise LookupError(
+            "The 'load_balancer' health_check timeout_seconds must be less than"
+            + " its interval_seconds."
+        )
+
+
+def validate_nlb_frontend(target_config):
+    """check that nothing configured needs the ALB when 'frontend' is 'nlb'"""
+    load_balancer = target_config.get("load_balancer") or {}
+    if load_balancer.get("frontend", "alb") != "nlb":
+        if "tls" in load_balancer:
+            raise LookupError(
+                "The 'load_balancer' tls setting is only used with 'frontend': 'nlb'."
+            )
+        return
+
+    alb_only = [name for name in ALB_ONLY_LOAD_BALANCER_SETTINGS if name in load_balancer]
+    if alb_only:
+        raise LookupError(
+            f"The 'load_balancer' settings {alb_only} are not supported by"
+            + " the 'nlb' frontend."
+        )
+
+    # aws-cdk-lib 2.70 still applies the original NLB health check limits
+    health_check = load_balancer.get("health_check", {})
+    if "timeout_seconds" in health_check:
+        raise LookupError(
+            "The 'load_balancer' health_check timeout_seconds cannot be set with"
+            + " the 'nlb' frontend, NLB HTTP health checks time out after 6 seconds."
+        )
+    if health_check.get("healthy_threshold", 3) != health_check.get("unhealthy_threshold", 3):
+        raise LookupError(
+            "The 'load_balancer' health_check healthy_threshold and unhealthy_threshold"
+            + " must be the same with the 'nlb' frontend."
+        )
+
+    if "requests_per_target" in (target_config.get("scaling") or {}):
+        raise LookupError(
+            "The 'scaling' requests_per_target policy needs ALB request counts"
+            + " and cannot be used with the 'nlb' frontend."
+        )
+
+    alarms = (target_config.get("dashboard") or {}).get("alarms", {})
+    alb_alarms = [
+        name for name in ("p99_response_time_seconds", "target_5xx_count") if name in alarms
+    ]
+    if alb_alarms:
+        raise LookupError(
+            f"The 'dashboard' alarms {alb_alarms} need ALB metrics and cannot be"
+            + " used with the 'nlb' frontend."
+        )
+
+
+def validate_edge(target_config):
+    """check the 'edge' cache behaviours and that the runtime is behind an ALB"""
+    edge = target_config.get("edge")
+    if edge is None:
+        return
+
+    # The origin header check is an ALB listener rule
+    if (target_config.get("load_balancer") or {}).get("frontend", "alb") != "alb":
+        raise LookupError("The 'edge' distribution needs the 'alb' load_balancer frontend.")
+
+    cache_behaviors = edge.get("cache_behaviors", [])
+    if len(cache_behaviors) > MAX_EDGE_CACHE_BEHAVIORS:
+        raise LookupError(
+            f"The 'edge' block has {len(cache_behaviors)} cache_behaviors,"
+            + f" CloudFront allows {MAX_EDGE_CACHE_BEHAVIORS}."
+        )
+
+    path_patterns = [behavior["path_pattern"] for behavior in cache_behaviors]
+    duplicates = sorted({path for path in path_patterns if path_patterns.count(path) > 1})
+    if duplicates:
+        raise LookupError(f"The 'edge' cache_behaviors repeat the paths {duplicates}.")
+
+    for behavior in cache_behaviors:
+        if behavior.get("max_ttl_seconds", behavior["ttl_seconds"]) < behavior["ttl_seconds"]:
+            raise LookupError(
+                f"The 'edge' cache behavior for '{behavior['path_pattern']}' has a"
+                + " max_ttl_seconds below its ttl_seconds."
+            )
+
+
+def validate_load_test(load_test):
+    """check the load test task size is one Fargate supports"""
+    if load_test is None:
+        return
+
+    cpu = load_test.get("cpu", 512)
+    memory_mib = load_test.get("memory_mib", 1024)
+    if memory_mib not in FARGATE_TASK_SIZES[cpu]:
+        raise LookupError(
+            f"The 'load_test' memory_mib of {memory_mib} is not supported by Fargate"
+            + f" for {cpu} cpu units.  Valid values are {FARGATE_TASK_SIZES[cpu]}."
+        )
+
+
+def validate_database(database):
+    """check the 'database' proxy pool settings are consistent"""
+    if not database:
+        return
+
+    proxy = database.get("proxy", {})
+    if proxy.get("max_idle_connections_percent", 0) > proxy.get("max_connections_percent", 100):
+        raise LookupError(
+            "The 'database' proxy max_idle_connections_percent cannot be greater"
+            + " than its max_connections_percent."
+        )
+
+
+def validate_runtime_pools(target_config):
+    """check the 'runtime_pools' can share the runtime ALB and image"""
+    runtime_pools = target_config.get("runtime_pools")
+    if not runtime_pools:
+        return
+
+    # The pools are routed to by ALB listener rules
+    if (target_config.get("load_balancer") or {}).get("frontend", "alb") != "alb":
+        raise LookupError("The 'runtime_pools' need the 'alb' load_balancer frontend.")
+
+    names = [pool["name"] for pool in runtime_pools]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise LookupError(f"The 'runtime_pools' repeat the names {duplicates}.")
+
+    path_patterns = [path for pool in runtime_pools for path in pool["path_patterns"]]
+    duplicates = sorted({path for path in path_patterns if path_patterns.count(path) > 1})
+    if duplicates:
+        raise LookupError(f"The 'runtime_pools' repeat the path_patterns {duplicates}.")
+
+    runtime_task = target_config.get("runtime_task", {})
+    for pool in runtime_pools:
+        name = f"runtime_pools {pool['name']}"
+        if "edge" in target_config and len(pool["path_patterns"]) >= MAX_POOL_PATH_PATTERNS:
+            raise LookupError(
+                f"The '{name}' pool can have at most {MAX_POOL_PATH_PATTERNS - 1}"
+                + " path_patterns with 'edge', whose origin header takes a rule condition."
+            )
+        if "desired_count" in pool and "scaling" in pool:
+            raise LookupError(
+                f"The '{name}' pool sets desired_count and scaling, the scaling"
+                + " min_capacity is its task count."
+            )
+        validate_scaling(pool.get("scaling"))
+
+        # The pools run the runtime image, which is built for one architecture
+        task = pool.get("task", runtime_task)
+        if task.get("cpu_architecture", "X86_64") != runtime_task.get(
+            "cpu_architecture", "X86_64"
+        ):
+            raise LookupError(
+                f"The '{name}' task cpu_architecture must be the same as the"
+                + " 'runtime_task' one, as they run the same image."
+            )
+        validate_task_size(f"{name} task", task)
+        validate_health_check(f"{name} task", task.get("health_check", {}))
+
+
+def validate_logging(logging):
+    """check the FireLens destination has what it needs to deliver logs"""
+    if not logging or logging.get("driver", "awslogs") != "firelens":
+        return
+
+    firelens = logging.get("firelens")
+    if not firelens:
+        raise LookupError(
+            "The 'logging' driver is 'firelens' but there is no 'firelens' block in cdk.json."
+        )
+
+    required = "bucket_name" if firelens["destination"] == "s3" else "delivery_stream"
+    if not firelens.get(required):
+        raise LookupError(
+            f"The 'firelens' destination '{firelens['destination']}' requires '{required}'."
+        )
+
+
+def validate_health_check(name, health_check):
+    """check the container health check can time out before it is next run"""
+    if health_check.get("timeout_seconds", 5) >= health_check.get("interval_seconds", 15):
+        raise LookupError(
+            f"The '{name}' health_check timeout_seconds must be less than"
+            + " its interval_seconds."
+        )
+
@@ -3,24 +3,28 @@ from aws_cdk import (
     Stack,
     CfnOutput,
     aws_ec2 as ec2,
-    aws_ecs as ecs,
-    aws_s3_assets as s3_assets,
 )
 from constructs import Construct
 from curity_fargate_cluster_stack import (
     admin_fargate_service as adminServiceFactory,
     runtime_fargate_service as runtimeServiceFactory,
     bastion_deployment as bastianDepl,
+    performance_dashboard as performanceDashboard,
+    load_test_task as loadTestTask,
 )
+from curity_fargate_cluster_stack.cluster_foundation import CurityClusterFoundation
+from curity_fargate_cluster_stack.data_tier import POSTGRES_PORT
 
 
 #
 #  This is our MAIN Entry Point.  We are called by app.py
-class CurityFargateCluster(Stack):
+class CurityFargateCluster(Stack, CurityClusterFoundation):
     """This class creates a Fargate Cluster for a Curity Cluster consisting
     of an Admin Service and a Runtime Service."""
 
     def __init__(self, scope: Construct, construct_id: str, config, **kwargs) -> None:
+        # The 'edge' certificate is in us-east-1, see CurityEdgeDistribution
+        kwargs.setdefault("cross_region_references", config.get("edge") is not None)
         super().__init__(scope, construct_id, **kwargs)
 
         CfnOutput(
@@ -30,23 +34,10 @@ class CurityFargateCluster(Stack):
         )
 
         #
-        #  1/ Lookup the VPC as this is assumed to have been pre-created for us
+        #  1-3/ Lookup the VPC and create the ECS Cluster inside it along
+        #       with the shared resources the services need
         # =====================================================================
-        vpc = self.lookup_vpc(config)
-
-        #
-        #  2/ Sync the envfile if it is present
-        # =====================================================================
-        env_file = config.get("envfile")
-        if env_file:
-            config["envfile_asset"] = self.sync_envfile( env_file)
-
-        #
-        # 3/  Create an ECS Cluster inside the VPC
-        # This will also create a private Cloud Map namespace
-        # to allow the services to discover each other
-        # =====================================================================
-        curity_cluster = self.create_cluster_from_vpc(vpc)
+        vpc, curity_cluster = self.create_cluster_foundation(config)
 
         #
         # 4/ Create our Curity services
@@ -96,6 +87,86 @@ class CurityFargateCluster(Stack):
             "service on the Cluster Communication Port",
         )
 
+        # Service Connect clients only learn the endpoints that exist when
+        # their tasks start, so the admin endpoint has to be there first
+        if config.get("service_connect") is not None:
+            curity_runtime_service.curity_service.service.node.default_child.add_dependency(
+                curity_admin_service.curity_service.node.default_child
+            )
+
+        # The 'runtime_pools' are runtime tasks too
+        for name, pool_service in curity_runtime_service.pool_services.items():
+            curity_admin_service.curity_service.connections.allow_from(
+                pool_service,
+                ec2.Port.tcp(6789),
+                f"Allow the Curity Runtime {name} pool Tasks to communicate with the"
+                " Curity Admin service on the Cluster Communication Port",
+            )
+            if config.get("service_connect") is not None:
+                pool_service.node.default_child.add_dependency(
+                    curity_admin_service.curity_service.node.default_child
+                )
+
+        #
+        # 3b/ Create the performance dashboard and alarms if configured
+        # =====================================================================
+        if config.get("dashboard") is not None:
+            performance_dashboard = performanceDashboard.PerformanceDashboard(
+                self,
+                curity_cluster,
+                curity_admin_service.curity_service,
+                curity_runtime_service.curity_service,
+                config,
+                curity_runtime_service.pool_services,
+                curity_runtime_service.pool_target_groups,
+            )
+            CfnOutput(
+                self,
+                "curityPerformanceDashboard",
+                value=performance_dashboard.dashboard.dashboard_name,
+            )
+
+        #
+        # 3c/ Create the load test task definition if configured
+        # =====================================================================
+        if config.get("load_test") is not None:
+            load_test = loadTestTask.CurityLoadTestTask(self, curity_cluster, config)
+            curity_runtime_service.curity_service.service.connections.allow_from(
+                load_test.security_group,
+                ec2.Port.tcp(8443),
+                "Allow the load test tasks to call the Curity Runtime Service",
+            )
+            for name, pool_service in curity_runtime_service.pool_services.items():
+                pool_service.connections.allow_from(
+                    load_test.security_group,
+                    ec2.Port.tcp(8443),
+                    f"Allow the load test tasks to call the Curity Runtime {name} pool",
+                )
+
+        #
+        # 3d/ Only the Curity services may connect to the database proxy
+        # =====================================================================
+        if config.get("database") is not None:
+            for service, description in [
+                (
+                    curity_admin_service.curity_service,
+                    "Allow the Curity Admin Service to use the database proxy",
+                ),
+                (
+                    curity_runtime_service.curity_service.service,
+                    "Allow the Curity Runtime Service to use the database proxy",
+                ),
+            ] + [
+                (
+                    pool_service,
+                    f"Allow the Curity Runtime {name} pool to use the database proxy",
+                )
+                for name, pool_service in curity_runtime_service.pool_services.items()
+            ]:
+                config["data_tier"].proxy.connections.allow_from(
+                    service, ec2.Port.tcp(POSTGRES_PORT), description
+                )
+
         #
         # 4/ Create a bastion EC2 instance for support purposes only
         #   This will allow us to create an SSM tunnel to do diagnostics
@@ -130,45 +201,9 @@ class CurityFargateCluster(Stack):
             "Bastion access to the Fargate Rungate Service",
         )
 
-
-    #
-    #  lookup the VPC -  Otherwise raise an exception
-    # ==================================================================
-    def lookup_vpc(self, config):
-        """lookup an existing vpc based on its name"""
-        vpc = ec2.Vpc.from_lookup(self, "VPC", vpc_name=config.get("vpcname"))
-        if not vpc:
-            raise Exception(f"Failed to find VPC: '${config.get('vpcname')}'")
-        return vpc
-
-    #
-    #   create an ECS Cluster inside the supplied VPC
-    # =========================================================================
-    def create_cluster_from_vpc(self, vpc):
-        """create an ec2 cluster and associate a cloudmap namespace
-        ready for any services to use"""
-        curity_cluster = ecs.Cluster(
-            self, "curityvpcid", vpc=vpc, cluster_name="curity-cluster"
-        )
-
-        # Adding service discovery namespace to cluster
-        self.namespace = curity_cluster.add_default_cloud_map_namespace(name="curity")
-
-        return curity_cluster
-
-    #
-    #  sync the env file to an S3 bucket  -  Otherwise raise an exception
-    # ==================================================================
-    def sync_envfile(self, env_file):
-        """This class contains the CDK code to synchronize our Curity
-        environment file to an S3 bucket so that it can be referenced by the
-        Fargate service classes."""
-
-        # Create an Asset from the local file and upload it to the S3 bucket if it has changed
-        asset = s3_assets.Asset(self, "CurityEnvFile", path=env_file)
-
-        CfnOutput(self, "S3BucketName", value=asset.s3_bucket_name)
-        CfnOutput(self, "S3ObjectKey", value=asset.s3_object_key)
-        CfnOutput(self, "S3HttpURL", value=asset.http_url)
-
-        return asset
+        for name, pool_service in curity_runtime_service.pool_services.items():
+            pool_service.connections.allow_from(
+                bastion_deployment.instance,
+                ec2.Port.all_tcp(),
+                f"Bastion access to the Fargate Runtime {name} pool",
+            )
@@ -0,0 +1,287 @@
+"""This module provides the split stack layout of the Curity Fargate Cluster."""
+from aws_cdk import (
+    Stack,
+    CfnOutput,
+    aws_ec2 as ec2,
+)
+from constructs import Construct
+from curity_fargate_cluster_stack import (
+    admin_fargate_service as adminServiceFactory,
+    runtime_fargate_service as runtimeServiceFactory,
+    bastion_deployment as bastianDepl,
+    performance_dashboard as performanceDashboard,
+    load_test_task as loadTestTask,
+)
+from curity_fargate_cluster_stack.cluster_foundation import CurityClusterFoundation
+from curity_fargate_cluster_stack.data_tier import POSTGRES_PORT
+
+
+#
+#  The split layout ('stack_layout': 'split' in cdk.json) deploys the same
+#  resources as CurityFargateCluster but in four stacks, so that a runtime
+#  change only makes CloudFormation diff and lock the runtime stack:-
+#
+#     <id>-Network   VPC endpoints, env file, ECS Cluster, Cloud Map namespace
+#                    and the optional database and its proxy
+#     <id>-Admin     the Curity Admin Service
+#     <id>-Runtime   the Curity Runtime Service and any runtime pools, their
+#                    load balancer and DNS
+#     <id>-Support   the bastion, the performance dashboard and the load test task
+#
+#  Every construct keeps the id it has in CurityFargateCluster so the
+#  resources keep their logical ids, which is what allows an existing
+#  single stack to be moved across with CloudFormation resource import
+#  rather than having its resources replaced.
+#
+#  Security group rules between stacks are created in the stack of the
+#  *calling* side (see allow_from_remote) so dependencies only ever point
+#  Network <- Admin <- Runtime <- Support and never form a cycle.
+def build_split_stacks(scope: Construct, construct_id: str, config, **kwargs):
+    """Create the Network, Admin, Runtime and Support stacks for the Curity cluster"""
+    network_stack = CurityNetworkStack(
+        scope, f"{construct_id}-Network", config=config, **kwargs
+    )
+    admin_stack = CurityAdminStack(
+        scope,
+        f"{construct_id}-Admin",
+        curity_cluster=network_stack.curity_cluster,
+        config=config,
+        **kwargs,
+    )
+    runtime_stack = CurityRuntimeStack(
+        scope,
+        f"{construct_id}-Runtime",
+        curity_cluster=network_stack.curity_cluster,
+        admin_service=admin_stack.curity_admin_service.curity_service,
+        config=config,
+        **kwargs,
+    )
+    support_stack = CuritySupportStack(
+        scope,
+        f"{construct_id}-Support",
+        vpc=network_stack.vpc,
+        curity_cluster=network_stack.curity_cluster,
+        admin_service=admin_stack.curity_admin_service.curity_service,
+        runtime_service=runtime_stack.curity_runtime_service.curity_service,
+        runtime_pool_services=runtime_stack.curity_runtime_service.pool_services,
+        runtime_pool_target_groups=runtime_stack.curity_runtime_service.pool_target_groups,
+        config=config,
+        **kwargs,
+    )
+
+    return network_stack, admin_stack, runtime_stack, support_stack
+
+
+#
+#  Open a port on the target's security groups to the source's security
+#  groups, with the rule itself created in the source's stack
+# =========================================================================
+def allow_from_remote(target, source, port, description):
+    """allow ingress from another stack's resource without a dependency cycle"""
+    for target_security_group in target.connections.security_groups:
+        for source_security_group in source.connections.security_groups:
+            target_security_group.add_ingress_rule(
+                source_security_group, port, description, remote_rule=True
+            )
+
+
+class CurityNetworkStack(Stack, CurityClusterFoundation):
+    """This class creates the VPC level resources and the ECS Cluster."""
+
+    def __init__(self, scope: Construct, construct_id: str, config, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        CfnOutput(
+            self,
+            "Curity AWS configurable environment settings",
+            value=str(config),
+        )
+
+        self.vpc, self.curity_cluster = self.create_cluster_foundation(config)
+
+
+class CurityAdminStack(Stack):
+    """This class creates the Curity Admin Service."""
+
+    def __init__(
+        self, scope: Construct, construct_id: str, curity_cluster, config, **kwargs
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.curity_admin_service = adminServiceFactory.CurityAdminService(
+            self, curity_cluster, config, admin_service=True,
+        )
+        CfnOutput(
+            self,
+            "curityAdminService",
+            value=self.curity_admin_service.curity_service.to_string(),
+        )
+        CfnOutput(
+            self,
+            "CurityAdminService Task Definition.  Task Role",
+            value=self.curity_admin_service.curity_service.task_definition.task_role.to_string(),
+        )
+
+        if config.get("database") is not None:
+            allow_from_remote(
+                config["data_tier"].proxy,
+                self.curity_admin_service.curity_service,
+                ec2.Port.tcp(POSTGRES_PORT),
+                "Allow the Curity Admin Service to use the database proxy",
+            )
+
+
+class CurityRuntimeStack(Stack):
+    """This class creates the Curity Runtime Service and its load balancer."""
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        curity_cluster,
+        admin_service,
+        config,
+        **kwargs,
+    ) -> None:
+        # The 'edge' certificate is in us-east-1, see CurityEdgeDistribution
+        kwargs.setdefault("cross_region_references", config.get("edge") is not None)
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.curity_runtime_service = runtimeServiceFactory.CurityRuntimeService(
+            self, curity_cluster, config
+        )
+        CfnOutput(
+            self,
+            "curityRuntimeService",
+            value=self.curity_runtime_service.curity_service.to_string(),
+        )
+        CfnOutput(
+            self,
+            "CurityRuntimeService Task Definition.  Task Role",
+            value=self.curity_runtime_service.curity_service.task_definition.task_role.to_string(),
+        )
+
+        allow_from_remote(
+            admin_service,
+            self.curity_runtime_service.curity_service.service,
+            ec2.Port.tcp(6789),
+            "Allow the Curity Runtimes Tasks to communicate with the Curity Admin "
+            "service on the Cluster Communication Port",
+        )
+
+        if config.get("database") is not None:
+            allow_from_remote(
+                config["data_tier"].proxy,
+                self.curity_runtime_service.curity_service.service,
+                ec2.Port.tcp(POSTGRES_PORT),
+                "Allow the Curity Runtime Service to use the database proxy",
+            )
+            for name, pool_service in self.curity_runtime_service.pool_services.items():
+                allow_from_remote(
+                    config["data_tier"].proxy,
+                    pool_service,
+                    ec2.Port.tcp(POSTGRES_PORT),
+                    f"Allow the Curity Runtime {name} pool to use the database proxy",
+                )
+
+        # Service Connect clients only learn the endpoints that exist when
+        # their tasks start, so the admin endpoint has to be there first
+        if config.get("service_connect") is not None:
+            self.curity_runtime_service.curity_service.service.node.default_child.add_dependency(
+                admin_service.node.default_child
+            )
+
+        # The 'runtime_pools' are runtime tasks too
+        for name, pool_service in self.curity_runtime_service.pool_services.items():
+            allow_from_remote(
+                admin_service,
+                pool_service,
+                ec2.Port.tcp(6789),
+                f"Allow the Curity Runtime {name} pool Tasks to communicate with the"
+                " Curity Admin service on the Cluster Communication Port",
+            )
+            if config.get("service_connect") is not None:
+                pool_service.node.default_child.add_dependency(
+                    admin_service.node.default_child
+                )
+
+
+class CuritySupportStack(Stack):
+    """This class creates the bastion, the optional dashboard and the load test task."""
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        vpc,
+        curity_cluster,
+        admin_service,
+        runtime_service,
+        runtime_pool_services,
+        runtime_pool_target_groups,
+        config,
+        **kwargs,
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        if config.get("dashboard") is not None:
+            performance_dashboard = performanceDashboard.PerformanceDashboard(
+                self,
+                curity_cluster,
+                admin_service,
+                runtime_service,
+                config,
+                runtime_pool_services,
+                runtime_pool_target_groups,
+            )
+            CfnOutput(
+                self,
+                "curityPerformanceDashboard",
+                value=performance_dashboard.dashboard.dashboard_name,
+            )
+
+        if config.get("load_test") is not None:
+            load_test = loadTestTask.CurityLoadTestTask(self, curity_cluster, config)
+            allow_from_remote(
+                runtime_service.service,
+                load_test.security_group,
+                ec2.Port.tcp(8443),
+                "Allow the load test tasks to call the Curity Runtime Service",
+            )
+            for name, pool_service in runtime_pool_services.items():
+                allow_from_remote(
+                    pool_service,
+                    load_test.security_group,
+                    ec2.Port.tcp(8443),
+                    f"Allow the load test tasks to call the Curity Runtime {name} pool",
+                )
+
+        bastion_deployment = bastianDepl.BastionDeployment(self, vpc)
+        CfnOutput(
+            self, "bastionInstance", value=bastion_deployment.instance.instance_id
+        )
+        CfnOutput(
+            self,
+            "bastionInstance IP",
+            value=bastion_deployment.instance.instance_private_ip,
+        )
+
+        allow_from_remote(
+            admin_service,
+            bastion_deployment.instance,
+            ec2.Port.all_tcp(),
+            "Bastion access to the Fargate Admin Service",
+        )
+        allow_from_remote(
+            runtime_service.service,
+            bastion_deployment.instance,
+            ec2.Port.all_tcp(),
+            "Bastion access to the Fargate Rungate Service",
+        )
+        for name, pool_service in runtime_pool_services.items():
+            allow_from_remote(
+                pool_service,
+                bastion_deployment.instance,
+                ec2.Port.all_tcp(),
+                f"Bastion access to the Fargate Runtime {name} pool",
+            )
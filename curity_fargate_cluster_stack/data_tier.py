@@ -0,0 +1,117 @@
+"""This module provides the CurityDataTier class."""
+from aws_cdk import (
+    CfnOutput,
+    Duration,
+    SecretValue,
+    aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_rds as rds,
+    aws_secretsmanager as secretsmanager,
+)
+
+DEFAULT_ENGINE_VERSION = "14.6"
+DEFAULT_INSTANCE_TYPE = "r6g.large"
+DEFAULT_DATABASE_NAME = "curity"
+POSTGRES_PORT = 5432
+
+
+#
+#  The 'database' data tier is an Aurora PostgreSQL cluster for the
+#  Curity JDBC data source, with an RDS Proxy in front of it.
+#
+#  Every Curity JVM keeps its own connection pool, so without the proxy a
+#  scale-out adds a whole pool per new runtime task and a burst of tasks
+#  can exhaust the database's max_connections.  The proxy multiplexes the
+#  tasks' connections onto a pool of its own, sized as a percentage of
+#  max_connections by the 'proxy' settings, and makes clients wait up to
+#  borrow_timeout_seconds for a connection rather than be refused.
+#
+#  Only the proxy may connect to the cluster; the caller opens the proxy to
+#  the admin and runtime services.  The tasks get the JDBC URL of the proxy
+#  and the generated credentials as Secrets Manager secrets, in
+#  CURITY_DB_URL, CURITY_DB_USERNAME and CURITY_DB_PASSWORD, for the data
+#  source in the Curity configuration to use instead of the env file.
+# =========================================================================
+class CurityDataTier:
+    """This class creates the Aurora cluster and RDS Proxy for the Curity data source."""
+
+    def __init__(self, construct, vpc, config):
+        database = config["database"]
+        proxy = database.get("proxy", {})
+        database_name = database.get("database_name", DEFAULT_DATABASE_NAME)
+        engine_version = database.get("engine_version", DEFAULT_ENGINE_VERSION)
+        private_subnets = ec2.SubnetSelection(
+            subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+        )
+
+        # Created here rather than by the cluster, whose generated secret has
+        # the stack name in its logical id and so differs in the split layout
+        self.secret = rds.DatabaseSecret(construct, "CurityDatabaseSecret", username="curity")
+
+        self.cluster = rds.DatabaseCluster(
+            construct,
+            "CurityDatabase",
+            engine=rds.DatabaseClusterEngine.aurora_postgres(
+                version=rds.AuroraPostgresEngineVersion.of(
+                    engine_version, engine_version.split(".")[0]
+                )
+            ),
+            credentials=rds.Credentials.from_secret(self.secret),
+            default_database_name=database_name,
+            instances=database.get("instances", 2),
+            instance_props=rds.InstanceProps(
+                vpc=vpc,
+                vpc_subnets=private_subnets,
+                instance_type=ec2.InstanceType(
+                    database.get("instance_type", DEFAULT_INSTANCE_TYPE)
+                ),
+            ),
+            backup=rds.BackupProps(
+                retention=Duration.days(database.get("backup_retention_days", 7))
+            ),
+            deletion_protection=database.get("deletion_protection"),
+            storage_encrypted=True,
+        )
+
+        self.proxy = self.cluster.add_proxy(
+            "CurityDatabaseProxy",
+            secrets=[self.secret],
+            db_proxy_name="curity-db-proxy",
+            vpc=vpc,
+            vpc_subnets=private_subnets,
+            require_tls=True,
+            max_connections_percent=proxy.get("max_connections_percent"),
+            max_idle_connections_percent=proxy.get("max_idle_connections_percent"),
+            borrow_timeout=Duration.seconds(proxy["borrow_timeout_seconds"])
+            if "borrow_timeout_seconds" in proxy
+            else None,
+            idle_client_timeout=Duration.seconds(proxy["idle_client_timeout_seconds"])
+            if "idle_client_timeout_seconds" in proxy
+            else None,
+        )
+        # add_proxy already opens the cluster to the proxy and nothing else
+
+        self.data_source_secret = secretsmanager.Secret(
+            construct,
+            "CurityDataSourceUrl",
+            description="The JDBC URL the Curity data source connects to",
+            secret_string_value=SecretValue.unsafe_plain_text(
+                f"jdbc:postgresql://{self.proxy.endpoint}:{POSTGRES_PORT}"
+                + f"/{database_name}?sslmode=require"
+            ),
+        )
+
+        CfnOutput(construct, "CurityDatabaseProxyEndpoint", value=self.proxy.endpoint)
+        CfnOutput(construct, "CurityDatabaseSecretArn", value=self.secret.secret_arn)
+
+    def container_secrets(self):
+        """Return the Secrets Manager secrets that give a container the data source"""
+        return {
+            "CURITY_DB_URL": ecs.Secret.from_secrets_manager(self.data_source_secret),
+            "CURITY_DB_USERNAME": ecs.Secret.from_secrets_manager(
+                self.secret, "username"
+            ),
+            "CURITY_DB_PASSWORD": ecs.Secret.from_secrets_manager(
+                self.secret, "password"
+            ),
+        }
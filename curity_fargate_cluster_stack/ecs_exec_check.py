@@ -0,0 +1,653 @@
+"""This module checks whether ECS Exec can reach the tasks in the Curity ECS cluster.
+
+Usage:-
+
+    python -m curity_fargate_cluster_stack.ecs_exec_check [--profile home] [--task <task id>]
+
+It runs the checks of check-ecs-exec.sh (Amazon ECS Exec Checker v0.7) for
+every task in the cluster in one pass, or for the tasks given with --task.
+The tasks are checked concurrently, and the cluster, task definition, IAM
+policy simulation, subnet and VPC endpoint lookups are made once and shared
+by every task that needs them.  Lookups are cached for --cache-ttl seconds,
+so --watch re-checks the task state each round without repeating them.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+from curity_fargate_cluster_stack.task_inventory import (
+    DEFAULT_CLUSTER_NAME,
+    DEFAULT_MAX_ATTEMPTS,
+    describe_tasks,
+    list_service_tasks,
+    list_services,
+    retry_config,
+)
+
+OK = "OK"
+WARN = "WARN"
+FAIL = "FAIL"
+
+DEFAULT_CACHE_TTL_SECONDS = 60
+REQUIRED_FARGATE_PLATFORM_VERSION = {"LINUX": (1, 4, 0), "WINDOWS": (1, 0, 0)}
+REQUIRED_AGENT_VERSION = (1, 50, 2)
+SSM_MESSAGES_ACTIONS = (
+    "ssmmessages:CreateControlChannel",
+    "ssmmessages:CreateDataChannel",
+    "ssmmessages:OpenControlChannel",
+    "ssmmessages:OpenDataChannel",
+)
+CREDENTIAL_VARIABLES = ("AWS_ACCESS_KEY", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY")
+
+
+#
+#  A thread safe cache whose entries expire after a fixed time.  When several
+#  tasks need the same lookup at once only the first thread makes the call
+#  and the others wait for its result.  Failed lookups are not cached.
+# =========================================================================
+class TTLCache:
+    """This class caches the results of lookups for a number of seconds."""
+
+    def __init__(self, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        """return the cached value for key, calling load() if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > self.clock():
+                future, loader = entry[1], False
+            else:
+                future, loader = Future(), True
+                self._entries[key] = (self.clock() + self.ttl_seconds, future)
+
+        if loader:
+            try:
+                future.set_result(load())
+            except Exception as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+                with self._lock:
+                    if self._entries.get(key, (None, None))[1] is future:
+                        del self._entries[key]
+
+        return future.result()
+
+
+def create_clients(profile=None, region=None, endpoint_url=None,
+                   max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """create the clients for the checks from one session"""
+    session = boto3.session.Session(profile_name=profile, region_name=region)
+    return {
+        service_name: session.client(
+            service_name, endpoint_url=endpoint_url, config=retry_config(max_attempts)
+        )
+        for service_name in ("ecs", "ec2", "iam", "kms", "sts")
+    }
+
+
+def check(name, status, detail=""):
+    """return one check result"""
+    return {"check": name, "status": status, "detail": detail}
+
+
+def version_tuple(version):
+    """return a dotted version as a tuple of ints, e.g. '1.4.0' -> (1, 4, 0)"""
+    return tuple(int(part) for part in version.split(".") if part.isdigit())
+
+
+class EcsExecChecker:
+    """This class runs the ECS Exec checks for the tasks of one cluster."""
+
+    def __init__(self, clients, cluster=DEFAULT_CLUSTER_NAME, cache=None):
+        self.clients = clients
+        self.cluster = cluster
+        self.cache = cache or TTLCache()
+        self.region = clients["ecs"].meta.region_name
+
+    #
+    #  Shared lookups, each one cached by its arguments
+    # =========================================================================
+    def caller_identity(self):
+        """return the account and the IAM ARN that policies are simulated for"""
+
+        def load():
+            identity = self.clients["sts"].get_caller_identity()
+            caller_arn = identity["Arn"]
+            if ":assumed-role/" in caller_arn:
+                # arn:aws:sts::<account>:assumed-role/<role name>/<session>
+                role_name = caller_arn.split("/")[1]
+                caller_arn = self.clients["iam"].get_role(RoleName=role_name)["Role"]["Arn"]
+            return identity["Account"], caller_arn
+
+        return self.cache.get(("caller_identity",), load)
+
+    def partition(self):
+        """return the partition of the caller's ARN, e.g. aws, aws-cn or aws-us-gov"""
+        return self.caller_identity()[1].split(":")[1]
+
+    def cluster_description(self):
+        """return the described cluster with its configuration, None if it does not exist"""
+
+        def load():
+            clusters = self.clients["ecs"].describe_clusters(
+                clusters=[self.cluster], include=["CONFIGURATIONS"]
+            )["clusters"]
+            return clusters[0] if clusters else None
+
+        return self.cache.get(("cluster", self.cluster), load)
+
+    def exec_configuration(self):
+        """return the cluster's executeCommandConfiguration, if it has one"""
+        cluster = self.cluster_description() or {}
+        return cluster.get("configuration", {}).get("executeCommandConfiguration")
+
+    def kms_key_arn(self, key_id):
+        """return the ARN of a KMS key"""
+        return self.cache.get(
+            ("kms_key", key_id),
+            lambda: self.clients["kms"].describe_key(KeyId=key_id)["KeyMetadata"]["Arn"],
+        )
+
+    def task_definition(self, task_definition_arn):
+        """return a task definition"""
+        return self.cache.get(
+            ("task_definition", task_definition_arn),
+            lambda: self.clients["ecs"].describe_task_definition(
+                taskDefinition=task_definition_arn
+            )["taskDefinition"],
+        )
+
+    def agent_version(self, container_instance_arn):
+        """return the ECS agent version of an EC2 container instance"""
+        return self.cache.get(
+            ("agent_version", container_instance_arn),
+            lambda: self.clients["ecs"].describe_container_instances(
+                cluster=self.cluster, containerInstances=[container_instance_arn]
+            )["containerInstances"][0]["versionInfo"]["agentVersion"],
+        )
+
+    def simulate(self, principal_arn, actions, resource_arn=None):
+        """return the IAM policy simulation decision for each action"""
+
+        def load():
+            arguments = {"PolicySourceArn": principal_arn, "ActionNames": list(actions)}
+            if resource_arn:
+                arguments["ResourceArns"] = [resource_arn]
+            return {
+                result["EvalActionName"]: result["EvalDecision"]
+                for result in self.clients["iam"].simulate_principal_policy(**arguments)[
+                    "EvaluationResults"
+                ]
+            }
+
+        return self.cache.get(("simulate", principal_arn, actions, resource_arn), load)
+
+    def subnet(self, subnet_id):
+        """return a subnet"""
+        return self.cache.get(
+            ("subnet", subnet_id),
+            lambda: self.clients["ec2"].describe_subnets(SubnetIds=[subnet_id])[
+                "Subnets"
+            ][0],
+        )
+
+    def vpc_endpoint_services(self, vpc_id):
+        """return the service names of the VPC's endpoints"""
+        return self.cache.get(
+            ("vpc_endpoints", vpc_id),
+            lambda: [
+                endpoint["ServiceName"]
+                for page in self.clients["ec2"]
+                .get_paginator("describe_vpc_endpoints")
+                .paginate(Filters=[{"Name": "vpc-id", "Values": [vpc_id]}])
+                for endpoint in page["VpcEndpoints"]
+            ],
+        )
+
+    #
+    #  The checks, in the order check-ecs-exec.sh reports them
+    # =========================================================================
+    def check_cluster_status(self):
+        """check that the cluster exists and is active"""
+        cluster = self.cluster_description()
+        if cluster is None:
+            return [check("Cluster Status", FAIL, f"{self.cluster} not found")]
+        status = cluster["status"]
+        return [
+            check("Cluster Status", OK if status == "ACTIVE" else FAIL, f"{self.cluster} {status}")
+        ]
+
+    def check_cluster_configuration(self):
+        """check the cluster's exec audit logging settings"""
+        configuration = self.exec_configuration()
+        if not configuration:
+            return [check("Cluster Configuration", WARN, "Audit Logging Not Configured")]
+
+        logging = configuration.get("logging")
+        log_configuration = configuration.get("logConfiguration", {})
+        return [
+            check(
+                "Cluster KMS Key",
+                OK if configuration.get("kmsKeyId") else WARN,
+                configuration.get("kmsKeyId", "Not Configured"),
+            ),
+            check(
+                "Cluster Audit Logging",
+                WARN if logging in (None, "NONE") else OK,
+                {None: "Not Configured", "NONE": "Disabled"}.get(logging, logging),
+            ),
+            check(
+                "Cluster Log Destinations",
+                OK,
+                f"S3 Bucket: {log_configuration.get('s3BucketName', 'Not Configured')}, "
+                "CW Log Group: "
+                f"{log_configuration.get('cloudWatchLogGroupName', 'Not Configured')}",
+            ),
+        ]
+
+    def check_caller_permissions(self):
+        """check that the caller may exec into the cluster's tasks"""
+        account, caller_arn = self.caller_identity()
+        # One simulation for every task in the cluster rather than one per task
+        tasks_arn = (
+            f"arn:{self.partition()}:ecs:{self.region}:{account}:task/{self.cluster}/*"
+        )
+        results = []
+
+        decision = self.simulate(caller_arn, ("ecs:ExecuteCommand",), tasks_arn)
+        results.append(
+            check(
+                "Can I ExecuteCommand?",
+                OK if decision["ecs:ExecuteCommand"] == "allowed" else FAIL,
+                f"{caller_arn}: {decision['ecs:ExecuteCommand']}",
+            )
+        )
+
+        kms_key_id = (self.exec_configuration() or {}).get("kmsKeyId")
+        if kms_key_id:
+            decision = self.simulate(
+                caller_arn, ("kms:GenerateDataKey",), self.kms_key_arn(kms_key_id)
+            )
+            results.append(
+                check(
+                    "Can I kms:GenerateDataKey?",
+                    OK if decision["kms:GenerateDataKey"] == "allowed" else FAIL,
+                    decision["kms:GenerateDataKey"],
+                )
+            )
+
+        # Being able to start SSM sessions directly bypasses the exec audit
+        decision = self.simulate(caller_arn, ("ssm:StartSession",), tasks_arn)
+        results.append(
+            check(
+                "ssm:StartSession denied?",
+                WARN if decision["ssm:StartSession"] == "allowed" else OK,
+                decision["ssm:StartSession"],
+            )
+        )
+        return results
+
+    @staticmethod
+    def check_task_state(task):
+        """check the task status, platform and exec flag"""
+        status = task.get("lastStatus")
+        if status == "RUNNING":
+            results = [check("Task Status", OK, status)]
+        elif status in ("PROVISIONING", "ACTIVATING", "PENDING"):
+            results = [check("Task Status", WARN, status)]
+        elif status == "STOPPED":
+            results = [check("Task Status", FAIL, f"{status} ({task.get('stoppedReason')})")]
+        else:
+            results = [check("Task Status", FAIL, status)]
+
+        results.append(
+            check(
+                "Exec Enabled for Task",
+                OK if task.get("enableExecuteCommand") else FAIL,
+                "enabled" if task.get("enableExecuteCommand") else "disabled",
+            )
+        )
+
+        if task.get("enableExecuteCommand"):
+            for container in task.get("containers", []):
+                for agent in container.get("managedAgents", []):
+                    agent_status = agent.get("lastStatus")
+                    if agent_status == "STOPPED":
+                        results.append(
+                            check(
+                                f"Managed Agent - {container['name']}",
+                                FAIL,
+                                f"STOPPED (Reason: {agent.get('reason')})",
+                            )
+                        )
+                    else:
+                        results.append(
+                            check(
+                                f"Managed Agent - {container['name']}",
+                                WARN if agent_status == "PENDING" else OK,
+                                agent_status,
+                            )
+                        )
+        return results
+
+    def check_launch_type(self, task):
+        """check the Fargate platform version or the EC2 agent version"""
+        launch_type = task.get("launchType")
+        if launch_type == "FARGATE":
+            family = "WINDOWS" if "Windows" in task.get("platformFamily", "") else "LINUX"
+            required = REQUIRED_FARGATE_PLATFORM_VERSION[family]
+            version = task.get("platformVersion", "")
+            return [
+                check(
+                    "Platform Version",
+                    OK if version_tuple(version) >= required else FAIL,
+                    version
+                    if version_tuple(version) >= required
+                    else f"{version} (Required: >= {'.'.join(map(str, required))})",
+                )
+            ]
+
+        if launch_type == "EC2":
+            version = self.agent_version(task["containerInstanceArn"])
+            return [
+                check(
+                    "ECS Agent Version",
+                    OK if version_tuple(version) >= REQUIRED_AGENT_VERSION else FAIL,
+                    version,
+                )
+            ]
+
+        return [check("Launch Type", WARN, "UNKNOWN")]
+
+    @staticmethod
+    def check_container_settings(task_definition):
+        """check the init process, root filesystem and credential variables"""
+        results = []
+        for container in task_definition["containerDefinitions"]:
+            name = container["name"]
+            init_enabled = container.get("linuxParameters", {}).get("initProcessEnabled")
+            results.append(
+                check(
+                    f"Init Process - {name}",
+                    OK if init_enabled else WARN,
+                    "Enabled" if init_enabled else "Disabled",
+                )
+            )
+            if container.get("readonlyRootFilesystem"):
+                results.append(
+                    check(f"Read-Only Root Filesystem - {name}", FAIL, "ReadOnly")
+                )
+
+            # The SSM agent would use these credentials instead of the task role
+            defined = [
+                variable["name"]
+                for variable in container.get("environment", [])
+                if variable["name"] in CREDENTIAL_VARIABLES
+            ]
+            if defined:
+                results.append(
+                    check(
+                        f"Environment Variables - {name}",
+                        WARN,
+                        ", ".join(defined) + " defined",
+                    )
+                )
+        return results
+
+    def check_task_role(self, task, task_definition):
+        """check that the task role allows the SSM agent and the audit logging"""
+        role_arn = task.get("overrides", {}).get("taskRoleArn") or task_definition.get(
+            "taskRoleArn"
+        )
+        if not role_arn:
+            # EC2 instance profile roles are not checked, the cluster is Fargate only
+            return [check("Task Role", FAIL, "Not Configured")]
+
+        decisions = dict(self.simulate(role_arn, SSM_MESSAGES_ACTIONS))
+        configuration = self.exec_configuration() or {}
+        log_configuration = configuration.get("logConfiguration", {})
+        account, _ = self.caller_identity()
+
+        if configuration.get("kmsKeyId"):
+            decisions.update(
+                self.simulate(
+                    role_arn,
+                    ("kms:Decrypt",),
+                    self.kms_key_arn(configuration["kmsKeyId"]),
+                )
+            )
+
+        bucket = log_configuration.get("s3BucketName")
+        if bucket:
+            bucket_arn = f"arn:{self.partition()}:s3:::{bucket}"
+            decisions.update(
+                self.simulate(
+                    role_arn,
+                    ("s3:PutObject",),
+                    f"{bucket_arn}/{log_configuration.get('s3KeyPrefix', '')}*",
+                )
+            )
+            if log_configuration.get("s3EncryptionEnabled"):
+                decisions.update(
+                    self.simulate(role_arn, ("s3:GetEncryptionConfiguration",), bucket_arn)
+                )
+
+        log_group = log_configuration.get("cloudWatchLogGroupName")
+        if log_group:
+            decisions.update(self.simulate(role_arn, ("logs:DescribeLogGroups",)))
+            decisions.update(
+                self.simulate(
+                    role_arn,
+                    ("logs:CreateLogStream", "logs:DescribeLogStreams", "logs:PutLogEvents"),
+                    f"arn:{self.partition()}:logs:{self.region}:{account}"
+                    f":log-group:{log_group}:*",
+                )
+            )
+
+        denied = sorted(
+            action for action, decision in decisions.items() if decision != "allowed"
+        )
+        return [
+            check(
+                "Task Role Permissions",
+                FAIL if denied else OK,
+                f"{role_arn}: " + (f"denied {', '.join(denied)}" if denied else "allowed"),
+            )
+        ]
+
+    def check_vpc_endpoints(self, task):
+        """check for an ssmmessages endpoint when the task's VPC uses endpoints"""
+        subnet_ids = [
+            detail["value"]
+            for attachment in task.get("attachments", [])
+            for detail in attachment.get("details", [])
+            if detail["name"] == "subnetId"
+        ]
+        if not subnet_ids:
+            return [check("VPC Endpoints", WARN, "Task has no awsvpc subnet to check")]
+
+        subnet = self.subnet(subnet_ids[0])
+        account, _ = self.caller_identity()
+        required_endpoint = f"com.amazonaws.{self.region}.ssmmessages"
+        if subnet["OwnerId"] != account:
+            return [
+                check(
+                    "VPC Endpoints",
+                    WARN,
+                    f"{subnet['SubnetId']} is shared from another account, check that "
+                    f"{subnet['VpcId']} has {required_endpoint}",
+                )
+            ]
+
+        endpoints = self.vpc_endpoint_services(subnet["VpcId"])
+        if not endpoints:
+            return [
+                check(
+                    "VPC Endpoints",
+                    OK,
+                    f"{subnet['VpcId']} - No additional VPC endpoints required",
+                )
+            ]
+        if required_endpoint in endpoints:
+            return [check("VPC Endpoints", OK, f"{required_endpoint} found")]
+        return [
+            check(
+                "VPC Endpoints",
+                WARN,
+                f"SSM PrivateLink {required_endpoint} not found in {subnet['VpcId']}, "
+                "the task needs outbound internet access",
+            )
+        ]
+
+    def check_task(self, task):
+        """run every check for one described task"""
+        checks = [
+            ("Cluster Configuration", self.check_cluster_configuration),
+            ("Caller Permissions", self.check_caller_permissions),
+            ("Task State", lambda: self.check_task_state(task)),
+            ("Launch Type", lambda: self.check_launch_type(task)),
+            (
+                "Container Settings",
+                lambda: self.check_container_settings(
+                    self.task_definition(task["taskDefinitionArn"])
+                ),
+            ),
+            (
+                "Task Role",
+                lambda: self.check_task_role(
+                    task, self.task_definition(task["taskDefinitionArn"])
+                ),
+            ),
+            ("VPC Endpoints", lambda: self.check_vpc_endpoints(task)),
+        ]
+
+        # A lookup that is denied fails its own check rather than the whole run
+        results = []
+        for name, run_check in checks:
+            try:
+                results.extend(run_check())
+            except ClientError as error:
+                results.append(check(name, FAIL, f"check failed: {error}"))
+
+        return {
+            "task_id": task["taskArn"].rsplit("/", 1)[-1],
+            "group": task.get("group"),
+            "results": results,
+        }
+
+    def check_tasks(self, task_ids=None, jobs=8):
+        """check the given tasks, or every task in the cluster, concurrently"""
+        # Without an active cluster there are no tasks to check, which is a failure
+        cluster_results = self.check_cluster_status()
+        if cluster_results[0]["status"] == FAIL:
+            return [{"task_id": None, "group": None, "results": cluster_results}]
+
+        ecs = self.clients["ecs"]
+        if not task_ids:
+            task_ids = [
+                task_arn
+                for service in list_services(ecs, self.cluster)
+                for task_arn in list_service_tasks(
+                    ecs, self.cluster, service.rsplit("/", 1)[-1]
+                )
+            ]
+
+        tasks = describe_tasks(ecs, self.cluster, task_ids)
+        found = {task["taskArn"].rsplit("/", 1)[-1] for task in tasks}
+        missing = [
+            {
+                "task_id": task_id.rsplit("/", 1)[-1],
+                "group": None,
+                "results": [check("Task Exists", FAIL, f"not found in {self.cluster}")],
+            }
+            for task_id in task_ids
+            if task_id.rsplit("/", 1)[-1] not in found
+        ]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(tasks)))) as executor:
+            return list(executor.map(self.check_task, tasks)) + missing
+
+
+def format_reports(reports):
+    """return the reports as text, one block per task"""
+    width = max(
+        [len(result["check"]) for report in reports for result in report["results"]] + [0]
+    )
+    lines = []
+    for report in reports:
+        if report["task_id"] is None:
+            lines.append("Cluster")
+        else:
+            group = f" ({report['group']})" if report["group"] else ""
+            lines.append(f"Task {report['task_id']}{group}")
+        for result in report["results"]:
+            lines.append(
+                f"  {result['status']:<5} {result['check']:<{width}}  {result['detail']}"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Check that ECS Exec works for the tasks in the Curity ECS cluster."
+    )
+    parser.add_argument("--cluster", default=DEFAULT_CLUSTER_NAME)
+    parser.add_argument(
+        "--task",
+        dest="tasks",
+        action="append",
+        help="task id or ARN to check, may be repeated (default: every task in the cluster)",
+    )
+    parser.add_argument("--profile", help="AWS profile, e.g. home")
+    parser.add_argument("--region")
+    parser.add_argument("--endpoint-url", help="e.g. a local AWS stub")
+    parser.add_argument("--output", choices=("text", "json"), default="text")
+    parser.add_argument("--jobs", type=int, default=8, help="tasks checked at once")
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=DEFAULT_CACHE_TTL_SECONDS,
+        help="seconds the cluster, task definition, IAM and VPC lookups are reused",
+    )
+    parser.add_argument(
+        "--watch", type=int, metavar="SECONDS", help="repeat the checks every SECONDS"
+    )
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    args = parser.parse_args(argv)
+
+    checker = EcsExecChecker(
+        create_clients(args.profile, args.region, args.endpoint_url, args.max_attempts),
+        args.cluster,
+        TTLCache(args.cache_ttl),
+    )
+
+    while True:
+        reports = checker.check_tasks(args.tasks, args.jobs)
+        if args.output == "json":
+            print(json.dumps(reports, indent=2))
+        else:
+            print(format_reports(reports))
+
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+    failed = any(
+        result["status"] == FAIL for report in reports for result in report["results"]
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
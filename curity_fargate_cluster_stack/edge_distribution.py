@@ -0,0 +1,225 @@
+"""This module provides the CurityEdgeDistribution class."""
+from aws_cdk import (
+    Duration,
+    Environment,
+    Stack,
+    aws_certificatemanager as acm,
+    aws_cloudfront as cloudfront,
+    aws_cloudfront_origins as origins,
+    aws_elasticloadbalancingv2 as lb,
+    aws_route53 as route53,
+    aws_route53_targets as route53_targets,
+    aws_secretsmanager as secretsmanager,
+)
+
+# The header CloudFront adds to every origin request and the ALB checks for
+ORIGIN_VERIFY_HEADER = "X-Origin-Verify"
+
+# The forward rule is the listener's last, after any 'runtime_pools' rules
+ORIGIN_RULE_PRIORITY = 50000
+
+# CloudFront only uses certificates from this region
+CERTIFICATE_REGION = "us-east-1"
+
+# The managed AllViewerExceptHostHeader policy, which this CDK version has
+# no constant for.  The Host header is left out so CloudFront connects to
+# the origin name, which the ALB certificate is issued for.
+ALL_VIEWER_EXCEPT_HOST_HEADER_POLICY_ID = "b689b0a8-53d0-40ab-baf2-68738e2966ac"
+
+PRICE_CLASSES = {
+    "PriceClass_100": cloudfront.PriceClass.PRICE_CLASS_100,
+    "PriceClass_200": cloudfront.PriceClass.PRICE_CLASS_200,
+    "PriceClass_All": cloudfront.PriceClass.PRICE_CLASS_ALL,
+}
+
+
+#
+#  The edge tier puts a CloudFront distribution on the public Curity name
+#  and moves the runtime ALB to 'origin_domain_name'.
+#
+#  Each 'cache_behaviors' path, e.g. the OpenID discovery document, the
+#  JWKS and the login page assets, is cached at the edge for its TTL.
+#  Everything else, including the token, authorize and session endpoints,
+#  uses the default behaviour which never caches and forwards every
+#  method, cookie, query string and header except Host.
+#
+#  The Origin header is part of each cache key so a CORS response made
+#  for one relying party is not served to another.
+#
+#  Origin protection: CloudFront adds a secret header that the ALB listener
+#  requires before it forwards to the runtime tasks; anything else gets a
+#  403.  The secret is generated in Secrets Manager and only appears in the
+#  template as a dynamic reference.  With 'origin_prefix_list_id' (the
+#  region's com.amazonaws.global.cloudfront.origin-facing prefix list) the
+#  ALB security group also only accepts CloudFront's addresses.
+#
+#  The certificate is in a us-east-1 stack of its own, <stack name>-
+#  EdgeCertificate, which the cdk CLI deploys first.  Its ARN comes back
+#  through a cross region reference, so the stack using this class must be
+#  created with cross_region_references=True.
+# =========================================================================
+class CurityEdgeDistribution:
+    """This class creates a CloudFront distribution in front of the runtime ALB."""
+
+    def __init__(
+        self, construct, hosted_zone, domain_name, origin_domain_name, runtime_service, config
+    ):
+        edge = config["edge"]
+
+        origin_secret = secretsmanager.Secret(
+            construct,
+            "CurityEdgeOriginSecret",
+            description="The X-Origin-Verify header value CloudFront sends to the Curity ALB",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                exclude_punctuation=True, password_length=48
+            ),
+        )
+        origin_secret_value = origin_secret.secret_value.unsafe_unwrap()
+
+        #
+        #  Only forward the requests that carry the CloudFront header
+        # =====================================================================
+        runtime_service.listener.node.default_child.add_property_override(
+            "DefaultActions",
+            [
+                {
+                    "Type": "fixed-response",
+                    "FixedResponseConfig": {
+                        "StatusCode": "403",
+                        "ContentType": "text/plain",
+                        "MessageBody": "Forbidden",
+                    },
+                }
+            ],
+        )
+        self.origin_verify_condition = lb.ListenerCondition.http_header(
+            ORIGIN_VERIFY_HEADER, [origin_secret_value]
+        )
+        lb.ApplicationListenerRule(
+            construct,
+            "CurityEdgeOriginRule",
+            listener=runtime_service.listener,
+            priority=ORIGIN_RULE_PRIORITY,
+            conditions=[self.origin_verify_condition],
+            action=lb.ListenerAction.forward([runtime_service.target_group]),
+        )
+
+        #
+        #  The distribution and its cache behaviours
+        # =====================================================================
+        origin = origins.HttpOrigin(
+            origin_domain_name,
+            protocol_policy=cloudfront.OriginProtocolPolicy.HTTPS_ONLY,
+            custom_headers={ORIGIN_VERIFY_HEADER: origin_secret_value},
+        )
+
+        certificate = CurityEdgeDistribution.create_certificate(
+            construct, hosted_zone, domain_name
+        )
+
+        self.distribution = cloudfront.Distribution(
+            construct,
+            "CurityEdgeDistribution",
+            comment="Curity runtime edge cache",
+            domain_names=[domain_name],
+            certificate=certificate,
+            price_class=PRICE_CLASSES[edge["price_class"]]
+            if "price_class" in edge
+            else None,
+            default_behavior=cloudfront.BehaviorOptions(
+                origin=origin,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_ALL,
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                cache_policy=cloudfront.CachePolicy.CACHING_DISABLED,
+                origin_request_policy=cloudfront.OriginRequestPolicy.from_origin_request_policy_id(
+                    construct,
+                    "CurityEdgeAllViewerExceptHostHeader",
+                    ALL_VIEWER_EXCEPT_HOST_HEADER_POLICY_ID,
+                ),
+            ),
+            additional_behaviors={
+                behavior["path_pattern"]: cloudfront.BehaviorOptions(
+                    origin=origin,
+                    allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD_OPTIONS,
+                    cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD_OPTIONS,
+                    viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                    cache_policy=CurityEdgeDistribution.cache_policy(construct, index, behavior),
+                )
+                for index, behavior in enumerate(edge.get("cache_behaviors", []))
+            },
+        )
+
+        #
+        #  'alias_records': false leaves the public name out of DNS, the
+        #  first of the two deploys that move a deployed environment to
+        #  the edge tier (see the README)
+        # =====================================================================
+        if not edge.get("alias_records", True):
+            return
+
+        for record_class, record_id in (
+            (route53.ARecord, "CurityEdgeAliasRecord"),
+            (route53.AaaaRecord, "CurityEdgeAliasRecordIpv6"),
+        ):
+            record_class(
+                construct,
+                record_id,
+                zone=hosted_zone,
+                record_name=domain_name,
+                target=route53.RecordTarget.from_alias(
+                    route53_targets.CloudFrontTarget(self.distribution)
+                ),
+            )
+
+    #
+    #  The distribution's certificate, in a stack in us-east-1
+    # =========================================================================
+    @staticmethod
+    def create_certificate(construct, hosted_zone, domain_name):
+        """Create the DNS validated certificate for the distribution in us-east-1"""
+        stack = Stack.of(construct)
+        certificate_stack = Stack(
+            stack.node.scope,
+            f"{stack.node.id}-EdgeCertificate",
+            env=Environment(account=stack.account, region=CERTIFICATE_REGION),
+            cross_region_references=True,
+        )
+        return acm.Certificate(
+            certificate_stack,
+            "CurityEdgeCertificate",
+            domain_name=domain_name,
+            validation=acm.CertificateValidation.from_dns(
+                route53.HostedZone.from_hosted_zone_attributes(
+                    certificate_stack,
+                    "HostedZone",
+                    zone_name=hosted_zone.zone_name,
+                    hosted_zone_id=hosted_zone.hosted_zone_id,
+                )
+            ),
+        )
+
+    #
+    #  A cache policy for one 'cache_behaviors' entry
+    #
+    #  The origin's Cache-Control headers are honoured between 0 and the
+    #  maximum TTL, ttl_seconds applies when the origin sends none.
+    # =========================================================================
+    @staticmethod
+    def cache_policy(construct, index, behavior):
+        """Create the cache policy for a cached path"""
+        ttl = Duration.seconds(behavior["ttl_seconds"])
+        return cloudfront.CachePolicy(
+            construct,
+            f"CurityEdgeCachePolicy{index}",
+            comment=f"Curity {behavior['path_pattern']}",
+            default_ttl=ttl,
+            min_ttl=Duration.seconds(0),
+            max_ttl=Duration.seconds(behavior["max_ttl_seconds"])
+            if "max_ttl_seconds" in behavior
+            else ttl,
+            header_behavior=cloudfront.CacheHeaderBehavior.allow_list("Origin"),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+        )
@@ -0,0 +1 @@
+"""The load test harness for the Curity runtime and its stand-in OAuth server."""
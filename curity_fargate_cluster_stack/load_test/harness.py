@@ -0,0 +1,456 @@
+"""This module drives token, introspection and JWKS traffic at the Curity runtime.
+
+Usage:-
+
+    python -m curity_fargate_cluster_stack.load_test.harness \\
+        --target https://curity.aws.redkitehill.com --client-id load-test --rate 200 --duration 60
+
+The client secret is read from CURITY_CLIENT_SECRET rather than the command
+line.  Requests are sent open loop: each one is started at its slot for
+--rate whether or not the earlier ones have returned, and its latency is
+measured from that slot, so a saturated runtime shows up as latency rather
+than as a quietly lower request rate.  The requests share up to
+--connections keep-alive connections.  The report is printed as JSON.
+
+Only the standard library is used so the module runs as is in the plain
+python image of the load test Fargate task, see Dockerfile.
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import math
+import os
+import ssl
+import sys
+from urllib.parse import quote, urlencode, urlsplit
+
+DEFAULT_PATHS = {
+    "token": "/oauth/v2/oauth-token",
+    "introspect": "/oauth/v2/oauth-introspect",
+    "jwks": "/oauth/v2/oauth-anonymous/jwks",
+}
+DEFAULT_MIX = {"token": 1, "introspect": 1, "jwks": 1}
+DEFAULT_CONNECTIONS = 50
+DEFAULT_TIMEOUT_SECONDS = 10
+PERCENTILES = (50, 95, 99)
+
+
+#
+#  A minimal keep-alive HTTP/1.1 client
+# =========================================================================
+class ProtocolError(Exception):
+    """the server sent something that is not an HTTP/1.1 response"""
+
+
+class HttpConnection:
+    """one keep-alive HTTP/1.1 connection, opened on first use"""
+
+    def __init__(self, host, port, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, headers, body=b""):
+        """send a request and return its status and body"""
+        reused = self.writer is not None
+        try:
+            return await self.exchange(method, path, headers, body)
+        except ConnectionError:
+            self.close()
+            # The server may have closed an idle keep-alive connection
+            if not reused:
+                raise
+        except BaseException:
+            # Includes a timeout's cancellation, after which the stream is unusable
+            self.close()
+            raise
+
+        try:
+            return await self.exchange(method, path, headers, body)
+        except BaseException:
+            self.close()
+            raise
+
+    async def exchange(self, method, path, headers, body):
+        """write one request and read its response"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl_context
+            )
+
+        host_header = self.host if self.port in (80, 443) else f"{self.host}:{self.port}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host_header}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by the server")
+        status_parts = status_line.split(maxsplit=2)
+        if (
+            len(status_parts) < 2
+            or not status_parts[0].startswith(b"HTTP/")
+            or not (len(status_parts[1]) == 3 and status_parts[1].isdigit())
+        ):
+            raise ProtocolError(f"malformed status line {status_line!r}")
+        status = int(status_parts[1])
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ProtocolError("connection closed in the response headers")
+            if line in (b"\r\n", b"\n"):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            response_body = await self.read_chunked()
+        elif "content-length" in response_headers:
+            if not response_headers["content-length"].isdigit():
+                raise ProtocolError(
+                    f"malformed Content-Length {response_headers['content-length']!r}"
+                )
+            response_body = await self.reader.readexactly(
+                int(response_headers["content-length"])
+            )
+        else:
+            response_body = await self.reader.read()
+            self.close()
+
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response_body
+
+    async def read_chunked(self):
+        """read a chunked transfer encoded body"""
+        chunks = []
+        while True:
+            size_line = await self.reader.readline()
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError:
+                raise ProtocolError(f"malformed chunk size {size_line!r}") from None
+            if size == 0:
+                # Skip any trailers up to the closing blank line
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        """close the connection, it is reopened by the next request"""
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class ConnectionPool:
+    """a fixed number of keep-alive connections to the target"""
+
+    def __init__(self, target_url, size=DEFAULT_CONNECTIONS, verify_tls=True):
+        target = urlsplit(target_url)
+        if target.scheme not in ("http", "https"):
+            raise ValueError(f"The target '{target_url}' must be an http or https URL")
+
+        ssl_context = None
+        if target.scheme == "https":
+            ssl_context = ssl.create_default_context()
+            if not verify_tls:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+
+        self.base_path = target.path.rstrip("/")
+        self.idle = asyncio.Queue()
+        self.connections = [
+            HttpConnection(
+                target.hostname,
+                target.port or (443 if ssl_context else 80),
+                ssl_context,
+            )
+            for _ in range(size)
+        ]
+        for connection in self.connections:
+            self.idle.put_nowait(connection)
+
+    async def request(self, method, path, headers=None, body=b""):
+        """send a request on the next idle connection"""
+        connection = await self.idle.get()
+        try:
+            return await connection.request(
+                method, self.base_path + path, headers or {}, body
+            )
+        finally:
+            self.idle.put_nowait(connection)
+
+    def close(self):
+        """close every connection"""
+        for connection in self.connections:
+            connection.close()
+
+
+#
+#  The requests a load test sends
+# =========================================================================
+class LoadTest:
+    """sends a weighted mix of token, introspection and JWKS requests at a fixed rate"""
+
+    def __init__(self, pool, client_id, client_secret, paths=None, mix=None,
+                 timeout_seconds=DEFAULT_TIMEOUT_SECONDS):
+        self.pool = pool
+        self.paths = {**DEFAULT_PATHS, **(paths or {})}
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight}
+        self.timeout_seconds = timeout_seconds
+        self.client_authorization = "Basic " + base64.b64encode(
+            f"{quote(client_id, safe='')}:{quote(client_secret, safe='')}".encode()
+        ).decode()
+        self.access_token = None
+        self.results = {name: {"latencies": [], "errors": {}} for name in self.mix}
+
+    async def token(self):
+        """request a client credentials token"""
+        status, body = await self.pool.request(
+            "POST",
+            self.paths["token"],
+            self.form_headers(),
+            urlencode({"grant_type": "client_credentials"}).encode(),
+        )
+        if status == 200:
+            self.access_token = json.loads(body)["access_token"]
+        return status, None
+
+    async def introspect(self):
+        """introspect the most recently issued token"""
+        status, body = await self.pool.request(
+            "POST",
+            self.paths["introspect"],
+            self.form_headers(),
+            urlencode({"token": self.access_token}).encode(),
+        )
+        if status == 200 and not json.loads(body).get("active"):
+            return status, "inactive_token"
+        return status, None
+
+    async def jwks(self):
+        """fetch the JSON web key set"""
+        status, _ = await self.pool.request(
+            "GET", self.paths["jwks"], {"Accept": "application/json"}
+        )
+        return status, None
+
+    def form_headers(self):
+        """headers of an authenticated form post"""
+        return {
+            "Authorization": self.client_authorization,
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json",
+        }
+
+    async def timed(self, name, scheduled):
+        """send one request and record its latency from its scheduled start"""
+        loop = asyncio.get_running_loop()
+        try:
+            status, problem = await asyncio.wait_for(
+                getattr(self, name)(), self.timeout_seconds
+            )
+            error = problem or (None if status == 200 else f"http_{status}")
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except (
+            OSError,
+            ValueError,
+            KeyError,
+            asyncio.IncompleteReadError,
+            ProtocolError,
+        ) as exception:
+            error = type(exception).__name__
+
+        result = self.results[name]
+        if error:
+            result["errors"][error] = result["errors"].get(error, 0) + 1
+        else:
+            result["latencies"].append(loop.time() - scheduled)
+
+    async def run(self, rate, duration_seconds):
+        """send rate requests a second for duration_seconds and return the report"""
+        loop = asyncio.get_running_loop()
+
+        # Introspection needs a token before the clock starts
+        if "introspect" in self.mix:
+            status, _ = await self.token()
+            if status != 200:
+                raise RuntimeError(f"The first token request failed with HTTP {status}")
+
+        # Spread the scenarios evenly, e.g. a 2:1 mix sends a, a, b, a, a, b ...
+        scenarios = itertools.cycle(
+            [name for name, weight in self.mix.items() for _ in range(weight)]
+        )
+        total = int(rate * duration_seconds)
+        pending = set()
+        start = loop.time()
+        for index, name in zip(range(total), scenarios):
+            scheduled = start + index / rate
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(self.timed(name, scheduled))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.wait(pending)
+        return self.report(rate, duration_seconds, loop.time() - start)
+
+    def report(self, rate, duration_seconds, elapsed_seconds):
+        """summarise the results as a JSON serialisable dict"""
+        scenarios = {
+            name: summarise(result["latencies"], result["errors"], elapsed_seconds)
+            for name, result in self.results.items()
+        }
+        all_errors = {}
+        for result in self.results.values():
+            for error, count in result["errors"].items():
+                all_errors[error] = all_errors.get(error, 0) + count
+        return {
+            "rate": rate,
+            "duration_seconds": duration_seconds,
+            "elapsed_seconds": round(elapsed_seconds, 3),
+            "connections": len(self.pool.connections),
+            **summarise(
+                [
+                    latency
+                    for result in self.results.values()
+                    for latency in result["latencies"]
+                ],
+                all_errors,
+                elapsed_seconds,
+            ),
+            "scenarios": scenarios,
+        }
+
+
+def percentile(sorted_values, percent):
+    """return the nearest rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarise(latencies, errors, elapsed_seconds):
+    """return the request counts, throughput and latency percentiles in ms"""
+    latencies = sorted(latencies)
+    error_count = sum(errors.values())
+
+    def milliseconds(seconds):
+        return None if seconds is None else round(seconds * 1000, 2)
+
+    return {
+        "requests": len(latencies) + error_count,
+        "errors": error_count,
+        "errors_by_type": dict(sorted(errors.items())),
+        "throughput_rps": round(len(latencies) / elapsed_seconds, 2) if elapsed_seconds else 0,
+        "latency_ms": {
+            **{
+                f"p{percent}": milliseconds(percentile(latencies, percent))
+                for percent in PERCENTILES
+            },
+            "mean": milliseconds(sum(latencies) / len(latencies)) if latencies else None,
+            "max": milliseconds(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+async def run_load_test(target_url, client_id, client_secret, rate, duration_seconds,
+                        connections=DEFAULT_CONNECTIONS, mix=None, paths=None,
+                        verify_tls=True, timeout_seconds=DEFAULT_TIMEOUT_SECONDS):
+    """run a load test against target_url and return its report"""
+    pool = ConnectionPool(target_url, connections, verify_tls)
+    try:
+        load_test = LoadTest(pool, client_id, client_secret, paths, mix, timeout_seconds)
+        return {"target": target_url, **await load_test.run(rate, duration_seconds)}
+    finally:
+        pool.close()
+
+
+def parse_mix(value):
+    """parse e.g. 'token=2,introspect=1,jwks=1' into weights"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_PATHS:
+            raise argparse.ArgumentTypeError(
+                f"unknown scenario '{name}', use {', '.join(DEFAULT_PATHS)}"
+            )
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    """command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Send token, introspection and JWKS traffic to the Curity runtime."
+    )
+    parser.add_argument(
+        "--target",
+        default=os.environ.get("CURITY_LOAD_TEST_TARGET"),
+        help="base URL of the runtime (default: $CURITY_LOAD_TEST_TARGET)",
+    )
+    parser.add_argument("--client-id", default=os.environ.get("CURITY_CLIENT_ID"))
+    parser.add_argument("--rate", type=float, default=50, help="requests per second")
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS)
+    parser.add_argument(
+        "--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. token=2,introspect=1,jwks=0"
+    )
+    for name, path in DEFAULT_PATHS.items():
+        parser.add_argument(f"--{name}-path", default=path)
+    parser.add_argument(
+        "--insecure",
+        action="store_true",
+        default=os.environ.get("CURITY_LOAD_TEST_VERIFY_TLS", "true").lower() == "false",
+        help="skip TLS certificate checks, e.g. for the runtime's own certificate",
+    )
+    parser.add_argument("--report", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if not args.target or not args.client_id:
+        parser.error("--target and --client-id (or their environment variables) are required")
+    client_secret = os.environ.get("CURITY_CLIENT_SECRET")
+    if client_secret is None:
+        parser.error("CURITY_CLIENT_SECRET is not set")
+
+    report = asyncio.run(
+        run_load_test(
+            args.target,
+            args.client_id,
+            client_secret,
+            args.rate,
+            args.duration,
+            connections=args.connections,
+            mix=args.mix,
+            paths={name: getattr(args, f"{name}_path") for name in DEFAULT_PATHS},
+            verify_tls=not args.insecure,
+            timeout_seconds=args.timeout,
+        )
+    )
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            report_file.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""This module serves a stand-in for the Curity runtime's OAuth endpoints.
+
+Usage:-
+
+    python -m curity_fargate_cluster_stack.load_test.mock_oauth_server --port 8080 --latency-ms 5
+
+It answers the load test harness offline: client credentials tokens for the
+--client credentials, introspection of the tokens it has issued and a
+static JWKS, on the harness' default paths over plain HTTP/1.1 with
+keep-alive.  --latency-ms delays every response, to stand in for the
+runtime's own processing time.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import secrets
+import sys
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote
+
+TOKEN_PATH = "/oauth/v2/oauth-token"
+INTROSPECTION_PATH = "/oauth/v2/oauth-introspect"
+JWKS_PATH = "/oauth/v2/oauth-anonymous/jwks"
+DEFAULT_CLIENT = "load-test:load-test-secret"
+TOKEN_LIFETIME_SECONDS = 300
+
+# Old tokens are forgotten beyond this so a long run does not grow forever
+MAX_ISSUED_TOKENS = 100000
+
+# The shape of a Curity signing key; the modulus is filler, not a usable key
+JWKS = {
+    "keys": [
+        {
+            "kty": "RSA",
+            "kid": "mock-signing-key",
+            "use": "sig",
+            "alg": "RS256",
+            "n": base64.urlsafe_b64encode(bytes(range(256))).rstrip(b"=").decode(),
+            "e": "AQAB",
+        }
+    ]
+}
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found"}
+
+
+class MockOAuthServer:
+    """an asyncio HTTP server with token, introspection and JWKS endpoints"""
+
+    def __init__(self, clients=None, latency_ms=0, clock=time.time):
+        self.clients = dict(clients or [DEFAULT_CLIENT.split(":", 1)])
+        self.latency_seconds = latency_ms / 1000
+        self.clock = clock
+        self.issued_tokens = OrderedDict()
+        self.requests = 0
+        self.server = None
+        self.handlers = {}
+
+    async def start(self, host="127.0.0.1", port=0):
+        """start listening and return the port, which is chosen if port is 0"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """stop listening, close any open connections and wait for their handlers"""
+        self.server.close()
+        for writer in self.handlers.values():
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        """serve the requests of one keep-alive connection"""
+        handler = asyncio.current_task()
+        self.handlers[handler] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                request_parts = request_line.decode("latin-1").split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                # A request the server cannot frame gets a 400 and the connection is closed
+                content_length = headers.get("content-length", "0")
+                if len(request_parts) != 3 or not content_length.isdigit():
+                    self.write_response(writer, 400, {"error": "invalid_request"}, False)
+                    await writer.drain()
+                    break
+                method, path, _ = request_parts
+                body = await reader.readexactly(int(content_length))
+
+                self.requests += 1
+                if self.latency_seconds:
+                    await asyncio.sleep(self.latency_seconds)
+                status, payload = self.route(method, path.split("?")[0], headers, body)
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.handlers[handler]
+            writer.close()
+
+    @staticmethod
+    def write_response(writer, status, payload, keep_alive):
+        """write a JSON response"""
+        response_body = json.dumps(payload).encode()
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(response_body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+            + response_body
+        )
+
+    def route(self, method, path, headers, body):
+        """return the status and JSON payload for a request"""
+        if method == "GET" and path == JWKS_PATH:
+            return 200, JWKS
+        if method != "POST" or path not in (TOKEN_PATH, INTROSPECTION_PATH):
+            return 404, {"error": "not_found"}
+
+        form = {name: values[0] for name, values in parse_qs(body.decode()).items()}
+        if not self.authenticated(headers, form):
+            return 401, {"error": "invalid_client"}
+
+        if path == TOKEN_PATH:
+            return self.issue_token(form)
+        return self.introspect(form)
+
+    def authenticated(self, headers, form):
+        """check the client's basic or form post credentials"""
+        authorization = headers.get("authorization", "")
+        if authorization.startswith("Basic "):
+            try:
+                credentials = base64.b64decode(authorization[6:]).decode()
+            except ValueError:
+                return False
+            client_id, _, client_secret = credentials.partition(":")
+            client_id, client_secret = unquote(client_id), unquote(client_secret)
+        else:
+            client_id, client_secret = form.get("client_id"), form.get("client_secret")
+        return client_id in self.clients and self.clients[client_id] == client_secret
+
+    def issue_token(self, form):
+        """issue an opaque client credentials access token"""
+        if form.get("grant_type") != "client_credentials":
+            return 400, {"error": "unsupported_grant_type"}
+
+        access_token = secrets.token_urlsafe(24)
+        self.issued_tokens[access_token] = self.clock() + TOKEN_LIFETIME_SECONDS
+        if len(self.issued_tokens) > MAX_ISSUED_TOKENS:
+            self.issued_tokens.popitem(last=False)
+        return 200, {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": TOKEN_LIFETIME_SECONDS,
+        }
+
+    def introspect(self, form):
+        """report whether a token was issued here and has not expired"""
+        expires = self.issued_tokens.get(form.get("token"))
+        if expires is None or expires <= self.clock():
+            return 200, {"active": False}
+        return 200, {"active": True, "token_type": "bearer", "exp": int(expires)}
+
+
+async def serve(host, port, clients, latency_ms):
+    """run the server until interrupted"""
+    server = MockOAuthServer(clients, latency_ms)
+    port = await server.start(host, port)
+    print(f"Mock OAuth server listening on http://{host}:{port}", flush=True)
+    await server.server.serve_forever()
+
+
+def main(argv=None):
+    """command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Serve stand-in Curity token, introspection and JWKS endpoints."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--client",
+        dest="clients",
+        action="append",
+        help=f"client_id:client_secret, may be repeated (default: {DEFAULT_CLIENT})",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    clients = [client.split(":", 1) for client in args.clients or [DEFAULT_CLIENT]]
+    try:
+        asyncio.run(serve(args.host, args.port, clients, args.latency_ms))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""This module provides the CurityLoadTestTask class."""
+import os.path
+
+from aws_cdk import (
+    CfnOutput,
+    aws_ec2 as ec2,
+    aws_ecr_assets as ecr_assets,
+    aws_ecs as ecs,
+    aws_secretsmanager as secretsmanager,
+)
+from curity_fargate_cluster_stack.base_fargate_service import BaseFargateService
+
+LOAD_TEST_DIRECTORY = os.path.join(os.path.dirname(__file__), "load_test")
+
+# The runtime tasks' own port, reached through their Cloud Map name so the
+# load test measures the tasks rather than the load balancer in front
+DEFAULT_LOAD_TEST_TARGET = "https://runtime.curity:8443"
+
+
+#
+#  The 'load_test' task runs the harness in load_test/harness.py as a
+#  one-off Fargate task in curity-cluster, with 'aws ecs run-task', so the
+#  traffic starts inside the VPC.  There is no service; the task stops
+#  when the run ends and its JSON report is in the task's log stream.
+#
+#  The rate, duration and mix are the container command, so each run can
+#  set them with a container override.  The client secret is read from
+#  the Secrets Manager secret 'client_secret_name'.
+#
+#  The caller opens the runtime service to 'security_group', which the
+#  run-task network configuration has to use.
+# =========================================================================
+class CurityLoadTestTask:
+    """This class creates the task definition that runs the load test harness."""
+
+    def __init__(self, construct, curity_cluster, config):
+        load_test = config["load_test"]
+
+        self.task_definition = ecs.FargateTaskDefinition(
+            construct,
+            "curity-load-test-task",
+            family="curity-load-test",
+            cpu=load_test.get("cpu", 512),
+            memory_limit_mib=load_test.get("memory_mib", 1024),
+        )
+
+        self.task_definition.add_container(
+            "curity-load-test-container",
+            image=ecs.ContainerImage.from_asset(
+                LOAD_TEST_DIRECTORY,
+                exclude=["*.py", "!harness.py", "__pycache__"],
+                platform=ecr_assets.Platform.LINUX_AMD64,
+            ),
+            command=[
+                "--rate", str(load_test.get("rate", 50)),
+                "--duration", str(load_test.get("duration_seconds", 60)),
+            ],
+            environment={
+                "CURITY_LOAD_TEST_TARGET": load_test.get("target_url", DEFAULT_LOAD_TEST_TARGET),
+                "CURITY_CLIENT_ID": load_test["client_id"],
+                "CURITY_LOAD_TEST_VERIFY_TLS": str(load_test.get("verify_tls", False)).lower(),
+            },
+            secrets={
+                "CURITY_CLIENT_SECRET": ecs.Secret.from_secrets_manager(
+                    secretsmanager.Secret.from_secret_name_v2(
+                        construct, "CurityLoadTestClientSecret", load_test["client_secret_name"]
+                    )
+                )
+            },
+            logging=BaseFargateService.aws_log_driver("curity-load-test", config),
+        )
+
+        self.security_group = ec2.SecurityGroup(
+            construct,
+            "CurityLoadTestSecurityGroup",
+            vpc=curity_cluster.vpc,
+            description="Curity load test tasks",
+        )
+
+        CfnOutput(
+            construct,
+            "LoadTestTaskDefinition",
+            value=self.task_definition.task_definition_arn,
+        )
+        CfnOutput(
+            construct,
+            "LoadTestSecurityGroup",
+            value=self.security_group.security_group_id,
+        )
+        CfnOutput(
+            construct,
+            "LoadTestSubnets",
+            value=",".join(
+                subnet.subnet_id for subnet in curity_cluster.vpc.private_subnets
+            ),
+        )
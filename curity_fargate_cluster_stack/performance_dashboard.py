@@ -0,0 +1,359 @@
+"""This module provides the PerformanceDashboard class."""
+from aws_cdk import (
+    Duration,
+    aws_cloudwatch as cloudwatch,
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_elasticloadbalancingv2 as lb,
+    aws_sns as sns,
+)
+
+
+#
+#  The dashboard and alarms give every environment the same view of
+#  latency and saturation for the services the stack builds.
+#
+#  Task churn comes from the Container Insights service metrics, which is
+#  why the cluster has Container Insights enabled when 'dashboard' is set.
+#
+#  A Network Load Balancer has no request level metrics, so with the 'nlb'
+#  frontend the first row shows flows and TCP resets instead of response
+#  time, requests and 5xx, and only the task and host alarms are available.
+#
+#  With 'service_connect' the admin service's Service Connect proxy reports
+#  the runtime cluster connections.  The cluster protocol is not HTTP, so
+#  the proxy has connection and byte counts but no request latency for it.
+#
+#  Each of the 'runtime_pools' is graphed next to the runtime service, and
+#  gets its own copy of the runtime CPU, memory and healthy host alarms.
+#  The pools share the runtime ALB, so the first row covers them all.
+class PerformanceDashboard:
+    """This class creates a CloudWatch dashboard and alarms for the Curity services."""
+
+    def __init__(
+        self,
+        construct,
+        curity_cluster,
+        admin_service,
+        runtime_service,
+        config,
+        pool_services=None,
+        pool_target_groups=None,
+    ):
+        dashboard_config = config["dashboard"]
+        pool_services = pool_services or {}
+        pool_target_groups = pool_target_groups or {}
+        period = Duration.minutes(dashboard_config.get("period_minutes", 1))
+
+        load_balancer = runtime_service.load_balancer
+        target_group = runtime_service.target_group
+        frontend = config.get("load_balancer", {}).get("frontend", "alb")
+
+        healthy_hosts = target_group.metrics.healthy_host_count(
+            statistic="Minimum", period=period, label="Healthy hosts"
+        )
+        frontend_alarm_definitions = []
+        if frontend == "nlb":
+            unhealthy_hosts = target_group.metrics.un_healthy_host_count(
+                statistic="Maximum", period=period, label="Unhealthy hosts"
+            )
+            frontend_widgets = [
+                cloudwatch.GraphWidget(
+                    title="Runtime NLB flows",
+                    left=[
+                        load_balancer.metrics.new_flow_count(
+                            statistic="Sum", period=period, label="New flows"
+                        )
+                    ],
+                    right=[
+                        load_balancer.metrics.active_flow_count(
+                            statistic="Average", period=period, label="Active flows"
+                        )
+                    ],
+                    width=12,
+                ),
+                cloudwatch.GraphWidget(
+                    title="Runtime NLB TCP resets",
+                    left=[
+                        load_balancer.metrics.tcp_client_reset_count(
+                            statistic="Sum", period=period, label="Client resets"
+                        ),
+                        load_balancer.metrics.tcp_target_reset_count(
+                            statistic="Sum", period=period, label="Target resets"
+                        ),
+                        load_balancer.metrics.tcp_elb_reset_count(
+                            statistic="Sum", period=period, label="ELB resets"
+                        ),
+                    ],
+                    width=12,
+                ),
+            ]
+        else:
+            unhealthy_hosts = target_group.metrics.unhealthy_host_count(
+                statistic="Maximum", period=period, label="Unhealthy hosts"
+            )
+            response_time = {
+                percentile: load_balancer.metrics.target_response_time(
+                    statistic=percentile,
+                    period=period,
+                    label=f"TargetResponseTime {percentile}",
+                )
+                for percentile in ("p50", "p90", "p99")
+            }
+            request_count = load_balancer.metrics.request_count(
+                statistic="Sum", period=period, label="Requests"
+            )
+            target_5xx = load_balancer.metrics.http_code_target(
+                lb.HttpCodeTarget.TARGET_5XX_COUNT,
+                statistic="Sum",
+                period=period,
+                label="Target 5xx",
+            )
+            elb_5xx = load_balancer.metrics.http_code_elb(
+                lb.HttpCodeElb.ELB_5XX_COUNT, statistic="Sum", period=period, label="ELB 5xx"
+            )
+            frontend_widgets = [
+                cloudwatch.GraphWidget(
+                    title="Runtime TargetResponseTime (seconds)",
+                    left=list(response_time.values()),
+                    width=12,
+                ),
+                cloudwatch.GraphWidget(
+                    title="Runtime requests and 5xx",
+                    left=[request_count],
+                    right=[target_5xx, elb_5xx],
+                    width=12,
+                ),
+            ]
+            frontend_alarm_definitions = [
+                (
+                    "p99_response_time_seconds",
+                    "RuntimeP99ResponseTime",
+                    response_time["p99"],
+                    cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                ),
+                (
+                    "target_5xx_count",
+                    "RuntimeTarget5xx",
+                    target_5xx,
+                    cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                ),
+            ]
+
+        services = {
+            "Admin": admin_service,
+            "Runtime": runtime_service.service,
+            **{f"Runtime {name}": service for name, service in pool_services.items()},
+        }
+        pool_healthy_hosts = {
+            name: target_group.metrics.healthy_host_count(
+                statistic="Minimum", period=period, label=f"{name} healthy hosts"
+            )
+            for name, target_group in pool_target_groups.items()
+        }
+
+        self.dashboard = cloudwatch.Dashboard(
+            construct,
+            "CurityPerformanceDashboard",
+            dashboard_name="curity-performance",
+        )
+        self.dashboard.add_widgets(*frontend_widgets)
+        self.dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="CPU utilisation (%)",
+                left=[
+                    service.metric_cpu_utilization(period=period, label=name)
+                    for name, service in services.items()
+                ],
+                width=8,
+            ),
+            cloudwatch.GraphWidget(
+                title="Memory utilisation (%)",
+                left=[
+                    service.metric_memory_utilization(period=period, label=name)
+                    for name, service in services.items()
+                ],
+                width=8,
+            ),
+            cloudwatch.GraphWidget(
+                title="Runtime target health",
+                left=[healthy_hosts, unhealthy_hosts, *pool_healthy_hosts.values()],
+                width=8,
+            ),
+        )
+        self.dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Task churn",
+                left=[
+                    PerformanceDashboard.task_count_metric(
+                        curity_cluster, service, metric_name, period, f"{name} {label}"
+                    )
+                    for name, service in services.items()
+                    for metric_name, label in (
+                        ("RunningTaskCount", "running"),
+                        ("PendingTaskCount", "pending"),
+                        ("DesiredTaskCount", "desired"),
+                    )
+                ],
+                width=24,
+            ),
+        )
+        if config.get("service_connect") is not None:
+            self.dashboard.add_widgets(
+                cloudwatch.GraphWidget(
+                    title="Runtime to admin cluster connections",
+                    left=[
+                        PerformanceDashboard.service_connect_metric(
+                            curity_cluster, admin_service, metric_name, statistic, period, label
+                        )
+                        for metric_name, statistic, label in (
+                            ("NewConnectionCount", "Sum", "New connections"),
+                            ("ActiveConnectionCount", "Average", "Active connections"),
+                        )
+                    ],
+                    right=[
+                        PerformanceDashboard.service_connect_metric(
+                            curity_cluster,
+                            admin_service,
+                            "ProcessedBytes",
+                            "Sum",
+                            period,
+                            "Bytes",
+                        )
+                    ],
+                    width=24,
+                ),
+            )
+
+        #
+        #  Alarms -  each one is only created if its threshold is in cdk.json
+        # =====================================================================
+        alarms = dashboard_config.get("alarms", {})
+        evaluation_periods = alarms.get("evaluation_periods", 3)
+        alarm_definitions = frontend_alarm_definitions + [
+            (
+                "runtime_cpu_percent",
+                "RuntimeCpu",
+                runtime_service.service.metric_cpu_utilization(period=period),
+                cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            ),
+            (
+                "runtime_memory_percent",
+                "RuntimeMemory",
+                runtime_service.service.metric_memory_utilization(period=period),
+                cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            ),
+            (
+                "admin_cpu_percent",
+                "AdminCpu",
+                admin_service.metric_cpu_utilization(period=period),
+                cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            ),
+            (
+                "admin_memory_percent",
+                "AdminMemory",
+                admin_service.metric_memory_utilization(period=period),
+                cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            ),
+            (
+                "min_healthy_hosts",
+                "RuntimeHealthyHosts",
+                healthy_hosts,
+                cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+            ),
+        ]
+        for name, service in pool_services.items():
+            alarm_definitions += [
+                (
+                    "runtime_cpu_percent",
+                    f"RuntimePool-{name}-Cpu",
+                    service.metric_cpu_utilization(period=period),
+                    cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                ),
+                (
+                    "runtime_memory_percent",
+                    f"RuntimePool-{name}-Memory",
+                    service.metric_memory_utilization(period=period),
+                    cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                ),
+            ]
+            if name in pool_healthy_hosts:
+                alarm_definitions.append(
+                    (
+                        "min_healthy_hosts",
+                        f"RuntimePool-{name}-HealthyHosts",
+                        pool_healthy_hosts[name],
+                        cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+                    )
+                )
+
+        alarm_topic = (
+            sns.Topic.from_topic_arn(construct, "CurityAlarmTopic", alarms["sns_topic_arn"])
+            if alarms.get("sns_topic_arn")
+            else None
+        )
+
+        self.alarms = []
+        for key, alarm_id, metric, comparison_operator in alarm_definitions:
+            if key not in alarms:
+                continue
+
+            alarm = cloudwatch.Alarm(
+                construct,
+                alarm_id,
+                metric=metric,
+                threshold=alarms[key],
+                evaluation_periods=evaluation_periods,
+                comparison_operator=comparison_operator,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+                if comparison_operator
+                == cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD
+                else cloudwatch.TreatMissingData.BREACHING,
+                alarm_description=f"Curity '{key}' threshold of {alarms[key]} breached",
+            )
+            if alarm_topic:
+                alarm.add_alarm_action(cloudwatch_actions.SnsAction(alarm_topic))
+            self.alarms.append(alarm)
+
+        if self.alarms:
+            self.dashboard.add_widgets(
+                cloudwatch.AlarmStatusWidget(
+                    title="Curity alarms", alarms=self.alarms, width=24
+                )
+            )
+
+    #
+    #  Container Insights service level task counts
+    # =========================================================================
+    @staticmethod
+    def task_count_metric(curity_cluster, service, metric_name, period, label):
+        """Return a Container Insights task count metric for a service"""
+        return cloudwatch.Metric(
+            namespace="ECS/ContainerInsights",
+            metric_name=metric_name,
+            dimensions_map={
+                "ClusterName": curity_cluster.cluster_name,
+                "ServiceName": service.service_name,
+            },
+            statistic="Average",
+            period=period,
+            label=label,
+        )
+
+    #
+    #  Service Connect proxy metrics for the admin node's 'admin' endpoint
+    # =========================================================================
+    @staticmethod
+    def service_connect_metric(curity_cluster, admin_service, metric_name, statistic, period, label):
+        """Return a Service Connect metric for the connections into the admin node"""
+        return cloudwatch.Metric(
+            namespace="AWS/ECS",
+            metric_name=metric_name,
+            dimensions_map={
+                "ClusterName": curity_cluster.cluster_name,
+                "ServiceName": admin_service.service_name,
+                "DiscoveryName": "admin",
+            },
+            statistic=statistic,
+            period=period,
+            label=label,
+        )
@@ -1,5 +1,8 @@
 """This module provides the CurityRuntimeService class."""
 from aws_cdk import (
+    Duration,
+    aws_applicationautoscaling as appscaling,
+    aws_certificatemanager as acm,
     aws_ecs_patterns as ecspattern,
     aws_ecs as ecs,
     aws_elasticloadbalancingv2 as lb,
@@ -9,6 +12,20 @@ from aws_cdk import (
 from curity_fargate_cluster_stack.base_fargate_service import (
     BaseFargateService
 )
+from curity_fargate_cluster_stack.edge_distribution import CurityEdgeDistribution
+
+# Fargate Spot gives two minutes notice of an interruption.  ECS deregisters
+# the task from the target group straight away so in-flight requests must
+# drain well within that window rather than the 300 second ELB default
+SPOT_DEREGISTRATION_DELAY_SECONDS = 60
+
+# The public name of the Curity runtime, and where the ALB moves to when
+# the 'edge' CloudFront distribution takes that name over
+RUNTIME_DOMAIN_NAME = "curity.aws.redkitehill.com"
+DEFAULT_EDGE_ORIGIN_DOMAIN_NAME = "curity-origin.aws.redkitehill.com"
+
+# Used when 'load_balancer' has 'frontend': 'nlb' with 'tls': 'terminate'
+NLB_TLS_POLICY = "ELBSecurityPolicy-TLS13-1-2-2021-06"
 
 
 class CurityRuntimeService(BaseFargateService):
@@ -18,12 +35,18 @@ class CurityRuntimeService(BaseFargateService):
         #
         # Prepare the Container and associated ECS Task
         # ====================================================================
-        curity_image = CurityRuntimeService.choose_docker_runtime_image(construct)
+        curity_image = CurityRuntimeService.choose_docker_runtime_image(construct, config)
 
         runtime_task_definition = self.create_curity_task_definition(
             construct, curity_image, config,  False
         )
 
+        scaling = config.get("scaling")
+        runtime_capacity = config.get("runtime_capacity")
+        load_balancer = config.get("load_balancer", {})
+        deployment = config.get("runtime_deployment", {})
+        edge = config.get("edge")
+
         #
         #  The Load Balancer needs a public dns zone
         # ====================================================================
@@ -44,37 +67,388 @@ class CurityRuntimeService(BaseFargateService):
         #  - We enable the SSM execute-command option to allow debugging
         #    into the containers
         # ====================================================================
-        self.curity_service = ecspattern.ApplicationLoadBalancedFargateService(
-            construct,
-            "CurityRuntimeService",
+        service_options = dict(
             listener_port=443,
-            protocol=lb.ApplicationProtocol.HTTPS,
             domain_zone=hosted_zone,
             task_definition=runtime_task_definition,
-            domain_name="curity.aws.redkitehill.com",
-            target_protocol=lb.ApplicationProtocol.HTTPS,
-            load_balancer_name="curity-lb",
+            domain_name=edge.get("origin_domain_name", DEFAULT_EDGE_ORIGIN_DOMAIN_NAME)
+            if edge is not None
+            else RUNTIME_DOMAIN_NAME,
             cluster=curity_cluster,
             enable_execute_command=True,   # If set, then CDK will also update the Task Role for us.
             service_name="curity-runtime-service",
             cloud_map_options=ecs.CloudMapOptions(name="runtime"),
+            capacity_provider_strategies=self.capacity_provider_strategies(
+                runtime_capacity
+            )
+            if runtime_capacity
+            else None,
+            health_check_grace_period=Duration.seconds(
+                deployment["health_check_grace_seconds"]
+            )
+            if "health_check_grace_seconds" in deployment
+            else None,
+            **self.deployment_options(deployment),
         )
 
+        self.frontend = load_balancer.get("frontend", "alb")
+        if self.frontend == "nlb":
+            self.create_network_load_balanced_service(
+                construct, hosted_zone, load_balancer, service_options
+            )
+        else:
+            self.curity_service = ecspattern.ApplicationLoadBalancedFargateService(
+                construct,
+                "CurityRuntimeService",
+                protocol=lb.ApplicationProtocol.HTTPS,
+                target_protocol=lb.ApplicationProtocol.HTTPS,
+                load_balancer_name="curity-lb",
+                idle_timeout=Duration.seconds(load_balancer["idle_timeout_seconds"])
+                if "idle_timeout_seconds" in load_balancer
+                else None,
+                # With CloudFront's prefix list only CloudFront may connect
+                open_listener=edge is None or "origin_prefix_list_id" not in edge,
+                **service_options,
+            )
+
         #
         # Setup the HealthCheck ping from the LB
-        self.curity_service.target_group.configure_health_check(
-            port="4465",
-            protocol=lb.Protocol.HTTP,
-            # timeout=Duration.seconds(20),
-            # interval=Duration.seconds(30),
-            # unhealthy_threshold_count=10
+        self.configure_target_group(
+            self.curity_service.target_group, load_balancer, runtime_capacity
         )
 
         # https://github.com/aws/aws-cdk/issues/18093
         # We have to additionally allow the LB Service to
         # accept the Healthcheck WHERE it is on a different port
-        self.curity_service.service.connections.allow_from(
+        if self.frontend == "alb":
+            self.curity_service.service.connections.allow_from(
+                self.curity_service.load_balancer,
+                ec2.Port.tcp(4465),
+                "Allow access from LB to the Fargate Service Healthcheck Port",
+            )
+
+        if "http2" in load_balancer:
+            self.curity_service.load_balancer.set_attribute(
+                "routing.http2.enabled", str(load_balancer["http2"]).lower()
+            )
+
+        if config.get("service_connect") is not None:
+            self.enable_service_connect(self.curity_service.service, config, False)
+
+        if edge is not None:
+            if "origin_prefix_list_id" in edge:
+                self.curity_service.load_balancer.connections.allow_from(
+                    ec2.Peer.prefix_list(edge["origin_prefix_list_id"]),
+                    ec2.Port.tcp(443),
+                    "Allow HTTPS from CloudFront only",
+                )
+            self.edge_distribution = CurityEdgeDistribution(
+                construct,
+                hosted_zone,
+                RUNTIME_DOMAIN_NAME,
+                service_options["domain_name"],
+                self.curity_service,
+                config,
+            )
+
+        if scaling:
+            self.configure_auto_scaling(
+                self.curity_service.service, self.curity_service.target_group, scaling
+            )
+
+        #
+        #  The 'runtime_pools' share the listener, behind path rules
+        # ====================================================================
+        self.pool_services = {}
+        self.pool_target_groups = {}
+        for priority, pool in enumerate(config.get("runtime_pools", []), start=1):
+            self.pool_services[pool["name"]] = self.create_runtime_pool(
+                construct,
+                curity_cluster,
+                curity_image,
+                config,
+                pool,
+                priority,
+                self.edge_distribution.origin_verify_condition if edge is not None else None,
+            )
+
+    #
+    #  The 'frontend': 'nlb' mode puts a Network Load Balancer in front of the
+    #  runtime tasks, with the same DNS name and Cloud Map registration as
+    #  the ALB.  With 'tls': 'passthrough' (default) the NLB forwards TCP and
+    #  the Curity runtime terminates TLS itself, so there is one handshake
+    #  and no layer 7 processing per call.  With 'tls': 'terminate' the NLB
+    #  terminates TLS with an ACM certificate and re-encrypts to 8443.
+    #
+    #  The NLB has its own name, as load balancer names must be unique, and
+    #  no security group, so the tasks accept the traffic port and health
+    #  check port from inside the VPC, where the NLB nodes are.
+    # =========================================================================
+    def create_network_load_balanced_service(
+        self, construct, hosted_zone, load_balancer, service_options
+    ):
+        """Create the runtime service behind a Network Load Balancer"""
+        # Cross zone balancing spreads the calls evenly over the tasks
+        # whichever NLB node a client resolves
+        network_load_balancer = lb.NetworkLoadBalancer(
+            construct,
+            "CurityNlb",
+            vpc=service_options["cluster"].vpc,
+            internet_facing=True,
+            load_balancer_name="curity-nlb",
+            cross_zone_enabled=True,
+        )
+        self.curity_service = ecspattern.NetworkLoadBalancedFargateService(
+            construct,
+            "CurityRuntimeService",
+            load_balancer=network_load_balancer,
+            **service_options,
+        )
+
+        if load_balancer.get("tls", "passthrough") == "terminate":
+            certificate = acm.Certificate(
+                construct,
+                "CurityNlbCertificate",
+                domain_name=service_options["domain_name"],
+                validation=acm.CertificateValidation.from_dns(hosted_zone),
+            )
+
+            # The pattern only creates TCP listeners, so switch it and the
+            # target group to TLS
+            listener = self.curity_service.listener.node.default_child
+            listener.add_property_override("Protocol", "TLS")
+            listener.add_property_override(
+                "Certificates", [{"CertificateArn": certificate.certificate_arn}]
+            )
+            listener.add_property_override("SslPolicy", NLB_TLS_POLICY)
+            self.curity_service.target_group.node.default_child.add_property_override(
+                "Protocol", "TLS"
+            )
+
+        vpc_cidr = ec2.Peer.ipv4(self.curity_service.cluster.vpc.vpc_cidr_block)
+        for port, description in (
+            (8443, "Allow the NLB to reach the Curity runtime port"),
+            (4465, "Allow the NLB to reach the Fargate Service Healthcheck Port"),
+        ):
+            self.curity_service.service.connections.allow_from(
+                vpc_cidr, ec2.Port.tcp(port), description
+            )
+
+    #
+    #  A 'runtime_pools' entry is a further runtime service on the same ALB
+    #  listener and DNS name.  Requests that match its path_patterns go to
+    #  its own tasks, so for example a burst of machine to machine token and
+    #  introspection calls scales that pool and leaves the interactive login
+    #  flows on the runtime service alone.  Rules are tried in the order
+    #  the pools are listed in cdk.json; anything unmatched goes to the
+    #  runtime service as before.  With 'edge' each rule also requires
+    #  CloudFront's origin header.
+    #
+    #  A pool has its own task size, task count and scaling.  The image,
+    #  capacity providers, deployment, target group and Service Connect
+    #  settings are the runtime service's.  It registers in Cloud Map as
+    #  'runtime-<name>' and the caller opens the admin node to it.  The
+    #  service and its target group are kept in pool_services and
+    #  pool_target_groups, by pool name, for the caller and the dashboard.
+    # =========================================================================
+    def create_runtime_pool(
+        self,
+        construct,
+        curity_cluster,
+        curity_image,
+        config,
+        pool,
+        priority,
+        origin_verify_condition,
+    ):
+        """Create a runtime pool service and route its paths to it"""
+        name = pool["name"]
+        scaling = pool.get("scaling")
+        runtime_capacity = config.get("runtime_capacity")
+        deployment = config.get("runtime_deployment", {})
+
+        task_definition = self.create_curity_task_definition(
+            construct, curity_image, config, False, pool
+        )
+
+        service = ecs.FargateService(
+            construct,
+            f"CurityRuntimePool-{name}",
+            task_definition=task_definition,
+            cluster=curity_cluster,
+            enable_execute_command=True,
+            service_name=f"curity-runtime-{name}-service",
+            cloud_map_options=ecs.CloudMapOptions(name=f"runtime-{name}"),
+            desired_count=pool.get("desired_count"),
+            capacity_provider_strategies=self.capacity_provider_strategies(
+                runtime_capacity
+            )
+            if runtime_capacity
+            else None,
+            health_check_grace_period=Duration.seconds(
+                deployment["health_check_grace_seconds"]
+            )
+            if "health_check_grace_seconds" in deployment
+            else None,
+            **self.deployment_options(deployment),
+        )
+
+        conditions = [lb.ListenerCondition.path_patterns(pool["path_patterns"])]
+        if origin_verify_condition is not None:
+            conditions.append(origin_verify_condition)
+        target_group = self.curity_service.listener.add_targets(
+            f"CurityRuntimePool-{name}",
+            priority=priority,
+            conditions=conditions,
+            protocol=lb.ApplicationProtocol.HTTPS,
+            targets=[
+                service.load_balancer_target(
+                    container_name="curity-runtime-container", container_port=8443
+                )
+            ],
+        )
+        self.configure_target_group(
+            target_group, config.get("load_balancer", {}), runtime_capacity
+        )
+        self.pool_target_groups[name] = target_group
+        service.connections.allow_from(
             self.curity_service.load_balancer,
             ec2.Port.tcp(4465),
-            "Allow access from LB to the Fargate Service Healthcheck Port",
+            f"Allow access from LB to the {name} pool Healthcheck Port",
+        )
+
+        if config.get("service_connect") is not None:
+            self.enable_service_connect(service, config, False)
+
+        if scaling:
+            self.configure_auto_scaling(service, target_group, scaling)
+
+        return service
+
+    #
+    #  Apply the 'load_balancer' health check and routing settings from
+    #  cdk.json to the runtime or a runtime pool target group
+    #
+    #  Slow start ramps traffic up to freshly started tasks while their JIT
+    #  is still cold, least outstanding requests sends each request to the
+    #  task with the fewest in flight instead of strictly in turn.
+    # =========================================================================
+    @staticmethod
+    def configure_target_group(target_group, load_balancer, runtime_capacity):
+        """Configure the health check and attributes of a runtime target group"""
+        health_check = load_balancer.get("health_check", {})
+        target_group.configure_health_check(
+            port="4465",
+            protocol=lb.Protocol.HTTP,
+            path=health_check.get("path"),
+            timeout=Duration.seconds(health_check["timeout_seconds"])
+            if "timeout_seconds" in health_check
+            else None,
+            interval=Duration.seconds(health_check["interval_seconds"])
+            if "interval_seconds" in health_check
+            else None,
+            healthy_threshold_count=health_check.get("healthy_threshold"),
+            unhealthy_threshold_count=health_check.get("unhealthy_threshold"),
+        )
+
+        if "deregistration_delay_seconds" in load_balancer:
+            target_group.set_attribute(
+                "deregistration_delay.timeout_seconds",
+                str(load_balancer["deregistration_delay_seconds"]),
+            )
+        elif runtime_capacity and runtime_capacity.get("spot_weight", 0) > 0:
+            target_group.set_attribute(
+                "deregistration_delay.timeout_seconds",
+                str(SPOT_DEREGISTRATION_DELAY_SECONDS),
+            )
+
+        if "algorithm" in load_balancer:
+            target_group.set_attribute(
+                "load_balancing.algorithm.type", load_balancer["algorithm"]
+            )
+
+        if "slow_start_seconds" in load_balancer:
+            target_group.set_attribute(
+                "slow_start.duration_seconds", str(load_balancer["slow_start_seconds"])
+            )
+
+        if "stickiness_seconds" in load_balancer:
+            target_group.enable_cookie_stickiness(
+                Duration.seconds(load_balancer["stickiness_seconds"])
+            )
+
+    #
+    #  Build the FARGATE / FARGATE_SPOT strategy from 'runtime_capacity' in cdk.json
+    #
+    #  Only one provider in a strategy may have a base, so the on-demand
+    #  base always goes on FARGATE to keep a floor of uninterruptible tasks.
+    # =========================================================================
+    @staticmethod
+    def capacity_provider_strategies(runtime_capacity):
+        """Return the capacity provider strategy for the runtime tasks"""
+        return [
+            ecs.CapacityProviderStrategy(
+                capacity_provider="FARGATE",
+                base=runtime_capacity.get("on_demand_base", 0),
+                weight=runtime_capacity.get("on_demand_weight", 0),
+            ),
+            ecs.CapacityProviderStrategy(
+                capacity_provider="FARGATE_SPOT",
+                weight=runtime_capacity.get("spot_weight", 0),
+            ),
+        ]
+
+    #
+    #  Attach the autoscaling policies from the 'scaling' block in cdk.json
+    #
+    #  Each target tracking policy is optional and they can be combined,
+    #  in which case ECS scales out on whichever is breached first and
+    #  only scales in when all of them agree.
+    # =========================================================================
+    @staticmethod
+    def configure_auto_scaling(service, target_group, scaling):
+        """Configure target tracking and scheduled scaling for the runtime tasks"""
+        scalable_task_count = service.auto_scale_task_count(
+            min_capacity=scaling["min_capacity"],
+            max_capacity=scaling["max_capacity"],
         )
+
+        cooldowns = {}
+        if "scale_in_cooldown_seconds" in scaling:
+            cooldowns["scale_in_cooldown"] = Duration.seconds(
+                scaling["scale_in_cooldown_seconds"]
+            )
+        if "scale_out_cooldown_seconds" in scaling:
+            cooldowns["scale_out_cooldown"] = Duration.seconds(
+                scaling["scale_out_cooldown_seconds"]
+            )
+
+        if "cpu_target_percent" in scaling:
+            scalable_task_count.scale_on_cpu_utilization(
+                "CpuScaling",
+                target_utilization_percent=scaling["cpu_target_percent"],
+                **cooldowns,
+            )
+
+        if "memory_target_percent" in scaling:
+            scalable_task_count.scale_on_memory_utilization(
+                "MemoryScaling",
+                target_utilization_percent=scaling["memory_target_percent"],
+                **cooldowns,
+            )
+
+        if "requests_per_target" in scaling:
+            scalable_task_count.scale_on_request_count(
+                "RequestCountScaling",
+                requests_per_target=scaling["requests_per_target"],
+                target_group=target_group,
+                **cooldowns,
+            )
+
+        for action in scaling.get("scheduled", []):
+            scalable_task_count.scale_on_schedule(
+                action["name"],
+                schedule=appscaling.Schedule.expression(action["schedule"]),
+                min_capacity=action.get("min_capacity"),
+                max_capacity=action.get("max_capacity"),
+            )
@@ -0,0 +1,247 @@
+"""This module synthesizes every Curity AWS environment in cdk.json in parallel.
+
+Usage (from the directory containing cdk.json):-
+
+    python -m curity_fargate_cluster_stack.synth_all [--env rkh --env dw-dev] [--jobs N]
+
+Each environment is rendered in its own worker process into its own cloud
+assembly, cdk.out/<environment>.  Context lookups such as the VPC are read
+from cdk.context.json, the same cache the cdk CLI writes after a
+credentialed synth, so no AWS credentials or network access are needed
+for the lookups it holds.
+
+Lookups are keyed by account and region.  An environment without an
+'account' and 'region' in cdk.json is synthesized for --account and
+--region, which default to CDK_DEFAULT_ACCOUNT/CDK_DEFAULT_REGION as set
+by the cdk CLI, and otherwise to a placeholder account and region.  The
+VPC lookups for the placeholder are answered offline, in memory, and never
+written to cdk.context.json.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PLACEHOLDER_ACCOUNT = "123456789012"
+PLACEHOLDER_REGION = "eu-west-2"
+
+
+#
+#  Find the Curity AWS environments in cdk.json
+#
+#  The context also holds the CDK feature flags, so an environment is
+#  any context entry that is an object with a 'vpcname'
+# =========================================================================
+def load_context(cdk_json_path, context_cache_path):
+    """return the cdk.json context merged with the cached lookups"""
+    with open(cdk_json_path, encoding="utf-8") as cdk_json:
+        context = json.load(cdk_json).get("context", {})
+
+    if os.path.isfile(context_cache_path):
+        with open(context_cache_path, encoding="utf-8") as context_cache:
+            context.update(json.load(context_cache))
+
+    return context
+
+
+#
+#  Answer the VPC lookup of the placeholder account and region offline
+#
+#  The placeholder VPC has two public and two private subnets, enough for
+#  the templates to be checked without AWS access, e.g. in CI.  They are
+#  not the templates to deploy.
+# =========================================================================
+def placeholder_vpc_lookup(vpc_name):
+    """return a context entry that answers the lookup of the named VPC"""
+    key = (
+        f"vpc-provider:account={PLACEHOLDER_ACCOUNT}:filter.tag:Name={vpc_name}"
+        f":region={PLACEHOLDER_REGION}:returnAsymmetricSubnets=true"
+    )
+    subnet_groups = [
+        {
+            "name": group,
+            "type": group,
+            "subnets": [
+                {
+                    "subnetId": f"subnet-{group.lower()}{index}",
+                    "cidr": f"10.0.{offset + index}.0/24",
+                    "availabilityZone": f"{PLACEHOLDER_REGION}{zone}",
+                    "routeTableId": f"rtb-{group.lower()}{index}",
+                }
+                for index, zone in enumerate("ab")
+            ],
+        }
+        for group, offset in (("Public", 0), ("Private", 2))
+    ]
+    return {
+        key: {
+            "vpcId": "vpc-0123456789abcdef0",
+            "vpcCidrBlock": "10.0.0.0/16",
+            "ownerAccountId": PLACEHOLDER_ACCOUNT,
+            "availabilityZones": [],
+            "subnetGroups": subnet_groups,
+        }
+    }
+
+
+def placeholder_lookups(context, environments):
+    """return the offline VPC lookups of the environments left to the placeholder"""
+    lookups = {}
+    for environment in environments:
+        config = context[environment]
+        if "account" not in config and "region" not in config:
+            lookups.update(placeholder_vpc_lookup(config["vpcname"]))
+    return lookups
+
+
+def find_environments(context):
+    """return the names of the Curity AWS environments in the context"""
+    return [
+        name
+        for name, value in context.items()
+        if isinstance(value, dict) and "vpcname" in value
+    ]
+
+
+#
+#  Synthesize one environment.  This runs in a worker process, which
+#  starts its own jsii runtime, so aws_cdk is only imported here.
+# =========================================================================
+def synth_environment(environment, context, outdir, account, region):
+    """synthesize one environment into outdir/<environment> and report on it"""
+    started = time.perf_counter()
+    result = {"environment": environment, "directory": os.path.join(outdir, environment)}
+    try:
+        # create_curity_stacks falls back to these, as it does under the cdk CLI
+        os.environ["CDK_DEFAULT_ACCOUNT"] = account
+        os.environ["CDK_DEFAULT_REGION"] = region
+
+        import aws_cdk as cdk  # pylint: disable=import-outside-toplevel
+        from curity_fargate_cluster_stack.curity_app import (  # pylint: disable=import-outside-toplevel
+            create_curity_stacks,
+        )
+
+        app = cdk.App(
+            outdir=result["directory"],
+            context={**context, "curity-aws-env": environment},
+        )
+        create_curity_stacks(app)
+        assembly = app.synth()
+
+        result["stacks"] = [stack.stack_name for stack in assembly.stacks]
+        with open(
+            os.path.join(assembly.directory, "manifest.json"), encoding="utf-8"
+        ) as manifest:
+            result["missing_context"] = [
+                missing["key"] for missing in json.load(manifest).get("missing", [])
+            ]
+    except Exception as error:  # pylint: disable=broad-except
+        # jsii errors don't pickle, so only the message goes back to the parent
+        result["error"] = f"{type(error).__name__}: {error}"
+
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def synth_environments(environments, context, outdir, jobs, account, region):
+    """synthesize the environments in parallel, returning results in the order given"""
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(
+                synth_environment, environment, context, outdir, account, region
+            )
+            for environment in environments
+        ]
+        return [future.result() for future in futures]
+
+
+def main(argv=None):
+    """command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Synthesize every Curity AWS environment in cdk.json in parallel."
+    )
+    parser.add_argument(
+        "--env",
+        dest="environments",
+        action="append",
+        help="environment to synthesize, may be repeated (default: all in cdk.json)",
+    )
+    parser.add_argument("--cdk-json", default="cdk.json")
+    parser.add_argument(
+        "--context-cache",
+        default="cdk.context.json",
+        help="cached context lookups, as written by the cdk CLI",
+    )
+    parser.add_argument(
+        "--account",
+        default=os.getenv("CDK_DEFAULT_ACCOUNT", PLACEHOLDER_ACCOUNT),
+        help="account for environments without one in cdk.json "
+        f"(default: CDK_DEFAULT_ACCOUNT, else {PLACEHOLDER_ACCOUNT})",
+    )
+    parser.add_argument(
+        "--region",
+        default=os.getenv("CDK_DEFAULT_REGION", PLACEHOLDER_REGION),
+        help="region for environments without one in cdk.json "
+        f"(default: CDK_DEFAULT_REGION, else {PLACEHOLDER_REGION})",
+    )
+    parser.add_argument("--outdir", default="cdk.out")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="fail environments whose lookups are not in the context cache "
+        "instead of synthesizing them with placeholder values",
+    )
+    args = parser.parse_args(argv)
+
+    context = load_context(args.cdk_json, args.context_cache)
+    environments = args.environments or find_environments(context)
+    unknown = [name for name in environments if name not in context]
+    if unknown:
+        parser.error(f"unknown environment(s) {unknown}, see {args.cdk_json}")
+
+    if (args.account, args.region) == (PLACEHOLDER_ACCOUNT, PLACEHOLDER_REGION):
+        print(
+            f"Using the placeholder account {PLACEHOLDER_ACCOUNT} and region "
+            f"{PLACEHOLDER_REGION}, with offline VPC lookups, for environments "
+            "that do not set them"
+        )
+        # Lookups the cache already holds for the placeholder win
+        context = {**placeholder_lookups(context, environments), **context}
+
+    started = time.perf_counter()
+    results = synth_environments(
+        environments, context, args.outdir, args.jobs, args.account, args.region
+    )
+
+    failed = False
+    for result in results:
+        if "error" in result:
+            failed = True
+            status, detail = "FAILED", result["error"]
+        elif result["missing_context"]:
+            failed = failed or args.strict
+            status = "FAILED" if args.strict else "WARNING"
+            detail = (
+                f"lookups missing from {args.context_cache}: "
+                + ", ".join(result["missing_context"])
+            )
+        else:
+            status = "OK"
+            detail = f"{', '.join(result['stacks'])} -> {result['directory']}"
+        print(f"{result['environment']:<16} {status:<8} {result['seconds']:>6}s  {detail}")
+
+    print(
+        f"Synthesized {len(results)} environment(s) in "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""This module lists the running Curity tasks of every service in the ECS cluster.
+
+Usage:-
+
+    python -m curity_fargate_cluster_stack.task_inventory [--profile home] [--output json]
+
+Tasks are listed per service, then described in batches of up to 100, the
+most describe_tasks accepts, with the services queried concurrently.
+Without --service the tasks that no service started, such as a load test
+run, are listed too, under their task definition family.  The
+AWS calls use botocore's adaptive retry mode, which backs off and rate
+limits the client when ECS throttles it.  --endpoint-url points the tool
+at a local AWS stub instead of ECS.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import boto3
+from botocore.config import Config
+
+DEFAULT_CLUSTER_NAME = "curity-cluster"
+DESCRIBE_TASKS_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 10
+
+COLUMNS = [
+    ("service", "SERVICE"),
+    ("task_id", "TASK"),
+    ("ip_address", "IP"),
+    ("status", "STATUS"),
+    ("health", "HEALTH"),
+    ("availability_zone", "AZ"),
+    ("capacity_provider", "CAPACITY"),
+    ("age", "AGE"),
+]
+
+
+def retry_config(max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """return a client config that backs off and rate limits when AWS throttles"""
+    return Config(retries={"mode": "adaptive", "total_max_attempts": max_attempts})
+
+
+def create_ecs_client(profile=None, region=None, endpoint_url=None,
+                      max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """create an ECS client that retries throttled calls"""
+    session = boto3.session.Session(profile_name=profile, region_name=region)
+    return session.client(
+        "ecs", endpoint_url=endpoint_url, config=retry_config(max_attempts)
+    )
+
+
+#
+#  List the services and their tasks, following every page
+# =========================================================================
+def list_services(ecs, cluster):
+    """return the ARNs of the services in the cluster"""
+    return [
+        service_arn
+        for page in ecs.get_paginator("list_services").paginate(cluster=cluster)
+        for service_arn in page["serviceArns"]
+    ]
+
+
+def list_service_tasks(ecs, cluster, service):
+    """return the ARNs of the service's tasks"""
+    return [
+        task_arn
+        for page in ecs.get_paginator("list_tasks").paginate(
+            cluster=cluster, serviceName=service
+        )
+        for task_arn in page["taskArns"]
+    ]
+
+
+def list_cluster_tasks(ecs, cluster):
+    """return the ARNs of every task in the cluster, whether a service started it or not"""
+    return [
+        task_arn
+        for page in ecs.get_paginator("list_tasks").paginate(cluster=cluster)
+        for task_arn in page["taskArns"]
+    ]
+
+
+def describe_tasks(ecs, cluster, task_arns):
+    """describe the tasks, up to DESCRIBE_TASKS_BATCH_SIZE per call"""
+    tasks = []
+    for start in range(0, len(task_arns), DESCRIBE_TASKS_BATCH_SIZE):
+        response = ecs.describe_tasks(
+            cluster=cluster,
+            tasks=task_arns[start:start + DESCRIBE_TASKS_BATCH_SIZE],
+        )
+        tasks.extend(response["tasks"])
+    return tasks
+
+
+#
+#  Reduce a described task to one inventory row
+# =========================================================================
+def private_ip_address(task):
+    """return the task's private IP, from its awsvpc network interface"""
+    for container in task.get("containers", []):
+        for network_interface in container.get("networkInterfaces", []):
+            if network_interface.get("privateIpv4Address"):
+                return network_interface["privateIpv4Address"]
+
+    # A task that is still provisioning only has the ENI attachment
+    for attachment in task.get("attachments", []):
+        for detail in attachment.get("details", []):
+            if detail["name"] == "privateIPv4Address":
+                return detail["value"]
+
+    return None
+
+
+def format_age(started, now):
+    """return the time since started as e.g. '3d04h', '2h05m' or '42s'"""
+    seconds = int((now - started).total_seconds())
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d{hours:02}h"
+    if hours:
+        return f"{hours}h{minutes:02}m"
+    if minutes:
+        return f"{minutes}m{seconds:02}s"
+    return f"{seconds}s"
+
+
+def task_row(service, task, now):
+    """return the inventory row of a described task"""
+    started = task.get("startedAt") or task.get("createdAt")
+    return {
+        "service": service,
+        "task_id": task["taskArn"].rsplit("/", 1)[-1],
+        "ip_address": private_ip_address(task),
+        "status": task.get("lastStatus"),
+        "health": task.get("healthStatus"),
+        "availability_zone": task.get("availabilityZone"),
+        # Tasks started with a launch type rather than a strategy have no provider
+        "capacity_provider": task.get("capacityProviderName", task.get("launchType")),
+        "started_at": started.isoformat() if started else None,
+        "age": format_age(started, now) if started else None,
+    }
+
+
+def service_inventory(ecs, cluster, service, now):
+    """return the inventory rows of one service's tasks"""
+    service_name = service.rsplit("/", 1)[-1]
+    task_arns = list_service_tasks(ecs, cluster, service_name)
+    return [
+        task_row(service_name, task, now)
+        for task in describe_tasks(ecs, cluster, task_arns)
+    ]
+
+
+def standalone_inventory(ecs, cluster, listed_task_ids, now):
+    """return the inventory rows of the tasks that no service started, e.g. a load test"""
+    task_arns = [
+        task_arn
+        for task_arn in list_cluster_tasks(ecs, cluster)
+        if task_arn.rsplit("/", 1)[-1] not in listed_task_ids
+    ]
+    return [
+        # The group is 'family:<task definition family>' for a task from run_task
+        task_row(task.get("group"), task, now)
+        for task in describe_tasks(ecs, cluster, task_arns)
+        # A service task started after its service was listed is not standalone
+        if not task.get("group", "").startswith("service:")
+    ]
+
+
+def task_inventory(ecs, cluster, services=None, jobs=8, now=None):
+    """return the inventory rows of every task, querying the services concurrently"""
+    list_standalone = not services
+    services = services or list_services(ecs, cluster)
+    now = now or datetime.now(timezone.utc)
+
+    # boto3 clients are thread safe, so the threads share the one client
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(services)))) as executor:
+        inventories = executor.map(
+            lambda service: service_inventory(ecs, cluster, service, now), services
+        )
+        rows = [
+            row
+            for inventory in inventories
+            for row in sorted(inventory, key=lambda row: row["task_id"])
+        ]
+
+    if list_standalone:
+        rows += sorted(
+            standalone_inventory(ecs, cluster, {row["task_id"] for row in rows}, now),
+            key=lambda row: row["task_id"],
+        )
+    return rows
+
+
+def format_table(rows):
+    """return the rows as an aligned text table"""
+    widths = {
+        key: max([len(title)] + [len(str(row[key] or "-")) for row in rows])
+        for key, title in COLUMNS
+    }
+    lines = ["  ".join(title.ljust(widths[key]) for key, title in COLUMNS)]
+    for row in rows:
+        lines.append(
+            "  ".join(str(row[key] or "-").ljust(widths[key]) for key, _ in COLUMNS)
+        )
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def main(argv=None):
+    """command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="List the tasks of every service, and any standalone tasks, "
+        "in the Curity ECS cluster."
+    )
+    parser.add_argument("--cluster", default=DEFAULT_CLUSTER_NAME)
+    parser.add_argument(
+        "--service",
+        dest="services",
+        action="append",
+        help="service to list, may be repeated (default: every service in the cluster)",
+    )
+    parser.add_argument("--profile", help="AWS profile, e.g. home")
+    parser.add_argument("--region")
+    parser.add_argument("--endpoint-url", help="e.g. a local AWS stub")
+    parser.add_argument("--output", choices=("table", "json"), default="table")
+    parser.add_argument("--jobs", type=int, default=8, help="services queried at once")
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help="attempts per AWS call before a throttled call fails",
+    )
+    args = parser.parse_args(argv)
+
+    ecs = create_ecs_client(args.profile, args.region, args.endpoint_url, args.max_attempts)
+    rows = task_inventory(ecs, args.cluster, args.services, args.jobs)
+
+    if args.output == "json":
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_table(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""Shared fixtures that synthesize the Curity stacks, see tests.unit.helpers."""
+import functools
+
+import pytest
+
+from tests.unit.helpers import synth_environment, synth_split_environment
+
+
+@pytest.fixture(scope="session")
+def docker_context(tmp_path_factory):
+    """a stand in for ../curity-docker-provisioning"""
+    directory = tmp_path_factory.mktemp("curity-docker-provisioning")
+    for role in ("admin", "runtime"):
+        (directory / f"Dockerfile.{role}").write_text(
+            "FROM curity.azurecr.io/curity/idsvr:latest\n", encoding="utf-8"
+        )
+    (directory / "local.plain.env").write_text("ADMIN=true\n", encoding="utf-8")
+    return directory
+
+
+@pytest.fixture(scope="session")
+def synth(docker_context):
+    """synthesize an environment from cdk.json, see synth_environment"""
+    return functools.partial(synth_environment, docker_context)
+
+
+@pytest.fixture(scope="session")
+def synth_split(docker_context):
+    """build an environment in the split layout, see synth_split_environment"""
+    return functools.partial(synth_split_environment, docker_context)
@@ -0,0 +1,180 @@
+"""Helpers that synthesize the Curity stacks without AWS or Docker.
+
+The VPC lookup is answered from a fake entry in the context, as synth_all
+does for its placeholder account and region, and the Docker image assets
+point at a throwaway build directory.  Synth only stages the assets, so
+no image is built.
+"""
+import copy
+import json
+import os
+
+import aws_cdk as cdk
+from aws_cdk import assertions
+
+from curity_fargate_cluster_stack.curity_aws_env_config import get_config
+from curity_fargate_cluster_stack.curity_fargate_cluster import CurityFargateCluster
+from curity_fargate_cluster_stack.curity_split_stacks import build_split_stacks
+from curity_fargate_cluster_stack.synth_all import (
+    PLACEHOLDER_ACCOUNT,
+    PLACEHOLDER_REGION,
+    placeholder_vpc_lookup,
+)
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+# The VPC lookup of the synth_all placeholder is answered offline
+TEST_ACCOUNT = PLACEHOLDER_ACCOUNT
+TEST_REGION = PLACEHOLDER_REGION
+
+
+def load_cdk_context():
+    """return the context section of the project's cdk.json"""
+    with open(os.path.join(PROJECT_DIRECTORY, "cdk.json"), encoding="utf-8") as cdk_json:
+        return json.load(cdk_json)["context"]
+
+
+def cdk_environments():
+    """return the names of the Curity AWS environments in cdk.json"""
+    return [
+        name
+        for name, value in load_cdk_context().items()
+        if isinstance(value, dict) and "vpcname" in value
+    ]
+
+
+#
+#  The tuned environment from the README, applied over rkh
+# =========================================================================
+EXAMPLE_SETTINGS = {
+    "runtime_capacity": {"on_demand_base": 1, "on_demand_weight": 1, "spot_weight": 3},
+    "load_balancer": {
+        "slow_start_seconds": 60,
+        "deregistration_delay_seconds": 30,
+        "idle_timeout_seconds": 60,
+        "http2": True,
+        "health_check": {
+            "interval_seconds": 10,
+            "timeout_seconds": 5,
+            "healthy_threshold": 2,
+            "unhealthy_threshold": 3,
+        },
+    },
+    "metrics": {
+        "scrape_interval_seconds": 15,
+        "metric_relabel_configs": [
+            {
+                "source_labels": ["__name__"],
+                "regex": "jvm_buffer_.*|jvm_classes_.*",
+                "action": "drop",
+            }
+        ],
+    },
+    "dashboard": {
+        "alarms": {
+            "evaluation_periods": 3,
+            "p99_response_time_seconds": 1.0,
+            "target_5xx_count": 10,
+            "runtime_cpu_percent": 85,
+            "runtime_memory_percent": 90,
+            "min_healthy_hosts": 1,
+        }
+    },
+    "logging": {"driver": "awslogs", "max_buffer_size_mib": 25, "retention_days": 30},
+    "vpc_endpoints": ["s3", "ecr_api", "ecr_dkr", "logs"],
+    "admin_deployment": {"min_healthy_percent": 0, "max_healthy_percent": 100},
+    "runtime_deployment": {
+        "min_healthy_percent": 100,
+        "max_healthy_percent": 200,
+        "health_check_grace_seconds": 120,
+        "circuit_breaker": True,
+    },
+    "admin_task": {"cpu": 1024, "memory_mib": 4096},
+    "runtime_task": {"cpu": 2048, "memory_mib": 8192, "heap_percent": 75, "gc": "G1"},
+    "scaling": {
+        "min_capacity": 1,
+        "max_capacity": 4,
+        "cpu_target_percent": 60,
+        "memory_target_percent": 75,
+        "requests_per_target": 500,
+        "scale_in_cooldown_seconds": 300,
+        "scale_out_cooldown_seconds": 60,
+        "scheduled": [
+            {
+                "name": "MorningLoginPeak",
+                "schedule": "cron(30 6 ? * MON-FRI *)",
+                "min_capacity": 2,
+            },
+            {
+                "name": "AfterMorningLoginPeak",
+                "schedule": "cron(0 10 ? * MON-FRI *)",
+                "min_capacity": 1,
+            },
+        ],
+    },
+}
+
+
+def environment_app(docker_context, environment, **overrides):
+    """return an App for an environment from cdk.json, with optional config overrides"""
+    context = copy.deepcopy(load_cdk_context())
+    target_config = context[environment]
+    if "envfile" in target_config:
+        target_config["envfile"] = str(docker_context / "local.plain.env")
+    target_config["image_build"] = {
+        **target_config.get("image_build", {}),
+        "directory": str(docker_context),
+    }
+    target_config.update(overrides)
+
+    context.update(placeholder_vpc_lookup(target_config["vpcname"]))
+    return cdk.App(context={**context, "curity-aws-env": environment})
+
+
+def build_environment(docker_context, environment, **overrides):
+    """build an environment from cdk.json, returning the CurityFargateCluster stack"""
+    app = environment_app(docker_context, environment, **overrides)
+    return CurityFargateCluster(
+        app,
+        "CurityFargateCluster",
+        env=cdk.Environment(account=TEST_ACCOUNT, region=TEST_REGION),
+        config=get_config(app),
+    )
+
+
+def synth_environment(docker_context, environment, **overrides):
+    """synthesize an environment from cdk.json, with optional config overrides"""
+    return assertions.Template.from_stack(
+        build_environment(docker_context, environment, **overrides)
+    )
+
+
+def synth_split_environment(docker_context, environment, **overrides):
+    """build an environment with 'stack_layout': 'split', returning the four stacks"""
+    app = environment_app(docker_context, environment, stack_layout="split", **overrides)
+    return build_split_stacks(
+        app,
+        "CurityFargateCluster",
+        env=cdk.Environment(account=TEST_ACCOUNT, region=TEST_REGION),
+        config=get_config(app),
+    )
+
+
+def docker_image_sources(stack):
+    """synthesize the stack's app and return the sources of its Docker image assets
+
+    Each 'directory' is made absolute, it is the staged build context.
+    """
+    assembly = stack.node.root.synth()
+    manifest_artifact = next(
+        artifact
+        for artifact in assembly.artifacts
+        if artifact.id == f"{stack.artifact_id}.assets"
+    )
+    with open(manifest_artifact.file, encoding="utf-8") as manifest_file:
+        docker_images = json.load(manifest_file).get("dockerImages", {})
+    sources = []
+    for image in docker_images.values():
+        source = dict(image["source"])
+        source["directory"] = os.path.join(assembly.directory, source["directory"])
+        sources.append(source)
+    return sources
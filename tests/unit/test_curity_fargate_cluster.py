@@ -0,0 +1,1036 @@
+"""Template assertions for the performance relevant settings of CurityFargateCluster."""
+import json
+import os
+
+import pytest
+from aws_cdk.assertions import Match, Template
+from jsonschema import ValidationError
+
+from tests.unit.helpers import (
+    EXAMPLE_SETTINGS,
+    build_environment,
+    cdk_environments,
+    docker_image_sources,
+    load_cdk_context,
+)
+
+TASK_DEFINITION = "AWS::ECS::TaskDefinition"
+
+
+def curity_container(role, **properties):
+    """match a task definition whose Curity container has the given properties"""
+    return {
+        "ContainerDefinitions": Match.array_with(
+            [Match.object_like({"Name": f"curity-{role}-container", **properties})]
+        )
+    }
+
+
+@pytest.fixture(scope="module")
+def example(synth):
+    return synth("rkh", **EXAMPLE_SETTINGS)
+
+
+@pytest.fixture(scope="module")
+def dw_dev(synth):
+    return synth("dw-dev")
+
+
+@pytest.mark.parametrize("environment", cdk_environments())
+def test_task_sizes_match_cdk_json(synth, environment):
+    template = synth(environment)
+    config = load_cdk_context()[environment]
+
+    for role in ("admin", "runtime"):
+        sizing = config.get(f"{role}_task", {})
+        template.has_resource_properties(
+            TASK_DEFINITION,
+            {
+                **curity_container(role),
+                "Cpu": str(sizing.get("cpu", 1024)),
+                "Memory": str(sizing.get("memory_mib", 4096)),
+                "RuntimePlatform": {
+                    "CpuArchitecture": sizing.get("cpu_architecture", "X86_64"),
+                    "OperatingSystemFamily": "LINUX",
+                },
+            },
+        )
+
+
+def test_jvm_heap_is_sized_from_task_memory(example):
+    example.has_resource_properties(
+        TASK_DEFINITION,
+        curity_container(
+            "runtime",
+            Environment=Match.array_with(
+                [
+                    {
+                        "Name": "JAVA_OPTS",
+                        "Value": Match.string_like_regexp(
+                            "^-Xms6144m -Xmx6144m -XX:\\+UseG1GC"
+                        ),
+                    }
+                ]
+            ),
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "memory_mib, heap_percent, heap_mib",
+    [
+        # The non heap reserve wins on a small task
+        (2048, None, 1280),
+        (4096, 50, 2048),
+        (8192, 90, 7372),
+    ],
+)
+def test_jvm_heap_leaves_the_non_heap_reserve(synth, memory_mib, heap_percent, heap_mib):
+    sizing = {"cpu": 1024, "memory_mib": memory_mib}
+    if heap_percent is not None:
+        sizing["heap_percent"] = heap_percent
+    template = synth("dw-dev", runtime_task=sizing)
+    template.has_resource_properties(
+        TASK_DEFINITION,
+        curity_container(
+            "runtime",
+            Environment=Match.array_with(
+                [
+                    {
+                        "Name": "JAVA_OPTS",
+                        "Value": Match.string_like_regexp(
+                            f"^-Xms{heap_mib}m -Xmx{heap_mib}m "
+                        ),
+                    }
+                ]
+            ),
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "sizing, message",
+    [
+        ({"cpu": 1024, "memory_mib": 1024}, "too small for Curity"),
+        ({"cpu": 4096, "memory_mib": 4096}, "not supported by Fargate"),
+        ({"cpu": 512, "memory_mib": 16384}, "not supported by Fargate"),
+    ],
+)
+def test_unsupported_task_sizes_are_rejected(synth, sizing, message):
+    with pytest.raises(LookupError, match=message):
+        synth("dw-dev", runtime_task=sizing)
+
+
+def test_port_mappings(example):
+    curity_ports = [8443, 6749, 4465, 4466]
+    for role, ports in (("admin", curity_ports + [6789]), ("runtime", curity_ports)):
+        example.has_resource_properties(
+            TASK_DEFINITION,
+            curity_container(
+                role,
+                PortMappings=[
+                    {"ContainerPort": port, "HostPort": port, "Protocol": "tcp"}
+                    for port in ports
+                ],
+            ),
+        )
+
+    example.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "ServiceName": "curity-runtime-service",
+            "LoadBalancers": [
+                Match.object_like(
+                    {"ContainerName": "curity-runtime-container", "ContainerPort": 8443}
+                )
+            ],
+        },
+    )
+
+
+def test_health_checks(example):
+    for role in ("admin", "runtime"):
+        example.has_resource_properties(
+            TASK_DEFINITION,
+            curity_container(
+                role,
+                HealthCheck={
+                    "Command": ["CMD-SHELL", "curl -sf http://localhost:4465/ || exit 1"],
+                    "Interval": 15,
+                    "Retries": 3,
+                    "StartPeriod": 120,
+                    "Timeout": 5,
+                },
+            ),
+        )
+
+    example.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup",
+        {
+            "HealthCheckPort": "4465",
+            "HealthCheckProtocol": "HTTP",
+            "HealthCheckIntervalSeconds": 10,
+            "HealthCheckTimeoutSeconds": 5,
+            "HealthyThresholdCount": 2,
+            "UnhealthyThresholdCount": 3,
+            "TargetGroupAttributes": Match.array_with(
+                [
+                    {"Key": "deregistration_delay.timeout_seconds", "Value": "30"},
+                    {"Key": "slow_start.duration_seconds", "Value": "60"},
+                ]
+            ),
+        },
+    )
+    example.has_resource_properties(
+        "AWS::ECS::Service",
+        {"ServiceName": "curity-runtime-service", "HealthCheckGracePeriodSeconds": 120},
+    )
+
+
+def test_runtime_scaling(example):
+    example.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {
+            "MinCapacity": 1,
+            "MaxCapacity": 4,
+            "ScheduledActions": [
+                Match.object_like(
+                    {
+                        "ScheduledActionName": "MorningLoginPeak",
+                        "ScalableTargetAction": {"MinCapacity": 2},
+                    }
+                ),
+                Match.object_like({"ScheduledActionName": "AfterMorningLoginPeak"}),
+            ],
+        },
+    )
+    example.resource_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", 3)
+    for metric_type, target in (
+        ("ECSServiceAverageCPUUtilization", 60),
+        ("ECSServiceAverageMemoryUtilization", 75),
+        ("ALBRequestCountPerTarget", 500),
+    ):
+        example.has_resource_properties(
+            "AWS::ApplicationAutoScaling::ScalingPolicy",
+            {
+                "TargetTrackingScalingPolicyConfiguration": Match.object_like(
+                    {
+                        "PredefinedMetricSpecification": Match.object_like(
+                            {"PredefinedMetricType": metric_type}
+                        ),
+                        "TargetValue": target,
+                        "ScaleInCooldown": 300,
+                        "ScaleOutCooldown": 60,
+                    }
+                )
+            },
+        )
+
+    example.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "ServiceName": "curity-runtime-service",
+            # Left to the scalable target, so a deploy doesn't reset the task count
+            "DesiredCount": Match.absent(),
+            "CapacityProviderStrategy": [
+                {"CapacityProvider": "FARGATE", "Base": 1, "Weight": 1},
+                {"CapacityProvider": "FARGATE_SPOT", "Weight": 3},
+            ],
+        },
+    )
+
+
+def test_log_settings(example):
+    for role in ("admin", "runtime"):
+        example.has_resource_properties(
+            TASK_DEFINITION,
+            curity_container(
+                role,
+                LogConfiguration={
+                    "LogDriver": "awslogs",
+                    "Options": Match.object_like(
+                        {"mode": "non-blocking", "max-buffer-size": "25m"}
+                    ),
+                },
+            ),
+        )
+
+    for log_group in example.find_resources("AWS::Logs::LogGroup").values():
+        assert log_group["Properties"]["RetentionInDays"] == 30
+
+
+def test_rolling_deployments(example):
+    example.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "ServiceName": "curity-runtime-service",
+            "HealthCheckGracePeriodSeconds": 120,
+            "DeploymentConfiguration": {
+                "MinimumHealthyPercent": 100,
+                "MaximumPercent": 200,
+                "DeploymentCircuitBreaker": {"Enable": True, "Rollback": True},
+            },
+        },
+    )
+    example.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "ServiceName": "curity-admin-service",
+            "DeploymentConfiguration": {"MinimumHealthyPercent": 0, "MaximumPercent": 100},
+        },
+    )
+
+
+def test_defaults_without_optional_settings(dw_dev):
+    dw_dev.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "ServiceName": "curity-runtime-service",
+            "LaunchType": "FARGATE",
+            "CapacityProviderStrategy": Match.absent(),
+        },
+    )
+    dw_dev.has_resource_properties(
+        TASK_DEFINITION,
+        curity_container(
+            "runtime",
+            LogConfiguration={
+                "LogDriver": "awslogs",
+                "Options": Match.object_like({"max-buffer-size": Match.absent()}),
+            },
+        ),
+    )
+    for service_name in ("curity-admin-service", "curity-runtime-service"):
+        dw_dev.has_resource_properties(
+            "AWS::ECS::Service",
+            {
+                "ServiceName": service_name,
+                "DeploymentConfiguration": Match.object_like(
+                    {"DeploymentCircuitBreaker": Match.absent()}
+                ),
+            },
+        )
+    dw_dev.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 0)
+    dw_dev.resource_count_is("AWS::EC2::VPCEndpoint", 0)
+
+
+def test_vpc_endpoints(synth):
+    template = synth(
+        "dw-dev", vpc_endpoints=["s3", "ecr_api", "ecr_dkr", "logs", "ssm", "ssm_messages"]
+    )
+
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 6)
+    # S3 is a gateway on the private route tables, it needs no private DNS
+    template.has_resource_properties(
+        "AWS::EC2::VPCEndpoint",
+        {
+            "ServiceName": {"Fn::Join": ["", ["com.amazonaws.", {"Ref": "AWS::Region"}, ".s3"]]},
+            "VpcEndpointType": "Gateway",
+            "RouteTableIds": ["rtb-private0", "rtb-private1"],
+        },
+    )
+    for service in ("ecr.api", "ecr.dkr", "logs", "ssm", "ssmmessages"):
+        template.has_resource_properties(
+            "AWS::EC2::VPCEndpoint",
+            {
+                "ServiceName": f"com.amazonaws.eu-west-2.{service}",
+                "VpcEndpointType": "Interface",
+                "PrivateDnsEnabled": True,
+                "SubnetIds": ["subnet-private0", "subnet-private1"],
+            },
+        )
+
+
+def test_prebuilt_images_are_pulled_from_ecr(docker_context):
+    digest = "sha256:" + "0123456789abcdef" * 4
+    stack = build_environment(
+        docker_context,
+        "dw-dev",
+        admin_image={"repository_name": "curity/admin", "digest": digest},
+        runtime_image={"repository_name": "curity/runtime", "tag": "8.0.1"},
+    )
+    template = Template.from_stack(stack)
+
+    references = {"admin": f"/curity/admin@{digest}", "runtime": "/curity/runtime:8.0.1"}
+    for role, reference in references.items():
+        template.has_resource_properties(
+            TASK_DEFINITION,
+            curity_container(
+                role,
+                Image={
+                    "Fn::Join": [
+                        "",
+                        ["123456789012.dkr.ecr.eu-west-2.", {"Ref": "AWS::URLSuffix"}, reference],
+                    ]
+                },
+            ),
+        )
+    # Nothing is built or published
+    assert docker_image_sources(stack) == []
+
+
+def test_images_are_built_per_role_by_default(docker_context):
+    sources = docker_image_sources(build_environment(docker_context, "dw-dev"))
+
+    assert sorted(source["dockerFile"] for source in sources) == [
+        "Dockerfile.admin",
+        "Dockerfile.runtime",
+    ]
+    for source in sources:
+        for option in ("dockerBuildTarget", "dockerBuildArgs", "cacheFrom", "cacheTo"):
+            assert option not in source
+        # The env file is left out of the build context and the asset hash
+        assert sorted(os.listdir(source["directory"])) == ["Dockerfile.admin", "Dockerfile.runtime"]
+
+
+def test_image_build_options(docker_context):
+    cache = "123456789012.dkr.ecr.eu-west-2.amazonaws.com/curity-build-cache"
+    stack = build_environment(
+        docker_context,
+        "dw-dev",
+        image_build={
+            "directory": str(docker_context),
+            "file": "Dockerfile.admin",
+            "runtime_target": "runtime-slim",
+            "build_args": {"CURITY_VERSION": "8.0.1"},
+            "cache_repository": cache,
+            "exclude": ["Dockerfile.runtime"],
+        },
+    )
+    sources = {source["dockerBuildTarget"]: source for source in docker_image_sources(stack)}
+
+    assert sorted(sources) == ["admin", "runtime-slim"]
+    for role, other_role in (("admin", "runtime"), ("runtime-slim", "admin")):
+        source = sources[role]
+        own_cache = f"{cache}:{role.split('-')[0]}-x86_64"
+        assert source["dockerFile"] == "Dockerfile.admin"
+        assert source["dockerBuildArgs"] == {"CURITY_VERSION": "8.0.1"}
+        # Each build reads its own cache first, then the other role's
+        assert source["cacheFrom"] == [
+            {"type": "registry", "params": {"ref": own_cache}},
+            {"type": "registry", "params": {"ref": f"{cache}:{other_role}-x86_64"}},
+        ]
+        assert source["cacheTo"] == {
+            "type": "registry",
+            "params": {"ref": own_cache, "mode": "max"},
+        }
+        # 'exclude' replaces the default list
+        assert sorted(os.listdir(source["directory"])) == ["Dockerfile.admin", "local.plain.env"]
+
+
+def metrics_collector(template, role):
+    """return the ADOT collector container of the role's task definition"""
+    for task_definition in template.find_resources(TASK_DEFINITION).values():
+        for container in task_definition["Properties"]["ContainerDefinitions"]:
+            if container["Name"] == f"curity-{role}-metrics":
+                return container
+    raise AssertionError(f"no curity-{role}-metrics container")
+
+
+def test_metrics_sidecar_writes_to_a_new_workspace(example):
+    example.resource_count_is("AWS::APS::Workspace", 1)
+    example.has_resource_properties("AWS::APS::Workspace", {"Alias": "curity-metrics"})
+
+    for role in ("admin", "runtime"):
+        collector = metrics_collector(example, role)
+        assert collector["Image"] == "public.ecr.aws/aws-observability/aws-otel-collector:v0.29.0"
+        # Losing metrics must not stop Curity
+        assert collector["Essential"] is False
+        [collector_config] = [
+            variable["Value"]
+            for variable in collector["Environment"]
+            if variable["Name"] == "AOT_CONFIG_CONTENT"
+        ]
+        # The remote write URL is read from the new workspace
+        _, config_parts = collector_config["Fn::Join"]
+        assert {"Fn::GetAtt": ["CurityMetrics", "PrometheusEndpoint"]} in config_parts
+
+        example.has_resource_properties(
+            "AWS::IAM::Policy",
+            {
+                "PolicyDocument": {
+                    "Statement": Match.array_with(
+                        [
+                            Match.object_like(
+                                {"Action": Match.array_with(["aps:RemoteWrite"])}
+                            )
+                        ]
+                    )
+                },
+                "Roles": [{"Ref": Match.string_like_regexp(f"curity{role}taskTaskRole")}],
+            },
+        )
+
+
+def test_metrics_sidecar_writes_to_an_existing_workspace(synth):
+    template = synth(
+        "dw-dev", metrics={"workspace_id": "ws-12345678-abcd", "scrape_interval_seconds": 15}
+    )
+
+    template.resource_count_is("AWS::APS::Workspace", 0)
+    for role in ("admin", "runtime"):
+        collector = metrics_collector(template, role)
+        [collector_config] = [
+            json.loads(variable["Value"])
+            for variable in collector["Environment"]
+            if variable["Name"] == "AOT_CONFIG_CONTENT"
+        ]
+        assert collector_config["exporters"]["prometheusremotewrite"]["endpoint"] == (
+            "https://aps-workspaces.eu-west-2.amazonaws.com"
+            "/workspaces/ws-12345678-abcd/api/v1/remote_write"
+        )
+        prometheus = collector_config["receivers"]["prometheus"]["config"]
+        assert prometheus["global"]["scrape_interval"] == "15s"
+        assert prometheus["scrape_configs"][0]["static_configs"][0]["targets"] == [
+            "localhost:4466"
+        ]
+
+
+def test_firelens_routes_the_curity_logs(synth):
+    template = synth(
+        "dw-dev",
+        logging={
+            "driver": "firelens",
+            "firelens": {"destination": "firehose", "delivery_stream": "curity-logs"},
+        },
+    )
+    template.has_resource_properties(
+        TASK_DEFINITION,
+        {
+            "ContainerDefinitions": Match.array_with(
+                [
+                    Match.object_like(
+                        {
+                            "Name": "curity-runtime-container",
+                            "LogConfiguration": {"LogDriver": "awsfirelens"},
+                        }
+                    ),
+                    Match.object_like(
+                        {
+                            "Essential": True,
+                            # A pinned release, never init-latest
+                            "Image": Match.string_like_regexp(r"aws-for-fluent-bit:init-\d"),
+                            "FirelensConfiguration": Match.object_like(
+                                {"Type": "fluentbit"}
+                            ),
+                        }
+                    ),
+                ]
+            )
+        },
+    )
+
+
+def test_firelens_s3_batches_fit_in_one_put_object(synth):
+    with pytest.raises(ValidationError, match="1024"):
+        synth(
+            "dw-dev",
+            logging={
+                "driver": "firelens",
+                "firelens": {"destination": "s3", "bucket_name": "logs", "batch_size_mib": 2048},
+            },
+        )
+
+def test_nlb_passes_tls_through_to_the_runtime(synth):
+    template = synth("dw-dev", load_balancer={"frontend": "nlb"})
+
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::LoadBalancer",
+        {"Name": "curity-nlb", "Type": "network", "Scheme": "internet-facing"},
+    )
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::Listener",
+        {"Port": 443, "Protocol": "TCP", "Certificates": Match.absent()},
+    )
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup",
+        {"Protocol": "TCP", "HealthCheckPort": "4465", "HealthCheckProtocol": "HTTP"},
+    )
+    template.resource_count_is("AWS::CertificateManager::Certificate", 0)
+
+
+def test_nlb_can_terminate_tls(synth):
+    template = synth("dw-dev", load_balancer={"frontend": "nlb", "tls": "terminate"})
+
+    template.resource_count_is("AWS::CertificateManager::Certificate", 1)
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::Listener",
+        {"Port": 443, "Protocol": "TLS", "SslPolicy": Match.string_like_regexp("TLS13")},
+    )
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup", {"Protocol": "TLS"}
+    )
+
+
+def test_nlb_rejects_alb_only_settings(synth):
+    with pytest.raises(LookupError, match="p99_response_time_seconds"):
+        synth(
+            "dw-dev",
+            load_balancer={"frontend": "nlb"},
+            dashboard={"alarms": {"p99_response_time_seconds": 2.0}},
+        )
+
+
+def test_service_connect_replaces_the_admin_dns_name(synth):
+    template = synth("dw-dev", service_connect={"idle_timeout_seconds": 0})
+
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "ServiceName": "curity-admin-service",
+            "ServiceRegistries": Match.absent(),
+            "ServiceConnectConfiguration": Match.object_like(
+                {
+                    "Enabled": True,
+                    "Services": [
+                        {
+                            "PortName": "cluster",
+                            "DiscoveryName": "admin",
+                            "ClientAliases": [{"DnsName": "admin.curity", "Port": 6789}],
+                            "Timeout": {"IdleTimeoutSeconds": 0},
+                        }
+                    ],
+                }
+            ),
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {
+            "ServiceName": "curity-runtime-service",
+            "ServiceConnectConfiguration": Match.object_like(
+                {"Enabled": True, "Services": Match.absent()}
+            ),
+        },
+    )
+    template.has_resource_properties(
+        TASK_DEFINITION,
+        curity_container(
+            "admin",
+            PortMappings=Match.array_with(
+                [{"ContainerPort": 6789, "HostPort": 6789, "Name": "cluster", "Protocol": "tcp"}]
+            ),
+        ),
+    )
+
+
+def test_edge_caches_only_the_configured_paths(synth):
+    template = synth(
+        "dw-dev",
+        edge={
+            "origin_prefix_list_id": "pl-93a247fa",
+            "cache_behaviors": [
+                {"path_pattern": "/oauth/v2/oauth-anonymous/jwks", "ttl_seconds": 300},
+                {"path_pattern": "/assets/*", "ttl_seconds": 3600, "max_ttl_seconds": 86400},
+            ],
+        },
+    )
+
+    template.has_resource_properties(
+        "AWS::CloudFront::Distribution",
+        {
+            "DistributionConfig": Match.object_like(
+                {
+                    "Aliases": ["curity.aws.redkitehill.com"],
+                    "DefaultCacheBehavior": Match.object_like(
+                        {
+                            # The managed CachingDisabled policy
+                            "CachePolicyId": "4135ea2d-6df8-44a3-9df3-4b5a84be39ad",
+                            "AllowedMethods": Match.array_with(["POST"]),
+                            "ViewerProtocolPolicy": "redirect-to-https",
+                        }
+                    ),
+                    "CacheBehaviors": [
+                        Match.object_like(
+                            {
+                                "PathPattern": path_pattern,
+                                "ViewerProtocolPolicy": "redirect-to-https",
+                            }
+                        )
+                        for path_pattern in ("/oauth/v2/oauth-anonymous/jwks", "/assets/*")
+                    ],
+                    "Origins": [
+                        Match.object_like(
+                            {
+                                "DomainName": "curity-origin.aws.redkitehill.com",
+                                "OriginCustomHeaders": [
+                                    Match.object_like({"HeaderName": "X-Origin-Verify"})
+                                ],
+                            }
+                        )
+                    ],
+                }
+            )
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CloudFront::CachePolicy",
+        {
+            "CachePolicyConfig": Match.object_like(
+                {"DefaultTTL": 3600, "MaxTTL": 86400, "MinTTL": 0}
+            )
+        },
+    )
+
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::Listener",
+        {"DefaultActions": [Match.object_like({"Type": "fixed-response"})]},
+    )
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::ListenerRule",
+        {
+            "Conditions": [
+                Match.object_like(
+                    {
+                        "Field": "http-header",
+                        "HttpHeaderConfig": Match.object_like(
+                            {"HttpHeaderName": "X-Origin-Verify"}
+                        ),
+                    }
+                )
+            ],
+            "Actions": [Match.object_like({"Type": "forward"})],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::EC2::SecurityGroupIngress",
+        {"SourcePrefixListId": "pl-93a247fa", "FromPort": 443, "ToPort": 443},
+    )
+    for name in ("curity.aws.redkitehill.com.", "curity-origin.aws.redkitehill.com."):
+        template.has_resource_properties(
+            "AWS::Route53::RecordSet", {"Name": name, "Type": "A"}
+        )
+
+
+def test_edge_can_leave_the_public_name_out_of_dns(synth):
+    # The first of the two deploys that move a deployed environment to the edge
+    template = synth("dw-dev", edge={"alias_records": False})
+
+    template.resource_count_is("AWS::CloudFront::Distribution", 1)
+    template.resource_count_is("AWS::Route53::RecordSet", 1)
+    template.has_resource_properties(
+        "AWS::Route53::RecordSet", {"Name": "curity-origin.aws.redkitehill.com.", "Type": "A"}
+    )
+
+
+def test_edge_certificate_is_issued_in_us_east_1(docker_context):
+    stack = build_environment(docker_context, "dw-dev", edge={})
+    certificate_stack = stack.node.scope.node.find_child("CurityFargateCluster-EdgeCertificate")
+
+    assert certificate_stack.region == "us-east-1"
+    Template.from_stack(certificate_stack).has_resource_properties(
+        "AWS::CertificateManager::Certificate",
+        {
+            "DomainName": "curity.aws.redkitehill.com",
+            "ValidationMethod": "DNS",
+            "DomainValidationOptions": [
+                {
+                    "DomainName": "curity.aws.redkitehill.com",
+                    "HostedZoneId": "Z06756123LAL436U5E34J",
+                }
+            ],
+        },
+    )
+    # The distribution reads the certificate ARN back across regions
+    Template.from_stack(stack).has_resource_properties(
+        "AWS::CloudFront::Distribution",
+        {
+            "DistributionConfig": Match.object_like(
+                {
+                    "ViewerCertificate": Match.object_like(
+                        {
+                            "AcmCertificateArn": {
+                                "Fn::GetAtt": [
+                                    Match.string_like_regexp("ExportsReader"),
+                                    Match.any_value(),
+                                ]
+                            }
+                        }
+                    )
+                }
+            )
+        },
+    )
+
+def test_load_test_task_runs_inside_the_vpc(synth):
+    template = synth(
+        "dw-dev",
+        load_test={"client_id": "load-test", "client_secret_name": "curity/load-test", "rate": 200},
+    )
+
+    template.has_resource_properties(
+        TASK_DEFINITION,
+        {
+            "Family": "curity-load-test",
+            "ContainerDefinitions": [
+                Match.object_like(
+                    {
+                        "Command": ["--rate", "200", "--duration", "60"],
+                        "Environment": Match.array_with(
+                            [
+                                {
+                                    "Name": "CURITY_LOAD_TEST_TARGET",
+                                    "Value": "https://runtime.curity:8443",
+                                }
+                            ]
+                        ),
+                        "Secrets": [Match.object_like({"Name": "CURITY_CLIENT_SECRET"})],
+                    }
+                )
+            ],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::EC2::SecurityGroupIngress",
+        {
+            "FromPort": 8443,
+            "SourceSecurityGroupId": {
+                "Fn::GetAtt": [Match.string_like_regexp("CurityLoadTestSecurityGroup"), "GroupId"]
+            },
+        },
+    )
+    template.resource_count_is("AWS::ECS::Service", 2)
+
+
+def test_database_is_reached_through_the_proxy(synth):
+    template = synth(
+        "dw-dev",
+        database={"proxy": {"max_connections_percent": 75, "borrow_timeout_seconds": 30}},
+    )
+
+    template.has_resource_properties(
+        "AWS::RDS::DBProxyTargetGroup",
+        {
+            "ConnectionPoolConfigurationInfo": {
+                "MaxConnectionsPercent": 75,
+                "ConnectionBorrowTimeout": 30,
+            }
+        },
+    )
+    for role in ("admin", "runtime"):
+        template.has_resource_properties(
+            TASK_DEFINITION,
+            curity_container(
+                role,
+                Secrets=[
+                    Match.object_like({"Name": "CURITY_DB_URL"}),
+                    Match.object_like({"Name": "CURITY_DB_USERNAME"}),
+                    Match.object_like({"Name": "CURITY_DB_PASSWORD"}),
+                ],
+            ),
+        )
+        template.has_resource_properties(
+            "AWS::EC2::SecurityGroupIngress",
+            {
+                "FromPort": 5432,
+                "GroupId": {
+                    "Fn::GetAtt": [Match.string_like_regexp("ProxySecurityGroup"), "GroupId"]
+                },
+                "SourceSecurityGroupId": {
+                    "Fn::GetAtt": [
+                        Match.string_like_regexp(f"Curity{role.title()}Service"),
+                        "GroupId",
+                    ]
+                },
+            },
+        )
+    # Only the two services may use the proxy
+    proxy_ingress = template.find_resources(
+        "AWS::EC2::SecurityGroupIngress", {"Properties": {"FromPort": 5432}}
+    )
+    assert len(proxy_ingress) == 2
+
+
+def test_database_proxy_idle_pool_fits_in_the_pool(synth):
+    with pytest.raises(LookupError, match="max_idle_connections_percent"):
+        synth(
+            "dw-dev",
+            database={
+                "proxy": {"max_connections_percent": 20, "max_idle_connections_percent": 50}
+            },
+        )
+
+
+def test_runtime_pools_share_the_listener(synth):
+    template = synth(
+        "dw-dev",
+        runtime_pools=[
+            {
+                "name": "api",
+                "path_patterns": ["/oauth/v2/oauth-token", "/oauth/v2/oauth-introspect"],
+                "task": {"cpu": 2048, "memory_mib": 4096},
+                "scaling": {"min_capacity": 2, "max_capacity": 20, "requests_per_target": 500},
+            },
+            {"name": "jwks", "path_patterns": ["/oauth/v2/oauth-anonymous/*"], "desired_count": 2},
+        ],
+        edge={},
+    )
+
+    template.resource_count_is("AWS::ECS::Service", 4)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 1)
+    template.has_resource_properties(
+        "AWS::ECS::Service",
+        {"ServiceName": "curity-runtime-api-service", "DesiredCount": Match.absent()},
+    )
+    template.has_resource_properties(
+        "AWS::ECS::Service", {"ServiceName": "curity-runtime-jwks-service", "DesiredCount": 2}
+    )
+    template.has_resource_properties(
+        "AWS::ServiceDiscovery::Service", {"Name": "runtime-api"}
+    )
+    template.has_resource_properties(
+        TASK_DEFINITION, {"Cpu": "2048", "Memory": "4096", **curity_container("runtime")}
+    )
+    # The pool rules come before the edge rule that forwards everything else
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::ListenerRule",
+        {
+            "Priority": 1,
+            "Conditions": [
+                {
+                    "Field": "path-pattern",
+                    "PathPatternConfig": {
+                        "Values": ["/oauth/v2/oauth-token", "/oauth/v2/oauth-introspect"]
+                    },
+                },
+                Match.object_like({"Field": "http-header"}),
+            ],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::ListenerRule", {"Priority": 50000}
+    )
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {
+            "MinCapacity": 2,
+            "MaxCapacity": 20,
+            "ResourceId": Match.any_value(),
+        },
+    )
+    template.has_resource_properties(
+        "AWS::EC2::SecurityGroupIngress",
+        {
+            "FromPort": 6789,
+            "SourceSecurityGroupId": {
+                "Fn::GetAtt": [Match.string_like_regexp("CurityRuntimePooljwks"), "GroupId"]
+            },
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "overrides, message",
+    [
+        (
+            {"load_balancer": {"frontend": "nlb"}},
+            "need the 'alb' load_balancer frontend",
+        ),
+        (
+            {"runtime_pools": [{"name": "api", "path_patterns": ["/a"]}] * 2},
+            "repeat the names",
+        ),
+        (
+            {"runtime_task": {"cpu_architecture": "ARM64"}},
+            "cpu_architecture",
+        ),
+        (
+            {
+                "edge": {},
+                "runtime_pools": [{"name": "api", "path_patterns": ["/a", "/b", "/c", "/d", "/e"]}],
+            },
+            "at most 4 path_patterns",
+        ),
+    ],
+)
+def test_runtime_pools_are_validated(synth, overrides, message):
+    config = {
+        "runtime_pools": [
+            {"name": "api", "path_patterns": ["/a"], "task": {"cpu_architecture": "X86_64"}}
+        ],
+        **overrides,
+    }
+    with pytest.raises(LookupError, match=message):
+        synth("dw-dev", **config)
+
+
+def test_split_layout_keeps_the_single_stack_logical_ids(synth, synth_split):
+    optional_settings = {
+        "runtime_pools": [{"name": "api", "path_patterns": ["/oauth/v2/oauth-token"]}],
+        "service_connect": {},
+        "database": {},
+        "load_test": {"client_id": "load-test", "client_secret_name": "curity/load-test"},
+        "dashboard": {},
+    }
+    stacks = synth_split("dw-dev", **optional_settings)
+    # Synthesizing adds the dependencies between the stacks
+    templates = [Template.from_stack(stack) for stack in stacks]
+
+    assert [stack.stack_name for stack in stacks] == [
+        f"CurityFargateCluster-{part}" for part in ("Network", "Admin", "Runtime", "Support")
+    ]
+    # Each stack depends only on the ones before it, never on a later one
+    for position, stack in enumerate(stacks):
+        assert {dependency.stack_name for dependency in stack.dependencies} == {
+            earlier.stack_name for earlier in stacks[:position]
+        }
+
+    def logical_ids_by_type(templates):
+        logical_ids = {}
+        for template in templates:
+            for logical_id, resource in template.to_json()["Resources"].items():
+                logical_ids.setdefault(resource["Type"], set()).add(logical_id)
+        return logical_ids
+
+    single = logical_ids_by_type([synth("dw-dev", **optional_settings)])
+    split = logical_ids_by_type(templates)
+    for resource_type in ("AWS::ECS::Service", TASK_DEFINITION):
+        assert split[resource_type] == single[resource_type]
+    # Only the security group rules between the stacks are new
+    rules = ("AWS::EC2::SecurityGroupIngress", "AWS::EC2::SecurityGroupEgress")
+    assert {key: ids for key, ids in split.items() if key not in rules} == {
+        key: ids for key, ids in single.items() if key not in rules
+    }
+    # such as the load test's access to the runtime pool, made from the Support stack
+    templates[3].has_resource_properties(
+        "AWS::EC2::SecurityGroupIngress",
+        {
+            "FromPort": 8443,
+            "GroupId": {"Fn::ImportValue": Match.string_like_regexp("CurityRuntimePoolapi")},
+            "SourceSecurityGroupId": {
+                "Fn::GetAtt": [Match.string_like_regexp("CurityLoadTestSecurityGroup"), "GroupId"]
+            },
+        },
+    )
+
+
+def test_runtime_pools_are_monitored_and_load_tested(synth):
+    template = synth(
+        "dw-dev",
+        runtime_pools=[{"name": "api", "path_patterns": ["/oauth/v2/oauth-token"]}],
+        load_test={"client_id": "load-test", "client_secret_name": "curity/load-test"},
+        dashboard={
+            "alarms": {
+                "runtime_cpu_percent": 85,
+                "runtime_memory_percent": 90,
+                "min_healthy_hosts": 1,
+            }
+        },
+    )
+
+    alarms = template.find_resources("AWS::CloudWatch::Alarm")
+    for alarm in ("Cpu", "Memory", "HealthyHosts"):
+        assert any(logical_id.startswith(f"RuntimePoolapi{alarm}") for logical_id in alarms)
+    assert len(alarms) == 6
+    template.has_resource_properties(
+        "AWS::EC2::SecurityGroupIngress",
+        {
+            "FromPort": 8443,
+            "GroupId": {
+                "Fn::GetAtt": [Match.string_like_regexp("CurityRuntimePoolapi"), "GroupId"]
+            },
+            "SourceSecurityGroupId": {
+                "Fn::GetAtt": [Match.string_like_regexp("CurityLoadTestSecurityGroup"), "GroupId"]
+            },
+        },
+    )
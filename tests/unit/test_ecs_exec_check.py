@@ -0,0 +1,344 @@
+"""Tests for the ECS Exec checker against stubbed AWS clients."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from curity_fargate_cluster_stack import ecs_exec_check
+from curity_fargate_cluster_stack.ecs_exec_check import FAIL, OK, WARN
+
+ACCOUNT = "123456789012"
+REGION = "eu-west-2"
+CLUSTER = "curity-cluster"
+CALLER_ARN = f"arn:aws:iam::{ACCOUNT}:user/operator"
+TASK_ROLE_ARN = f"arn:aws:iam::{ACCOUNT}:role/curity-runtime-task-role"
+TASK_DEFINITION_ARN = f"arn:aws:ecs:{REGION}:{ACCOUNT}:task-definition/curity-runtime:3"
+TASK_ARN = f"arn:aws:ecs:{REGION}:{ACCOUNT}:task/{CLUSTER}/{{}}"
+
+
+@pytest.fixture
+def stubbed_clients():
+    clients = {
+        service_name: boto3.client(
+            service_name,
+            region_name=REGION,
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+        for service_name in ("ecs", "ec2", "iam", "kms", "sts")
+    }
+    stubbers = {name: Stubber(client) for name, client in clients.items()}
+    for stubber in stubbers.values():
+        stubber.activate()
+    yield clients, stubbers
+    for stubber in stubbers.values():
+        stubber.assert_no_pending_responses()
+        stubber.deactivate()
+
+
+def running_task(task_id, **properties):
+    return {
+        "taskArn": TASK_ARN.format(task_id),
+        "taskDefinitionArn": TASK_DEFINITION_ARN,
+        "group": "service:curity-runtime-service",
+        "lastStatus": "RUNNING",
+        "launchType": "FARGATE",
+        "platformVersion": "1.4.0",
+        "platformFamily": "Linux",
+        "enableExecuteCommand": True,
+        "containers": [
+            {
+                "name": "curity-runtime-container",
+                "managedAgents": [{"name": "ExecuteCommandAgent", "lastStatus": "RUNNING"}],
+            }
+        ],
+        "attachments": [
+            {"details": [{"name": "subnetId", "value": "subnet-private1"}]}
+        ],
+        **properties,
+    }
+
+
+def simulation(*decisions):
+    return {
+        "EvaluationResults": [
+            {"EvalActionName": action, "EvalDecision": decision}
+            for action, decision in decisions
+        ]
+    }
+
+
+def stub_cluster(stubbers, status="ACTIVE"):
+    """queue the cluster lookup, which check_tasks makes first"""
+    stubbers["ecs"].add_response(
+        "describe_clusters",
+        {"clusters": [{"clusterName": CLUSTER, "status": status, "configuration": {}}]},
+        {"clusters": [CLUSTER], "include": ["CONFIGURATIONS"]},
+    )
+
+
+def stub_shared_lookups(stubbers, task_definition, vpc_endpoints, role_decision="allowed"):
+    """queue the lookups that every task shares, each exactly once"""
+    stubbers["sts"].add_response(
+        "get_caller_identity", {"Account": ACCOUNT, "Arn": CALLER_ARN, "UserId": "AIDA"}
+    )
+    tasks_arn = f"arn:aws:ecs:{REGION}:{ACCOUNT}:task/{CLUSTER}/*"
+    stubbers["iam"].add_response(
+        "simulate_principal_policy",
+        simulation(("ecs:ExecuteCommand", "allowed")),
+        {
+            "PolicySourceArn": CALLER_ARN,
+            "ActionNames": ["ecs:ExecuteCommand"],
+            "ResourceArns": [tasks_arn],
+        },
+    )
+    stubbers["iam"].add_response(
+        "simulate_principal_policy",
+        simulation(("ssm:StartSession", "implicitDeny")),
+        {
+            "PolicySourceArn": CALLER_ARN,
+            "ActionNames": ["ssm:StartSession"],
+            "ResourceArns": [tasks_arn],
+        },
+    )
+    stubbers["ecs"].add_response(
+        "describe_task_definition",
+        {"taskDefinition": task_definition},
+        {"taskDefinition": TASK_DEFINITION_ARN},
+    )
+    stubbers["iam"].add_response(
+        "simulate_principal_policy",
+        simulation(
+            *[(action, role_decision) for action in ecs_exec_check.SSM_MESSAGES_ACTIONS]
+        ),
+        {
+            "PolicySourceArn": TASK_ROLE_ARN,
+            "ActionNames": list(ecs_exec_check.SSM_MESSAGES_ACTIONS),
+        },
+    )
+    stubbers["ec2"].add_response(
+        "describe_subnets",
+        {"Subnets": [{"SubnetId": "subnet-private1", "VpcId": "vpc-1", "OwnerId": ACCOUNT}]},
+        {"SubnetIds": ["subnet-private1"]},
+    )
+    stubbers["ec2"].add_response(
+        "describe_vpc_endpoints",
+        {"VpcEndpoints": [{"ServiceName": name} for name in vpc_endpoints]},
+        {"Filters": [{"Name": "vpc-id", "Values": ["vpc-1"]}]},
+    )
+
+
+def results_by_check(report):
+    return {result["check"]: result for result in report["results"]}
+
+
+def test_lookups_are_shared_across_tasks(stubbed_clients):
+    clients, stubbers = stubbed_clients
+    stub_cluster(stubbers)
+    task_ids = ["task1", "task2", "task3"]
+    stubbers["ecs"].add_response(
+        "describe_tasks",
+        {"tasks": [running_task(task_id) for task_id in task_ids]},
+        {"cluster": CLUSTER, "tasks": task_ids},
+    )
+    stub_shared_lookups(
+        stubbers,
+        {
+            "taskRoleArn": TASK_ROLE_ARN,
+            "containerDefinitions": [
+                {
+                    "name": "curity-runtime-container",
+                    "linuxParameters": {"initProcessEnabled": True},
+                }
+            ],
+        },
+        vpc_endpoints=[f"com.amazonaws.{REGION}.ssmmessages"],
+    )
+
+    checker = ecs_exec_check.EcsExecChecker(clients, CLUSTER)
+    reports = checker.check_tasks(task_ids, jobs=1)
+
+    assert [report["task_id"] for report in reports] == task_ids
+    for report in reports:
+        assert report["group"] == "service:curity-runtime-service"
+        assert {result["status"] for result in report["results"]} == {OK, WARN}
+        assert results_by_check(report)["Cluster Configuration"]["status"] == WARN
+
+
+def test_problems_are_reported_per_task(stubbed_clients):
+    clients, stubbers = stubbed_clients
+    stub_cluster(stubbers)
+    stubbers["ecs"].add_response(
+        "describe_tasks",
+        {
+            "tasks": [
+                running_task(
+                    "stopped",
+                    lastStatus="STOPPED",
+                    stoppedReason="Essential container exited",
+                    platformVersion="1.3.0",
+                    enableExecuteCommand=False,
+                )
+            ],
+            "failures": [{"arn": TASK_ARN.format("gone"), "reason": "MISSING"}],
+        },
+        {"cluster": CLUSTER, "tasks": ["stopped", "gone"]},
+    )
+    stub_shared_lookups(
+        stubbers,
+        {
+            "taskRoleArn": TASK_ROLE_ARN,
+            "containerDefinitions": [
+                {
+                    "name": "curity-runtime-container",
+                    "readonlyRootFilesystem": True,
+                    "environment": [{"name": "AWS_ACCESS_KEY_ID", "value": "AKIA"}],
+                }
+            ],
+        },
+        vpc_endpoints=[f"com.amazonaws.{REGION}.s3"],
+        role_decision="implicitDeny",
+    )
+
+    checker = ecs_exec_check.EcsExecChecker(clients, CLUSTER)
+    stopped, gone = checker.check_tasks(["stopped", "gone"], jobs=1)
+
+    results = results_by_check(stopped)
+    assert results["Task Status"] == {
+        "check": "Task Status",
+        "status": FAIL,
+        "detail": "STOPPED (Essential container exited)",
+    }
+    assert results["Exec Enabled for Task"]["status"] == FAIL
+    assert results["Platform Version"]["detail"] == "1.3.0 (Required: >= 1.4.0)"
+    assert results["Init Process - curity-runtime-container"]["status"] == WARN
+    assert results["Read-Only Root Filesystem - curity-runtime-container"]["status"] == FAIL
+    assert results["Environment Variables - curity-runtime-container"]["status"] == WARN
+    assert results["Task Role Permissions"]["status"] == FAIL
+    assert "ssmmessages:OpenDataChannel" in results["Task Role Permissions"]["detail"]
+    assert results["VPC Endpoints"]["status"] == WARN
+
+    assert gone["results"] == [
+        {"check": "Task Exists", "status": FAIL, "detail": f"not found in {CLUSTER}"}
+    ]
+
+
+@pytest.mark.parametrize(
+    "clusters, detail",
+    [
+        ({"clusters": [], "failures": [{"arn": CLUSTER, "reason": "MISSING"}]}, "not found"),
+        ({"clusters": [{"clusterName": CLUSTER, "status": "INACTIVE"}]}, "INACTIVE"),
+    ],
+)
+def test_missing_or_inactive_cluster_fails(stubbed_clients, monkeypatch, capsys, clusters, detail):
+    clients, stubbers = stubbed_clients
+    stubbers["ecs"].add_response(
+        "describe_clusters", clusters, {"clusters": [CLUSTER], "include": ["CONFIGURATIONS"]}
+    )
+    monkeypatch.setattr(ecs_exec_check, "create_clients", lambda *args: clients)
+
+    assert ecs_exec_check.main([]) == 1
+    assert f"FAIL  Cluster Status  {CLUSTER} {detail}" in capsys.readouterr().out
+
+
+def test_arns_use_the_caller_partition(stubbed_clients):
+    clients, stubbers = stubbed_clients
+    stub_cluster(stubbers)
+    caller_arn = f"arn:aws-cn:iam::{ACCOUNT}:user/operator"
+    stubbers["sts"].add_response(
+        "get_caller_identity", {"Account": ACCOUNT, "Arn": caller_arn, "UserId": "AIDA"}
+    )
+    for action in ("ecs:ExecuteCommand", "ssm:StartSession"):
+        stubbers["iam"].add_response(
+            "simulate_principal_policy",
+            simulation((action, "allowed")),
+            {
+                "PolicySourceArn": caller_arn,
+                "ActionNames": [action],
+                "ResourceArns": [f"arn:aws-cn:ecs:{REGION}:{ACCOUNT}:task/{CLUSTER}/*"],
+            },
+        )
+
+    checker = ecs_exec_check.EcsExecChecker(clients, CLUSTER)
+    results = {result["check"]: result for result in checker.check_caller_permissions()}
+
+    assert results["Can I ExecuteCommand?"]["status"] == OK
+
+
+def test_denied_lookup_fails_only_its_check(stubbed_clients):
+    clients, stubbers = stubbed_clients
+    stubbers["ecs"].add_response(
+        "describe_clusters",
+        {"clusters": [{"clusterName": CLUSTER}]},
+        {"clusters": [CLUSTER], "include": ["CONFIGURATIONS"]},
+    )
+    stubbers["sts"].add_client_error("get_caller_identity", "AccessDenied")
+    stubbers["ecs"].add_response(
+        "describe_task_definition",
+        {"taskDefinition": {"containerDefinitions": []}},
+        {"taskDefinition": TASK_DEFINITION_ARN},
+    )
+
+    checker = ecs_exec_check.EcsExecChecker(clients, CLUSTER)
+    report = checker.check_task(running_task("task1", attachments=[]))
+
+    results = results_by_check(report)
+    assert results["Caller Permissions"]["status"] == FAIL
+    assert "AccessDenied" in results["Caller Permissions"]["detail"]
+    assert results["Task Status"]["status"] == OK
+    assert results["Task Role"] == {"check": "Task Role", "status": FAIL, "detail": "Not Configured"}
+
+
+def test_cache_reloads_after_the_ttl():
+    now = [0.0]
+    cache = ecs_exec_check.TTLCache(ttl_seconds=60, clock=lambda: now[0])
+    loads = []
+
+    def load():
+        loads.append(now[0])
+        return len(loads)
+
+    assert cache.get("key", load) == 1
+    now[0] = 59
+    assert cache.get("key", load) == 1
+    now[0] = 61
+    assert cache.get("key", load) == 2
+    assert loads == [0.0, 61]
+
+
+def test_cache_loads_once_for_concurrent_callers():
+    cache = ecs_exec_check.TTLCache()
+    calls = []
+    lock = threading.Lock()
+
+    def slow_load():
+        with lock:
+            calls.append(1)
+        time.sleep(0.2)
+        return "vpc-1"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: cache.get("subnet", slow_load), range(8)))
+
+    assert results == ["vpc-1"] * 8
+    assert len(calls) == 1
+
+
+def test_cache_does_not_keep_failures():
+    cache = ecs_exec_check.TTLCache()
+
+    def fail():
+        raise RuntimeError("throttled")
+
+    with pytest.raises(RuntimeError):
+        cache.get("key", fail)
+    assert cache.get("key", lambda: "ok") == "ok"
+
+
+def test_version_tuple():
+    assert ecs_exec_check.version_tuple("1.50.2") > ecs_exec_check.version_tuple("1.9.0")
+    assert ecs_exec_check.version_tuple("1.4.0") >= (1, 4, 0)
+
@@ -0,0 +1,206 @@
+"""Tests for the load test harness against the bundled mock OAuth server."""
+import asyncio
+import json
+import subprocess
+import sys
+
+import pytest
+
+from curity_fargate_cluster_stack.load_test import harness, mock_oauth_server
+
+CLIENT_ID = "load-test"
+CLIENT_SECRET = "load-test-secret"
+
+
+async def run_against_mock(server, **options):
+    port = await server.start()
+    try:
+        return await harness.run_load_test(f"http://127.0.0.1:{port}", **options)
+    finally:
+        await server.stop()
+
+
+def test_report_covers_every_scenario():
+    server = mock_oauth_server.MockOAuthServer(latency_ms=1)
+
+    report = asyncio.run(
+        run_against_mock(
+            server,
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            rate=200,
+            duration_seconds=0.6,
+            connections=4,
+            mix={"token": 2, "introspect": 1, "jwks": 1},
+        )
+    )
+
+    assert report["requests"] == 120
+    assert report["errors"] == 0
+    assert {name: scenario["requests"] for name, scenario in report["scenarios"].items()} == {
+        "token": 60,
+        "introspect": 30,
+        "jwks": 30,
+    }
+    # The harness fetches one token up front for the introspection calls
+    assert server.requests == 121
+    latency = report["latency_ms"]
+    assert 1 <= latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    assert report["throughput_rps"] > 0
+
+
+def test_failed_requests_are_counted_by_type():
+    server = mock_oauth_server.MockOAuthServer()
+
+    report = asyncio.run(
+        run_against_mock(
+            server,
+            client_id=CLIENT_ID,
+            client_secret="wrong",
+            rate=100,
+            duration_seconds=0.2,
+            connections=2,
+            mix={"token": 1, "jwks": 1},
+        )
+    )
+
+    assert report["scenarios"]["token"]["errors_by_type"] == {"http_401": 10}
+    assert report["scenarios"]["token"]["latency_ms"]["p50"] is None
+    assert report["scenarios"]["jwks"]["errors"] == 0
+    assert report["errors"] == 10
+
+
+def test_slow_responses_time_out():
+    server = mock_oauth_server.MockOAuthServer(latency_ms=300)
+
+    report = asyncio.run(
+        run_against_mock(
+            server,
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            rate=20,
+            duration_seconds=0.1,
+            mix={"jwks": 1},
+            timeout_seconds=0.05,
+        )
+    )
+
+    assert report["errors_by_type"] == {"timeout": 2}
+
+
+
+async def run_against_broken_server(response, **options):
+    """run the harness against a server that sends response then closes the connection"""
+
+    async def respond(reader, writer):
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        writer.write(response)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(respond, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await harness.run_load_test(f"http://127.0.0.1:{port}", **options)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.parametrize(
+    "response, error",
+    [
+        (b"", "ConnectionError"),
+        (b"HTTP/1.1\r\n", "ProtocolError"),
+        (b"<html>\r\n", "ProtocolError"),
+        (b"HTTP/1.1 OK 200\r\n\r\n", "ProtocolError"),
+        (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n", "ProtocolError"),
+        (b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n{", "IncompleteReadError"),
+    ],
+)
+def test_malformed_responses_are_counted_as_errors(response, error):
+    report = asyncio.run(
+        run_against_broken_server(
+            response,
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            rate=50,
+            duration_seconds=0.1,
+            connections=2,
+            mix={"jwks": 1},
+        )
+    )
+
+    assert report["errors_by_type"] == {error: 5}
+
+
+def test_mock_server_rejects_a_malformed_request_line():
+    async def send(request):
+        server = mock_oauth_server.MockOAuthServer()
+        port = await server.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            response = await reader.read()
+            writer.close()
+            return response
+        finally:
+            await server.stop()
+
+    response = asyncio.run(send(b"NONSENSE\r\nHost: localhost\r\n\r\n"))
+
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert b"Connection: close" in response
+
+def test_introspection_of_unknown_and_expired_tokens():
+    now = [1000.0]
+    server = mock_oauth_server.MockOAuthServer(clock=lambda: now[0])
+    form = {"grant_type": "client_credentials"}
+
+    _, token = server.issue_token(form)
+    assert server.introspect({"token": token["access_token"]})[1]["active"] is True
+    assert server.introspect({"token": "unknown"})[1] == {"active": False}
+    now[0] += mock_oauth_server.TOKEN_LIFETIME_SECONDS
+    assert server.introspect({"token": token["access_token"]})[1] == {"active": False}
+
+
+@pytest.mark.parametrize(
+    "percent, expected", [(50, 50), (95, 95), (99, 99), (100, 100), (1, 1)]
+)
+def test_percentile_is_nearest_rank(percent, expected):
+    assert harness.percentile(list(range(1, 101)), percent) == expected
+
+
+def test_parse_mix():
+    assert harness.parse_mix("token=2,jwks") == {"token": 2, "jwks": 1}
+    with pytest.raises(Exception, match="unknown scenario 'authorize'"):
+        harness.parse_mix("authorize=1")
+
+
+def test_command_line_writes_the_report(tmp_path, monkeypatch):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "curity_fargate_cluster_stack.load_test.mock_oauth_server",
+         "--port", "0"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        target = server.stdout.readline().split()[-1]
+        monkeypatch.setenv("CURITY_CLIENT_SECRET", CLIENT_SECRET)
+        report_path = tmp_path / "report.json"
+
+        assert harness.main(
+            [
+                "--target", target, "--client-id", CLIENT_ID, "--rate", "50",
+                "--duration", "0.2", "--mix", "token=1,jwks=1", "--report", str(report_path),
+            ]
+        ) == 0
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = json.loads(report_path.read_text())
+    assert report["target"] == target
+    assert report["requests"] == 10
+    assert report["errors"] == 0
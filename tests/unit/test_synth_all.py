@@ -0,0 +1,52 @@
+"""synth_all for the placeholder account and region, with no AWS configuration."""
+import json
+import os
+import subprocess
+import sys
+
+from tests.unit.helpers import PROJECT_DIRECTORY, cdk_environments, load_cdk_context
+
+
+def test_synth_all_needs_no_aws_configuration(docker_context, tmp_path):
+    # The same cdk.json, building from the stand in for ../curity-docker-provisioning
+    context = load_cdk_context()
+    for environment in cdk_environments():
+        config = context[environment]
+        if "envfile" in config:
+            config["envfile"] = str(docker_context / "local.plain.env")
+        config["image_build"] = {**config.get("image_build", {}), "directory": str(docker_context)}
+    cdk_json = tmp_path / "cdk.json"
+    cdk_json.write_text(json.dumps({"context": context}), encoding="utf-8")
+
+    # No credentials, profile, account or region, not even from ~/.aws
+    environ = {
+        name: value
+        for name, value in os.environ.items()
+        if not name.startswith(("AWS_", "CDK_"))
+    }
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "curity_fargate_cluster_stack.synth_all",
+            "--cdk-json",
+            str(cdk_json),
+            # Nothing cached, the placeholder VPC lookups are answered offline
+            "--context-cache",
+            str(tmp_path / "cdk.context.json"),
+            "--outdir",
+            str(tmp_path / "cdk.out"),
+            "--strict",
+        ],
+        cwd=PROJECT_DIRECTORY,
+        env={**environ, "HOME": str(tmp_path)},
+        capture_output=True,
+        text=True,
+        timeout=600,
+        check=False,
+    )
+
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    statuses = [line.split()[:2] for line in completed.stdout.splitlines()]
+    for environment in cdk_environments():
+        assert [environment, "OK"] in statuses
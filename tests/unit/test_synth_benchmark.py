@@ -0,0 +1,148 @@
+"""Synth cost of the cdk.json environments and the README example, against a baseline.
+
+The peak memory and template size of each synth are compared with
+synth_baseline.json and the test fails when one grows beyond its
+tolerance.  Wall time depends on the machine, so it is only checked when
+CURITY_CHECK_SYNTH_TIME=1, on the machine that recorded the baseline.
+After an intended change record a new baseline with:-
+
+    CURITY_UPDATE_SYNTH_BASELINE=1 python -m pytest tests/unit/test_synth_benchmark.py
+"""
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from tests.unit.helpers import EXAMPLE_SETTINGS, cdk_environments
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "synth_baseline.json")
+UPDATE_BASELINE = os.getenv("CURITY_UPDATE_SYNTH_BASELINE") == "1"
+CHECK_TIME = os.getenv("CURITY_CHECK_SYNTH_TIME") == "1"
+
+# A measurement fails when it is above baseline * ratio + slack.  Wall time
+# is noisy so it gets the most room, the template size is deterministic
+TOLERANCES = {
+    "python_peak_mib": (1.25, 5),
+    "jsii_peak_mib": (1.25, 50),
+    "template_bytes": (1.05, 0),
+}
+if CHECK_TIME:
+    TOLERANCES["seconds"] = (1.5, 1.0)
+
+# The benchmarked cases, each an environment from cdk.json with its overrides
+CASES = {environment: (environment, {}) for environment in cdk_environments()}
+CASES["example"] = ("rkh", EXAMPLE_SETTINGS)
+
+
+#
+#  Most of the synth happens in the jsii node processes rather than in Python,
+#  so their peak RSS is read from /proc after resetting it.  This is Linux only,
+#  elsewhere only the Python peak is measured.
+# =========================================================================
+def jsii_runtime_pids(parent="self"):
+    """return the pids of the jsii node processes, the descendants of this process"""
+    pids = []
+    for children in glob.glob(f"/proc/{parent}/task/*/children"):
+        with open(children, encoding="utf-8") as child_pids:
+            for pid in child_pids.read().split():
+                pids.append(pid)
+                pids.extend(jsii_runtime_pids(pid))
+    return pids
+
+
+def reset_peak_rss(pids):
+    """reset the high water mark of the processes' resident memory"""
+    for pid in pids:
+        with open(f"/proc/{pid}/clear_refs", "w", encoding="utf-8") as clear_refs:
+            clear_refs.write("5")
+
+
+def peak_rss_mib(pids):
+    """return the summed high water mark of the processes' resident memory"""
+    peak_kib = 0
+    for pid in pids:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    peak_kib += int(line.split()[1])
+    return round(peak_kib / 1024, 1)
+
+
+def measure_synth(synth, environment, overrides):
+    """synthesize the environment and return its cost"""
+    pids = jsii_runtime_pids()
+    reset_peak_rss(pids)
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    template = synth(environment, **overrides).to_json()
+
+    seconds = time.perf_counter() - started
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    measurement = {
+        "seconds": round(seconds, 2),
+        "python_peak_mib": round(python_peak / 1024 / 1024, 1),
+        "template_bytes": len(json.dumps(template, sort_keys=True)),
+    }
+    if pids:
+        measurement["jsii_peak_mib"] = peak_rss_mib(pids)
+    return measurement
+
+
+def load_baseline():
+    """return the stored baseline, keyed by case"""
+    if not os.path.isfile(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(case, measurement):
+    """store the measurement as the case's baseline"""
+    baseline = load_baseline()
+    baseline[case] = measurement
+    with open(BASELINE_PATH, "w", encoding="utf-8") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+
+@pytest.fixture(scope="module")
+def warm_synth(synth):
+    """the first synth loads the CDK libraries into jsii, so keep it out of the timings"""
+    synth(cdk_environments()[0])
+    return synth
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_synth_cost_within_baseline(warm_synth, case):
+    environment, overrides = CASES[case]
+    measurement = measure_synth(warm_synth, environment, overrides)
+    print(f"{case}: {measurement}")
+
+    if UPDATE_BASELINE:
+        save_baseline(case, measurement)
+        return
+
+    baseline = load_baseline().get(case)
+    assert baseline, (
+        f"No synth baseline for '{case}', record one with "
+        "CURITY_UPDATE_SYNTH_BASELINE=1"
+    )
+
+    regressions = []
+    for metric, (ratio, slack) in TOLERANCES.items():
+        if metric not in measurement or metric not in baseline:
+            continue
+        limit = baseline[metric] * ratio + slack
+        if measurement[metric] > limit:
+            regressions.append(
+                f"{metric} {measurement[metric]} > {limit:g} "
+                f"(baseline {baseline[metric]})"
+            )
+
+    assert not regressions, f"{case} synth regressed: " + ", ".join(regressions)
@@ -0,0 +1,195 @@
+"""Tests for the task inventory CLI against a stubbed ECS client."""
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from curity_fargate_cluster_stack import task_inventory
+
+CLUSTER = "curity-cluster"
+NOW = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+TASK_ARN = "arn:aws:ecs:eu-west-2:123456789012:task/curity-cluster/{}"
+SERVICE_ARN = "arn:aws:ecs:eu-west-2:123456789012:service/curity-cluster/{}"
+
+
+@pytest.fixture
+def ecs():
+    client = boto3.client(
+        "ecs",
+        region_name="eu-west-2",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        client.stubber = stubber
+        yield client
+        stubber.assert_no_pending_responses()
+
+
+def described_task(task_id, index=0):
+    return {
+        "taskArn": TASK_ARN.format(task_id),
+        "lastStatus": "RUNNING",
+        "healthStatus": "HEALTHY",
+        "availabilityZone": "eu-west-2a",
+        "capacityProviderName": "FARGATE_SPOT",
+        "startedAt": NOW - timedelta(hours=2, minutes=5, seconds=index),
+        "containers": [
+            {"networkInterfaces": [{"privateIpv4Address": f"10.0.2.{index % 250}"}]}
+        ],
+    }
+
+
+def test_tasks_are_paginated_and_described_in_batches(ecs):
+    task_ids = [f"task{index:03}" for index in range(150)]
+    task_arns = [TASK_ARN.format(task_id) for task_id in task_ids]
+
+    ecs.stubber.add_response(
+        "list_services",
+        {"serviceArns": [SERVICE_ARN.format("curity-runtime-service")]},
+        {"cluster": CLUSTER},
+    )
+    ecs.stubber.add_response(
+        "list_tasks",
+        {"taskArns": task_arns[:120], "nextToken": "page2"},
+        {"cluster": CLUSTER, "serviceName": "curity-runtime-service"},
+    )
+    ecs.stubber.add_response(
+        "list_tasks",
+        {"taskArns": task_arns[120:]},
+        {"cluster": CLUSTER, "serviceName": "curity-runtime-service", "nextToken": "page2"},
+    )
+    for batch in (slice(0, 100), slice(100, 150)):
+        ecs.stubber.add_response(
+            "describe_tasks",
+            {
+                "tasks": [
+                    described_task(task_id, index)
+                    for index, task_id in enumerate(task_ids[batch], batch.start)
+                ]
+            },
+            {"cluster": CLUSTER, "tasks": task_arns[batch]},
+        )
+
+    # Every task belongs to the service, so there are no standalone tasks to describe
+    ecs.stubber.add_response("list_tasks", {"taskArns": task_arns}, {"cluster": CLUSTER})
+
+    rows = task_inventory.task_inventory(ecs, CLUSTER, jobs=1, now=NOW)
+
+    assert [row["task_id"] for row in rows] == task_ids
+    assert rows[0] == {
+        "service": "curity-runtime-service",
+        "task_id": "task000",
+        "ip_address": "10.0.2.0",
+        "status": "RUNNING",
+        "health": "HEALTHY",
+        "availability_zone": "eu-west-2a",
+        "capacity_provider": "FARGATE_SPOT",
+        "started_at": "2024-03-01T09:55:00+00:00",
+        "age": "2h05m",
+    }
+
+
+def test_standalone_tasks_are_listed_by_family(ecs):
+    ecs.stubber.add_response(
+        "list_services",
+        {"serviceArns": [SERVICE_ARN.format("curity-runtime-service")]},
+        {"cluster": CLUSTER},
+    )
+    ecs.stubber.add_response(
+        "list_tasks",
+        {"taskArns": [TASK_ARN.format("runtime1")]},
+        {"cluster": CLUSTER, "serviceName": "curity-runtime-service"},
+    )
+    ecs.stubber.add_response(
+        "describe_tasks",
+        {"tasks": [described_task("runtime1")]},
+        {"cluster": CLUSTER, "tasks": [TASK_ARN.format("runtime1")]},
+    )
+    # The cluster wide listing also finds a load test run and a runtime task
+    # that started after the service's tasks were listed
+    ecs.stubber.add_response(
+        "list_tasks",
+        {"taskArns": [TASK_ARN.format(task_id) for task_id in ("runtime1", "load1", "runtime2")]},
+        {"cluster": CLUSTER},
+    )
+    ecs.stubber.add_response(
+        "describe_tasks",
+        {
+            "tasks": [
+                {**described_task("load1"), "group": "family:curity-load-test"},
+                {**described_task("runtime2"), "group": "service:curity-runtime-service"},
+            ]
+        },
+        {"cluster": CLUSTER, "tasks": [TASK_ARN.format("load1"), TASK_ARN.format("runtime2")]},
+    )
+
+    rows = task_inventory.task_inventory(ecs, CLUSTER, jobs=1, now=NOW)
+
+    assert [(row["service"], row["task_id"]) for row in rows] == [
+        ("curity-runtime-service", "runtime1"),
+        ("family:curity-load-test", "load1"),
+    ]
+
+def test_named_services_skip_the_service_listing(ecs):
+    for service in ("curity-admin-service", "curity-runtime-service"):
+        ecs.stubber.add_response(
+            "list_tasks", {"taskArns": []}, {"cluster": CLUSTER, "serviceName": service}
+        )
+
+    rows = task_inventory.task_inventory(
+        ecs, CLUSTER, ["curity-admin-service", "curity-runtime-service"], jobs=1
+    )
+
+    assert rows == []
+
+
+def test_provisioning_task_falls_back_to_the_eni_attachment():
+    task = {
+        "taskArn": TASK_ARN.format("abc"),
+        "lastStatus": "PROVISIONING",
+        "launchType": "FARGATE",
+        "createdAt": NOW - timedelta(seconds=42),
+        "containers": [{"networkInterfaces": []}],
+        "attachments": [
+            {"details": [{"name": "privateIPv4Address", "value": "10.0.3.7"}]}
+        ],
+    }
+
+    row = task_inventory.task_row("curity-admin-service", task, NOW)
+
+    assert row["ip_address"] == "10.0.3.7"
+    assert row["capacity_provider"] == "FARGATE"
+    assert row["health"] is None
+    assert row["age"] == "42s"
+
+
+@pytest.mark.parametrize(
+    "age, expected",
+    [
+        (timedelta(seconds=5), "5s"),
+        (timedelta(minutes=3, seconds=7), "3m07s"),
+        (timedelta(days=3, hours=4, minutes=30), "3d04h"),
+    ],
+)
+def test_format_age(age, expected):
+    assert task_inventory.format_age(NOW - age, NOW) == expected
+
+
+def test_format_table():
+    row = task_inventory.task_row("curity-runtime-service", described_task("abc"), NOW)
+
+    lines = task_inventory.format_table([row]).splitlines()
+
+    assert lines[0].split() == ["SERVICE", "TASK", "IP", "STATUS", "HEALTH", "AZ", "CAPACITY", "AGE"]
+    assert lines[1].split() == [
+        "curity-runtime-service", "abc", "10.0.2.0", "RUNNING", "HEALTHY",
+        "eu-west-2a", "FARGATE_SPOT", "2h05m",
+    ]
+
+
+def test_client_retries_throttled_calls_adaptively():
+    ecs = task_inventory.create_ecs_client(region="eu-west-2", max_attempts=7)
+
+    assert ecs.meta.config.retries == {"mode": "adaptive", "total_max_attempts": 7}